@@ -1,136 +1,506 @@
 # src/agents.py
 
-import ollama
-from typing import Optional, List
+import inspect
+import threading
+import uuid
+from concurrent.futures import Future
+from typing import Iterator, Optional, List, Tuple
+
+import telemetry
 
 from config import (
     AGENT_SYSTEM_PROMPTS, STAGE_PROMPTS,
     DEFAULT_MODEL, SUMMARY_MODEL,
-    MAX_TOKENS_PER_STAGE, MAX_SUMMARY_TOKENS,
-    ENABLE_RAG, RETRIEVER_K,
-    SUMMARY_PROMPT_TEMPLATE
+    MAX_SUMMARY_TOKENS, ADAPTIVE_NUM_PREDICT,
+    ENABLE_RAG, RETRIEVER_K, ENABLE_STREAMING,
+    PARALLEL_TURNS, SCHEDULER_MAX_WORKERS, ENABLE_TELEMETRY,
+    SUMMARY_PROMPT_TEMPLATE, ROLLING_SUMMARY_PROMPT_TEMPLATE,
+    SUMMARY_MODE, SUMMARY_TOKEN_CAP, SUMMARY_FULL_EVERY,
+    RETRIEVAL_QUERY_INCLUDE_SUMMARY, RETRIEVAL_QUERY_SUMMARY_TOKENS, PREFETCH_RETRIEVAL,
+    CONTEXT_PACKING,
 )
+from context_packer import pack_context
 from debate_state import DebateState
+from llm_cache import ResponseCache, cache_key, get_response_cache
+from llm_backends import get_backend
+from prompt_budget import BudgetedPrompt, PromptBuilder, report_of, stage_limits, truncate
+from scheduler import Stage, run_parallel, run_sequential, stop_point
+from stage_profiles import PointCutoff, cut_points, num_predict, observe, stage_profile, stop_sequences
 
 
-def _ollama_chat(model: str, messages: List[dict], max_tokens: int) -> str:
+def _chat_options(max_tokens: int, stop: Optional[List[str]] = None) -> dict:
     opts = {}
     if max_tokens and max_tokens > 0:
         opts["num_predict"] = max_tokens
-    res = ollama.chat(model=model, messages=messages, options=opts)
-    return res["message"]["content"].strip()
+    if stop:
+        opts["stop"] = list(stop)
+    return opts
+
+
+def _cache_for(stage: Optional[str]) -> Optional[ResponseCache]:
+    cache = get_response_cache()
+    return cache if cache is not None and cache.enabled_for(stage) else None
+
+
+def _annotate_prompt(messages: List[dict]) -> None:
+    report = report_of(messages)
+    if report is not None:
+        telemetry.annotate(**report.attrs())
+
+
+def _llm_chat(model: str, messages: List[dict], max_tokens: int, stage: Optional[str] = None,
+              stop: Optional[List[str]] = None, max_points: int = 0) -> str:
+    _annotate_prompt(messages)
+    opts = _chat_options(max_tokens, stop)
+    cache = _cache_for(stage)
+    if cache:
+        opts = cache.options(opts)
+        key = cache_key(model, messages, opts)
+        hit = cache.get(key)
+        if hit is not None:
+            telemetry.annotate(cached=True)
+            return hit
+    stop_point()
+    text = get_backend().chat(model, messages, opts, stage=stage).strip()
+    if max_points:
+        # Too late to save tokens here, but both paths return the same text.
+        text = cut_points(text, max_points).strip()
+    if cache:
+        cache.put(key, text)
+    return text
+
+
+def _llm_chat_stream(model: str, messages: List[dict], max_tokens: int, stage: Optional[str] = None,
+                     stop: Optional[List[str]] = None, max_points: int = 0) -> Iterator[str]:
+    _annotate_prompt(messages)
+    opts = _chat_options(max_tokens, stop)
+    cache = _cache_for(stage)
+    if cache:
+        opts = cache.options(opts)
+        key = cache_key(model, messages, opts)
+        hit = cache.get(key)
+        if hit is not None:
+            telemetry.annotate(cached=True)
+            yield hit
+            return
+    started = False
+    parts = []
+    cutoff = PointCutoff(max_points)
+    stop_point()
+    stream = get_backend().chat_stream(model, messages, opts, stage=stage)
+    try:
+        for delta in stream:
+            stop_point()
+            # Mirror the .strip() of the non-streaming path so the live text matches the final one.
+            if not started:
+                delta = delta.lstrip()
+                started = bool(delta)
+            delta = cutoff.feed(delta)
+            if delta:
+                parts.append(delta)
+                yield delta
+            if cutoff.done:
+                # The requested points are all there; closing the stream stops the generation.
+                telemetry.annotate(stopped_early=True)
+                break
+    finally:
+        stream.close()
+    if cache:
+        cache.put(key, "".join(parts).strip())
 
 
 class BaseAgent:
-    def __init__(self, name: str, role: str, model: str = DEFAULT_MODEL, retriever=None):
+    def __init__(self, name: str, role: str, model: Optional[str] = None, retriever=None):
         self.name = name
         self.role = role
-        self.model = model
+        self.model = model or DEFAULT_MODEL
+        self._explicit_model = model  # passed by the caller: wins over the stage profile's model
         self.retriever = retriever
         self.system = AGENT_SYSTEM_PROMPTS.get(role, "")
+        self._retrievals = {}  # (role, stage, query) -> Future[str]
+        self._retrievals_lock = threading.Lock()
 
-    def _retrieve(self, query: str) -> str:
+    def retrieve(self, query: str, stage: str) -> str:
+        """Memoized _retrieve. Concurrent callers for the same key wait for the first instead of repeating it."""
+        key = (self.role, stage, query)
+        with self._retrievals_lock:
+            fut = self._retrievals.get(key)
+            owner = fut is None
+            if owner:
+                fut = self._retrievals[key] = Future()
+        if owner:
+            try:
+                fut.set_result(self._retrieve(query, stage))
+            except BaseException as e:
+                # Waiters get the error instead of blocking forever; the next call retries.
+                with self._retrievals_lock:
+                    self._retrievals.pop(key, None)
+                fut.set_exception(e)
+                raise
+        else:
+            telemetry.annotate(memoized=True)
+        text, report = fut.result()
+        telemetry.annotate(**report)
+        return text
+
+    def _retrieve(self, query: str, stage: str) -> Tuple[str, dict]:
+        """(context block, packing report) for query."""
         if not (ENABLE_RAG and self.retriever):
-            return "[No RAG enabled]\n\n"
+            return "[No RAG enabled]\n\n", {}
         try:
             
             docs = self.retriever.invoke(query)
             if not docs:
-                return "[No relevant information found]\n\n"
+                return "[No relevant information found]\n\n", {}
+            if CONTEXT_PACKING:
+                return pack_context(docs, RETRIEVER_K, stage_limits(stage).get("context"))
             formatted = []
             for d in docs[:RETRIEVER_K]:
                 src = d.metadata.get("source", "N/A")
                 formatted.append(f"Source: {src}\nContent: {d.page_content}")
-            return "Relevant information from knowledge base:\n\n" + "\n---\n".join(formatted) + "\n\n"
+            return "Relevant information from knowledge base:\n\n" + "\n---\n".join(formatted) + "\n\n", {}
         except Exception as e:
-            return f"[RAG error: {e}]\n\n"
+            return f"[RAG error: {e}]\n\n", {}
 
-    def generate(self, user_prompt: str, stage: str, retrieved_context: str = "") -> str:
+    def _messages(self, user_prompt: str, retrieved_context: str = "") -> List[dict]:
         messages = []
         if self.system:
             messages.append({"role": "system", "content": self.system})
-        full_prompt = retrieved_context + user_prompt
+        full_prompt = BudgetedPrompt(retrieved_context + user_prompt, getattr(user_prompt, "report", None))
         messages.append({"role": "user", "content": full_prompt})
-        return _ollama_chat(self.model, messages, MAX_TOKENS_PER_STAGE.get(stage, 200))
+        return messages
+
+    def _generation(self, stage: str) -> Tuple[str, int, dict]:
+        """Model, num_predict and stop/max_points for stage, from its STAGE_PROFILES entry.
+
+        The model is the one passed to the agent, else the profile's, else DEFAULT_MODEL.
+        """
+        prof = stage_profile(stage)
+        # A cached stage keeps a fixed num_predict, which is part of its cache keys.
+        max_tokens = num_predict(stage, adaptive=ADAPTIVE_NUM_PREDICT and _cache_for(stage) is None)
+        model = self._explicit_model or prof["model"] or self.model
+        return model, max_tokens, {"stop": stop_sequences(prof), "max_points": prof["max_points"]}
+
+    def generate(self, user_prompt: str, stage: str, retrieved_context: str = "") -> str:
+        messages = self._messages(user_prompt, retrieved_context)
+        model, max_tokens, control = self._generation(stage)
+        with telemetry.span("generation", agent=self.name, stage=stage, model=model) as sp:
+            text = _llm_chat(model, messages, max_tokens, stage=stage, **control)
+        observe(stage, text, sp.eval_tokens)
+        return text
+
+    def generate_stream(self, user_prompt: str, stage: str, retrieved_context: str = "") -> Iterator[str]:
+        messages = self._messages(user_prompt, retrieved_context)
+        model, max_tokens, control = self._generation(stage)
+        parts = []
+        with telemetry.span("generation", agent=self.name, stage=stage, model=model) as sp:
+            for delta in _llm_chat_stream(model, messages, max_tokens, stage=stage, **control):
+                sp.first_token()
+                parts.append(delta)
+                yield delta
+        observe(stage, "".join(parts), sp.eval_tokens)
+
+    def prompt(self, state: DebateState, stage: str, summary: Optional[str] = None) -> str:
+        raise NotImplementedError
 
 
 class Debater(BaseAgent):
     def act(self, state: DebateState, stage: str, summary: Optional[str] = None) -> str:
-        prompt_tpl = STAGE_PROMPTS[stage]
+        return self.generate(self.prompt(state, stage, summary), stage=stage, retrieved_context="")
+
+    def act_stream(self, state: DebateState, stage: str, summary: Optional[str] = None) -> Iterator[str]:
+        yield from self.generate_stream(self.prompt(state, stage, summary), stage=stage, retrieved_context="")
+
+    def retrieval_query(self, state: DebateState, stage: str, summary: Optional[str] = None) -> str:
         query = f"Evidence relevant to: {state.topic}. Role={self.role}. Stage={stage}."
-        if summary:
-            query += f" Debate summary (excerpt): {summary[:250]}"
-        retrieved = self._retrieve(query) if stage in ("opening", "rebuttal", "closing") else ""
-        prompt = prompt_tpl.format(
-            topic=state.topic,
-            summary=summary or "",
-            retrieved_context=retrieved
+        if summary and RETRIEVAL_QUERY_INCLUDE_SUMMARY:
+            query += f" Debate summary (excerpt): {truncate(summary, RETRIEVAL_QUERY_SUMMARY_TOKENS)}"
+        return query
+
+    def prefetch(self, state: DebateState, stages: List[str]) -> None:
+        for stage in stages:
+            self.retrieve(self.retrieval_query(state, stage), stage)
+
+    def prompt(self, state: DebateState, stage: str, summary: Optional[str] = None) -> str:
+        prompt_tpl = STAGE_PROMPTS[stage]
+        retrieved = ""
+        if stage in ("opening", "rebuttal", "closing"):
+            with telemetry.span("retrieval", agent=self.name, stage=stage):
+                retrieved = self.retrieve(self.retrieval_query(state, stage, summary), stage)
+        fields, report = (
+            PromptBuilder(stage)
+            .fixed(self.system, prompt_tpl.format(topic=state.topic, summary="", retrieved_context=""))
+            .add("context", retrieved, sep="\n---\n")
+            .add("summary", summary or "")
+            .fit()
         )
-        return self.generate(prompt, stage=stage, retrieved_context="")
+        return BudgetedPrompt(prompt_tpl.format(
+            topic=state.topic,
+            summary=fields["summary"],
+            retrieved_context=fields["context"]
+        ), report)
 
 
 class Judge(BaseAgent):
     
-    def __init__(self, name: str = "Judge", model: str = DEFAULT_MODEL):
+    def __init__(self, name: str = "Judge", model: Optional[str] = None):
         super().__init__(name=name, role="JudgeAgent", model=model, retriever=None)
 
     def act(self, state: DebateState, summary: str) -> str:
-        prompt = STAGE_PROMPTS["judge"].format(summary=summary)
-        return self.generate(prompt, stage="judge")
+        return self.generate(self.prompt(state, "judge", summary), stage="judge")
+
+    def act_stream(self, state: DebateState, summary: str) -> Iterator[str]:
+        yield from self.generate_stream(self.prompt(state, "judge", summary), stage="judge")
+
+    def prompt(self, state: DebateState, stage: str = "judge", summary: Optional[str] = None) -> str:
+        tpl = STAGE_PROMPTS["judge"]
+        fields, report = PromptBuilder("judge").fixed(self.system, tpl.format(summary="")).add("summary", summary or "").fit()
+        return BudgetedPrompt(tpl.format(summary=fields["summary"]), report)
+
+
+class RollingSummarizer:
+    def __init__(self, state: DebateState, model: Optional[str] = None, mode: str = SUMMARY_MODE,
+                 token_cap: int = SUMMARY_TOKEN_CAP, full_every: int = SUMMARY_FULL_EVERY):
+        self.state = state
+        self.model = model or stage_profile("summary")["model"] or SUMMARY_MODEL
+        self.stop = stop_sequences(stage_profile("summary"))
+        self.mode = mode
+        self.token_cap = token_cap
+        self.full_every = full_every
+        self.summary = ""
+        self.covered = 0  # turns of state.history already folded into self.summary
+        self.count = 0
+
+    def request(self, full: bool = False) -> Optional[Tuple[List[dict], int, int]]:
+        """Messages, turns covered and num_predict for the next summary; None if nothing is new."""
+        covered = len(self.state.history)
+        if self.summary and covered == self.covered and not full:
+            return None
+        periodic = self.full_every > 0 and self.count > 0 and self.count % self.full_every == 0
+        system = AGENT_SYSTEM_PROMPTS["Summarizer"]
+        # When over budget the oldest turns go first.
+        if full or periodic or self.mode != "rolling" or not self.summary:
+            fields, report = (
+                PromptBuilder("summary")
+                .fixed(system, SUMMARY_PROMPT_TEMPLATE.format(debate_history=""))
+                .add("history", self.state.as_text(), keep="tail", sep="\n\n")
+                .fit()
+            )
+            prompt = SUMMARY_PROMPT_TEMPLATE.format(debate_history=fields["history"])
+            max_tokens = MAX_SUMMARY_TOKENS
+        else:
+            max_words = int(self.token_cap * 0.75)
+            fields, report = (
+                PromptBuilder("summary")
+                .fixed(system, ROLLING_SUMMARY_PROMPT_TEMPLATE.format(
+                    topic=self.state.topic, previous_summary="", new_turns="", max_words=max_words))
+                .add("summary", self.summary)
+                .add("history", self.state.turns_text(self.covered), keep="tail", sep="\n\n")
+                .fit()
+            )
+            prompt = ROLLING_SUMMARY_PROMPT_TEMPLATE.format(
+                topic=self.state.topic,
+                previous_summary=fields["summary"],
+                new_turns=fields["history"],
+                max_words=max_words,
+            )
+            max_tokens = self.token_cap
+        messages = [{"role": "system", "content": system},
+                    {"role": "user", "content": BudgetedPrompt(prompt, report)}]
+        return messages, covered, stage_profile("summary")["num_predict"] or max_tokens
+
+    def accept(self, summary: str, covered: int) -> str:
+        self.summary = summary
+        self.covered = covered
+        self.count += 1
+        return summary
+
+    def summarize(self, full: bool = False) -> str:
+        req = self.request(full)
+        if req is None:
+            return self.summary
+        messages, covered, max_tokens = req
+        with telemetry.span("summarization", agent="Summarizer", stage="summary", model=self.model):
+            return self.accept(_llm_chat(self.model, messages, max_tokens, stage="summary", stop=self.stop), covered)
 
 
 class Orchestrator(BaseAgent):
-    def __init__(self, state: DebateState, proponent: Debater, opponent: Debater, judge: Judge):
+    def __init__(self, state: DebateState, proponent: Debater, opponent: Debater, judge: Judge,
+                 stream: bool = ENABLE_STREAMING, parallel: bool = PARALLEL_TURNS,
+                 max_workers: int = SCHEDULER_MAX_WORKERS, emit_metrics: bool = ENABLE_TELEMETRY,
+                 prefetch: bool = PREFETCH_RETRIEVAL, checkpoints=None, debate_id: Optional[str] = None):
         super().__init__(name="Moderator", role="Moderator", model=DEFAULT_MODEL, retriever=None)
         self.state = state
         self.proponent = proponent
         self.opponent = opponent
         self.judge = judge
+        self.stream = stream
+        self.parallel = parallel
+        self.max_workers = max_workers
+        self.summarizer = RollingSummarizer(state)
+        self.emit_metrics = emit_metrics
+        self.prefetch = prefetch
+        self.spans: List[telemetry.Span] = []
+        self._stage_spans = {}
+        self.checkpoints = checkpoints  # checkpoints.DebateCheckpoints, or None to keep nothing
+        self.debate_id = debate_id or uuid.uuid4().hex
 
-    def summarize(self) -> str:
-        history = self.state.as_text()
-        prompt = SUMMARY_PROMPT_TEMPLATE.format(debate_history=history)
-        messages = [{"role": "system", "content": AGENT_SYSTEM_PROMPTS["Summarizer"]},
-                    {"role": "user", "content": prompt}]
-        return _ollama_chat(SUMMARY_MODEL, messages, MAX_SUMMARY_TOKENS)
+    def summarize(self, full: bool = False) -> str:
+        return self.summarizer.summarize(full=full)
 
-    def run(self, rebuttal_rounds: int):
-        yield {"type": "stage", "name": "Opening"}
+    def prefetch_retrieval(self, rebuttal_rounds: int) -> Optional[threading.Thread]:
+        # Retrieval for every planned turn runs in the background, overlapping the opening generation;
+        # turns that get there first just claim their own key, so nothing is fetched twice.
+        if not (self.prefetch and ENABLE_RAG):
+            return None
+        debaters = [a for a in (self.proponent, self.opponent) if isinstance(a, Debater) and a.retriever]
+        if not debaters:
+            return None
+        stages = ["opening"]
+        if not RETRIEVAL_QUERY_INCLUDE_SUMMARY:
+            # With the summary in the query, later turns' queries only exist once that summary does.
+            stages += (["rebuttal"] if rebuttal_rounds else []) + ["closing"]
+
+        def work():
+            for stage in stages:
+                for agent in debaters:
+                    agent.prefetch(self.state, [stage])
+
+        thread = threading.Thread(target=work, name="retrieval-prefetch", daemon=True)
+        thread.start()
+        return thread
+
+    def _turn(self, agent: BaseAgent, stage: str, summary: Optional[str] = None):
+        # Yields "delta" events while streaming; the final text is the generator's return value.
+        prompt = agent.prompt(self.state, stage, summary)
+        if not self.stream:
+            return agent.generate(prompt, stage=stage)
+        parts = []
+        for delta in agent.generate_stream(prompt, stage=stage):
+            parts.append(delta)
+            yield {"type": "delta", "agent": agent.name, "role": agent.role, "text": delta}
+        return "".join(parts).strip()
+
+    def _stage(self, key: str, run, deps: List[str], commit) -> Stage:
+        # Spans are collected in whichever thread runs the stage and emitted after its events on commit.
+        def traced(results):
+            with telemetry.collect() as spans:
+                out = run(results)
+                value = (yield from out) if inspect.isgenerator(out) else out
+            self._stage_spans[key] = spans
+            return value
+
+        def committed(value):
+            events = list(commit(value))
+            spans = self._stage_spans.pop(key, [])
+            self.spans.extend(spans)
+            if self.emit_metrics:
+                events += [telemetry.metric_event(sp) for sp in spans]
+            return events
 
-        a1 = self.proponent.act(self.state, "opening")
-        self.state.add(self.proponent.name, self.proponent.role, a1)
-        yield {"type": "msg", "agent": self.proponent.name, "role": self.proponent.role, "text": a1}
+        return Stage(key, traced, deps, committed)
 
-        b1 = self.opponent.act(self.state, "opening")
-        self.state.add(self.opponent.name, self.opponent.role, b1)
-        yield {"type": "msg", "agent": self.opponent.name, "role": self.opponent.role, "text": b1}
+    def _summary_stage(self, key: str, deps: List[str], status: Optional[str] = None) -> Stage:
+        return self._stage(key, lambda results: self.summarize(), deps,
+                           lambda _: [{"type": "status", "text": status}] if status else [])
+
+    def _turn_stage(self, key: str, agent: BaseAgent, stage: str, summary_key: Optional[str] = None,
+                    record: bool = True) -> Stage:
+        def run(results):
+            return (yield from self._turn(agent, stage, results[summary_key] if summary_key else None))
+
+        def commit(text):
+            if record:
+                self.state.add(agent.name, agent.role, text)
+            return [{"type": "msg", "agent": agent.name, "role": agent.role, "text": text}]
+
+        return self._stage(key, run, [summary_key] if summary_key else [], commit)
+
+    def plan(self, rebuttal_rounds: int) -> List[Stage]:
+        # Canonical order is the emission order; deps only capture what each call reads.
+        # Debater prompts read the topic and a summary, summaries read every committed turn.
+        stages = [
+            Stage.marker("opening", {"type": "stage", "name": "Opening"}),
+            self._turn_stage("opening:pro", self.proponent, "opening"),
+            self._turn_stage("opening:opp", self.opponent, "opening"),
+        ]
+        turns = ["opening:pro", "opening:opp"]
 
         for i in range(rebuttal_rounds):
-            yield {"type": "stage", "name": f"Rebuttal Round {i+1}"}
-            s = self.summarize()
-            yield {"type": "status", "text": "Summary generated."}
+            stages.append(Stage.marker(f"rebuttal{i+1}", {"type": "stage", "name": f"Rebuttal Round {i+1}"}))
+            s = f"summary:rebuttal{i+1}"
+            stages.append(self._summary_stage(s, list(turns), status="Summary generated."))
+            stages.append(self._turn_stage(f"rebuttal{i+1}:pro", self.proponent, "rebuttal", s))
+            stages.append(self._turn_stage(f"rebuttal{i+1}:opp", self.opponent, "rebuttal", s))
+            turns += [f"rebuttal{i+1}:pro", f"rebuttal{i+1}:opp"]
 
-            ar = self.proponent.act(self.state, "rebuttal", summary=s)
-            self.state.add(self.proponent.name, self.proponent.role, ar)
-            yield {"type": "msg", "agent": self.proponent.name, "role": self.proponent.role, "text": ar}
+        stages += [
+            Stage.marker("closing", {"type": "stage", "name": "Closing"}),
+            self._summary_stage("summary:closing", list(turns)),
+            self._turn_stage("closing:pro", self.proponent, "closing", "summary:closing"),
+            self._turn_stage("closing:opp", self.opponent, "closing", "summary:closing"),
+            Stage.marker("judge", {"type": "stage", "name": "Judge Summary"}),
+            self._turn_stage("judge:verdict", self.judge, "judge", "summary:closing", record=False),
+            Stage.marker("done", {"type": "done"}),
+        ]
+        return stages
 
-            br = self.opponent.act(self.state, "rebuttal", summary=s)
-            self.state.add(self.opponent.name, self.opponent.role, br)
-            yield {"type": "msg", "agent": self.opponent.name, "role": self.opponent.role, "text": br}
+    def restore(self, rebuttal_rounds: int, stages: List[Stage], results: dict) -> List[dict]:
+        """Rebuild state, summary and results from this debate's checkpoint.
 
-        yield {"type": "stage", "name": "Closing"}
-        s2 = self.summarize()
+        Returns the committed events to replay (metrics excluded); stages[:len(saved)] are done.
+        """
+        saved = self.checkpoints.load(self.debate_id)
+        if saved is None:
+            self.checkpoints.begin(self.debate_id, self.state.topic, rebuttal_rounds)
+            return []
+        if (saved["topic"], saved["rounds"]) != (self.state.topic, rebuttal_rounds):
+            raise ValueError(f"Checkpoint {self.debate_id} is for {saved['topic']!r} with {saved['rounds']} rounds")
+        events = []
+        for st, row in zip(stages, saved["stages"]):
+            if st.key != row["key"]:
+                raise ValueError(f"Checkpoint {self.debate_id} does not match the debate plan at {st.key}")
+            results[st.key] = row["value"]
+            for turn in row["turns"]:
+                self.state.add(turn["agent"], turn["role"], turn["text"])
+            if row["summarizer"]:
+                s = row["summarizer"]
+                self.summarizer.summary, self.summarizer.covered, self.summarizer.count = (
+                    s["summary"], s["covered"], s["count"])
+            events += [dict(ev, replayed=True) for ev in row["events"]]
+        return events
 
-        ac = self.proponent.act(self.state, "closing", summary=s2)
-        self.state.add(self.proponent.name, self.proponent.role, ac)
-        yield {"type": "msg", "agent": self.proponent.name, "role": self.proponent.role, "text": ac}
+    def _checkpointed(self, st: Stage, seq: int) -> Stage:
+        commit = st.commit
 
-        bc = self.opponent.act(self.state, "closing", summary=s2)
-        self.state.add(self.opponent.name, self.opponent.role, bc)
-        yield {"type": "msg", "agent": self.opponent.name, "role": self.opponent.role, "text": bc}
+        def committed(value):
+            turns_before = len(self.state.history)
+            events = list(commit(value)) if commit else []
+            s = self.summarizer
+            self.checkpoints.append(
+                self.debate_id, seq, st.key, value,
+                [ev for ev in events if ev.get("type") != "metric"],
+                [t.to_dict() for t in self.state.history[turns_before:]],
+                # Nothing can summarize again before this commit: the next summary waits on later turns.
+                {"summary": s.summary, "covered": s.covered, "count": s.count}
+                if st.key.startswith("summary:") else None,
+            )
+            return events
 
-        yield {"type": "stage", "name": "Judge Summary"}
-        j = self.judge.act(self.state, summary=s2)
-        yield {"type": "msg", "agent": self.judge.name, "role": self.judge.role, "text": j}
+        return Stage(st.key, st.run, st.deps, committed)
 
-        yield {"type": "done"}
+    def run(self, rebuttal_rounds: int):
+        stages = self.plan(rebuttal_rounds)
+        results = {}
+        if self.checkpoints is not None:
+            replay = self.restore(rebuttal_rounds, stages, results)
+            done = len(results)
+            yield from replay
+            stages = [self._checkpointed(st, seq) for seq, st in enumerate(stages[done:], done)]
+        self.prefetch_retrieval(rebuttal_rounds)
+        if self.parallel:
+            yield from run_parallel(stages, self.max_workers, results)
+        else:
+            yield from run_sequential(stages, results)
+        if self.checkpoints is not None:
+            self.checkpoints.delete(self.debate_id)
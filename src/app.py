@@ -1,5 +1,6 @@
 # src/app.py
 import time
+import uuid
 import streamlit as st
 from collections import deque
 
@@ -7,17 +8,17 @@ from config import (
     DEBATE_TOPIC,
     NUMBER_OF_REBUTTAL_ROUNDS,
     ENABLE_RAG,
-    KB_DIRECTORY,
-    VECTOR_STORE_PATH,
-    EMBEDDING_MODEL,
-    CHUNK_SIZE,
-    CHUNK_OVERLAP,
-    RETRIEVER_K,
+    WARM_UP_ON_START,
+    UI_POLL_INTERVAL,
 )
 
-from rag_pipeline import index_knowledge_base, get_retriever
+from rag_pipeline import get_shared_retriever
 from agents import Debater, Judge, Orchestrator
+from checkpoints import get_checkpoints
 from debate_state import DebateState
+from debate_worker import get_worker
+from llm_backends import get_backend
+from scheduler import Cancelled
 
 
 st.set_page_config(page_title="Multi-Agent Debate System", layout="wide")
@@ -28,12 +29,16 @@ def ss_init():
         st.session_state.status = "Configure and start the debate."
     if "history" not in st.session_state:
         st.session_state.history = deque(maxlen=500)
+    if "transcript" not in st.session_state:
+        st.session_state.transcript = DebateState(DEBATE_TOPIC)
     if "timeline" not in st.session_state:
         st.session_state.timeline = deque(maxlen=60)
     if "agent_status" not in st.session_state:
         st.session_state.agent_status = {"Affirmative": "Idle", "Negative": "Idle", "Judge": "Idle"}
     if "running" not in st.session_state:
         st.session_state.running = False
+    if "live" not in st.session_state:
+        st.session_state.live = {}
 
     if "topic" not in st.session_state:
         st.session_state.topic = DEBATE_TOPIC
@@ -41,6 +46,16 @@ def ss_init():
         st.session_state.rounds = NUMBER_OF_REBUTTAL_ROUNDS
     if "enable_rag" not in st.session_state:
         st.session_state.enable_rag = ENABLE_RAG
+    if "metrics" not in st.session_state:
+        st.session_state.metrics = []
+    if "debate_id" not in st.session_state:
+        st.session_state.debate_id = None
+    if "cursor" not in st.session_state:
+        st.session_state.cursor = 0
+    if "show_metrics" not in st.session_state:
+        st.session_state.show_metrics = False
+    if "failed" not in st.session_state:
+        st.session_state.failed = False
 
 
 ss_init()
@@ -105,93 +120,172 @@ def push_timeline(msg: str):
 
 
 def push_message(name: str, role: str, text: str):
-    st.session_state.history.append({"type": "msg", "name": name, "role": role, "text": text})
-
-
-def build_orchestrator(topic: str, rounds: int, enable_rag: bool):
-    retriever = None
-    if enable_rag:
-        vs = index_knowledge_base(
-            kb_directory=KB_DIRECTORY,
-            vector_store_path=VECTOR_STORE_PATH,
-            embedding_model=EMBEDDING_MODEL,
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-        )
-        retriever = get_retriever(vs, k=RETRIEVER_K) if vs else None
+    # Indexed by agent, so a render only looks at the turns it shows.
+    st.session_state.transcript.add(name, role, text)
+
+
+def bubble_html(title: str, text: str, color_class: str) -> str:
+    return f"""
+            <div class="bubble {color_class}">
+              <h4>{title}</h4>
+              <p>{text}</p>
+            </div>
+            """
+
+
+def live_html(name: str, title: str, color_class: str) -> str:
+    live = st.session_state.live.get(name)
+    if not live:
+        return ""
+    return bubble_html(title.format(role=live["role"]), live["text"] + " ▌", color_class)
+
+
+class LiveSlots:
+    """One placeholder per bubble or panel; a tick redraws only the ones whose content changed."""
+
+    def __init__(self):
+        self._slots = {}
+        self._shown = {}
+        self._tick = st.empty()
+
+    def add(self, key: str):
+        self._slots[key] = st.empty()
+
+    def markdown(self, key: str, html: str):
+        if self._shown.get(key) == html:
+            return
+        self._shown[key] = html
+        if html:
+            self._slots[key].markdown(html, unsafe_allow_html=True)
+        else:
+            self._slots[key].empty()
+
+    def container(self, key: str, version, draw):
+        if self._shown.get(key) == version:
+            return
+        self._shown[key] = version
+        with self._slots[key].container():
+            draw()
+
+    def tick(self):
+        # An empty delta, so Streamlit can stop the loop for a widget interaction on a quiet tick.
+        self._tick.empty()
+
+
+def build_orchestrator(topic: str, rounds: int, enable_rag: bool, debate_id: str):
+    if WARM_UP_ON_START:
+        get_backend().warm_up(with_embeddings=enable_rag)
+
+    # Indexed once per process and reused by every session until the knowledge base changes.
+    retriever = get_shared_retriever() if enable_rag else None
 
     state = DebateState(topic=topic)
     affirmative = Debater(name="Affirmative", role="AffirmativeAgent", retriever=retriever)
     negative = Debater(name="Negative", role="NegativeAgent", retriever=retriever)
     judge = Judge(name="Judge")
 
-    orch = Orchestrator(state=state, proponent=affirmative, opponent=negative, judge=judge)
-    return orch.run(rebuttal_rounds=rounds)
+    orch = Orchestrator(state=state, proponent=affirmative, opponent=negative, judge=judge,
+                        checkpoints=get_checkpoints(), debate_id=debate_id)
+    try:
+        yield from orch.run(rebuttal_rounds=rounds)
+    except (GeneratorExit, Cancelled):
+        # Reset mid-debate: drop the checkpoint once nothing can append to it.
+        if orch.checkpoints is not None:
+            orch.checkpoints.delete(debate_id)
+        raise
 
 
-def render_agents_panel():
+def render_agents_panel(slots: LiveSlots):
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.markdown("### Agents")
-    st.markdown(
-        f"<div><span class='badge badge-green'></span><b>Affirmative</b><br/><span class='subtle'>Status: {st.session_state.agent_status['Affirmative']}</span></div>",
-        unsafe_allow_html=True,
-    )
-    st.markdown("<div style='height:10px'></div>", unsafe_allow_html=True)
-    st.markdown(
-        f"<div><span class='badge badge-red'></span><b>Negative</b><br/><span class='subtle'>Status: {st.session_state.agent_status['Negative']}</span></div>",
-        unsafe_allow_html=True,
-    )
-    st.markdown("<div style='height:10px'></div>", unsafe_allow_html=True)
-    st.markdown(
-        f"<div><span class='badge badge-purple'></span><b>Judge</b><br/><span class='subtle'>Status: {st.session_state.agent_status['Judge']}</span></div>",
-        unsafe_allow_html=True,
-    )
-    st.markdown("<hr/>", unsafe_allow_html=True)
-    st.markdown(f"**System**<br/><span class='subtle'>{st.session_state.status}</span>", unsafe_allow_html=True)
+    slots.add("agents")
     st.markdown("</div>", unsafe_allow_html=True)
 
+    if st.session_state.show_metrics:
+        slots.add("metrics")
 
-def render_timeline_and_judge():
-    st.markdown("<div class='card'>", unsafe_allow_html=True)
-    st.markdown("### Stage & Judge")
-    st.markdown("<div class='subtle' style='margin-bottom:8px'>Timeline</div>", unsafe_allow_html=True)
 
-    if not st.session_state.timeline:
-        st.markdown("<div class='subtle'><i>No events yet.</i></div>", unsafe_allow_html=True)
-    else:
-        st.markdown("<ul class='timeline'>", unsafe_allow_html=True)
-        for item in list(st.session_state.timeline)[:12]:
-            cls = "muted" if ("summary" in item.lower() or "generated" in item.lower()) else ""
-            st.markdown(f"<li class='{cls}'>{item}</li>", unsafe_allow_html=True)
-        st.markdown("</ul>", unsafe_allow_html=True)
-
-    last_judge = None
-    for it in reversed(st.session_state.history):
-        if it.get("type") == "msg" and it.get("name") == "Judge":
-            last_judge = it
-            break
+def fill_agents_panel(slots: LiveSlots):
+    status = st.session_state.agent_status
+    slots.markdown("agents", "<div style='height:10px'></div>".join(
+        f"<div><span class='badge badge-{color}'></span><b>{name}</b><br/>"
+        f"<span class='subtle'>Status: {status[name]}</span></div>"
+        for name, color in (("Affirmative", "green"), ("Negative", "red"), ("Judge", "purple"))
+    ) + f"<hr/><b>System</b><br/><span class='subtle'>{st.session_state.status}</span>")
 
-    st.markdown("<div style='height:10px'></div>", unsafe_allow_html=True)
-    st.markdown("<div class='subtle'>Judge</div>", unsafe_allow_html=True)
+    if st.session_state.show_metrics:
+        slots.container("metrics", len(st.session_state.metrics), render_metrics_panel)
 
-    if last_judge:
+
+def render_metrics_panel():
+    metrics = st.session_state.metrics
+    st.markdown("<div class='card'>", unsafe_allow_html=True)
+    st.markdown("### Metrics")
+    if not metrics:
+        st.markdown("<div class='subtle'><i>No calls yet.</i></div>", unsafe_allow_html=True)
+    else:
+        gen = [m for m in metrics if m["kind"] != "retrieval"]
         st.markdown(
-            f"""
-            <div class="bubble purple">
-              <h4>⚖️ Judge ({last_judge['role']})</h4>
-              <p>{last_judge['text']}</p>
-            </div>
-            """,
+            f"<span class='subtle'>{len(metrics)} spans · "
+            f"{sum(m['prompt_tokens'] for m in metrics)} prompt tok · "
+            f"{sum(m['eval_tokens'] for m in metrics)} gen tok · "
+            f"{sum(m['wall_s'] for m in gen):.1f}s in LLM calls</span>",
             unsafe_allow_html=True,
         )
-    else:
-        st.markdown("<div class='subtle'><i>No judge output yet.</i></div>", unsafe_allow_html=True)
+        st.dataframe(
+            [
+                {
+                    "kind": m["kind"],
+                    "agent": m["agent"],
+                    "stage": m["stage"],
+                    "wall s": round(m["wall_s"], 2),
+                    "prompt": m["prompt_tokens"],
+                    "gen": m["eval_tokens"],
+                    "tok/s": round(m["tokens_per_sec"], 1),
+                }
+                for m in reversed(metrics[-30:])
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+SIDE_TURNS = 6  # turns shown per side
+
 
+def render_timeline_and_judge(slots: LiveSlots):
+    st.markdown("<div class='card'>", unsafe_allow_html=True)
+    st.markdown("### Stage & Judge")
+    st.markdown("<div class='subtle' style='margin-bottom:8px'>Timeline</div>", unsafe_allow_html=True)
+    slots.add("timeline")
+    st.markdown("<div style='height:10px'></div>", unsafe_allow_html=True)
+    st.markdown("<div class='subtle'>Judge</div>", unsafe_allow_html=True)
+    slots.add("Judge")
+    slots.add("Judge:live")
     st.markdown("</div>", unsafe_allow_html=True)
 
 
-def render_side(column_name: str, color_class: str):
-    msgs = [x for x in st.session_state.history if x.get("type") == "msg" and x.get("name") == column_name]
+def fill_timeline_and_judge(slots: LiveSlots):
+    timeline = list(st.session_state.timeline)[:12]
+    if not timeline:
+        slots.markdown("timeline", "<div class='subtle'><i>No events yet.</i></div>")
+    else:
+        slots.markdown("timeline", "<ul class='timeline'>" + "".join(
+            f"<li class='{'muted' if ('summary' in item.lower() or 'generated' in item.lower()) else ''}'>{item}</li>"
+            for item in timeline) + "</ul>")
+
+    last_judge = st.session_state.transcript.last_by_agent("Judge")
+    if last_judge:
+        slots.markdown("Judge", bubble_html(f"⚖️ Judge ({last_judge.role})", last_judge.text, "purple"))
+    elif not st.session_state.live.get("Judge"):
+        slots.markdown("Judge", "<div class='subtle'><i>No judge output yet.</i></div>")
+    else:
+        slots.markdown("Judge", "")
+    slots.markdown("Judge:live", live_html("Judge", "⚖️ Judge ({role})", "purple"))
+
+
+def render_side(slots: LiveSlots, column_name: str):
     st.markdown("<div class='card'>", unsafe_allow_html=True)
 
     badge = "badge-green" if column_name == "Affirmative" else "badge-red"
@@ -200,24 +294,26 @@ def render_side(column_name: str, color_class: str):
         unsafe_allow_html=True,
     )
     st.markdown("<div style='height:8px'></div>", unsafe_allow_html=True)
-
-    if not msgs:
-        st.markdown("<div class='subtle'><i>Waiting for first turn…</i></div>", unsafe_allow_html=True)
-    else:
-        for m in msgs[-6:]:
-            st.markdown(
-                f"""
-                <div class="bubble {color_class}">
-                  <h4>{column_name} ({m['role']})</h4>
-                  <p>{m['text']}</p>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
+    for i in range(SIDE_TURNS):
+        slots.add(f"{column_name}:{i}")
+    slots.add(f"{column_name}:live")
     st.markdown("</div>", unsafe_allow_html=True)
 
 
-def render_arena():
+def fill_side(slots: LiveSlots, column_name: str, color_class: str):
+    msgs = st.session_state.transcript.by_agent(column_name)[-SIDE_TURNS:]
+    for i in range(SIDE_TURNS):
+        if i < len(msgs):
+            html = bubble_html(f"{column_name} ({msgs[i].role})", msgs[i].text, color_class)
+        elif i == 0 and not st.session_state.live.get(column_name):
+            html = "<div class='subtle'><i>Waiting for first turn…</i></div>"
+        else:
+            html = ""
+        slots.markdown(f"{column_name}:{i}", html)
+    slots.markdown(f"{column_name}:live", live_html(column_name, column_name + " ({role})", color_class))
+
+
+def render_arena(slots: LiveSlots):
     st.markdown(
         f"""
         <div style="margin-bottom: 10px;">
@@ -230,11 +326,18 @@ def render_arena():
 
     a, mid, n = st.columns([1.25, 0.9, 1.25], gap="large")
     with a:
-        render_side("Affirmative", "green")
+        render_side(slots, "Affirmative")
     with mid:
-        render_timeline_and_judge()
+        render_timeline_and_judge(slots)
     with n:
-        render_side("Negative", "red")
+        render_side(slots, "Negative")
+
+
+def fill_view(slots: LiveSlots):
+    fill_side(slots, "Affirmative", "green")
+    fill_timeline_and_judge(slots)
+    fill_side(slots, "Negative", "red")
+    fill_agents_panel(slots)
 
 
 
@@ -243,118 +346,171 @@ with st.sidebar:
     topic = st.text_area("Debate Topic", st.session_state.topic, height=90)
     rounds = st.slider("Rebuttal rounds", 0, 5, int(st.session_state.rounds))
     enable_rag = st.checkbox("Enable RAG (Knowledge Base)", bool(st.session_state.enable_rag))
+    show_metrics = st.checkbox("Show metrics panel", bool(st.session_state.show_metrics))
 
     st.session_state.topic = topic
     st.session_state.rounds = rounds
     st.session_state.enable_rag = enable_rag
+    st.session_state.show_metrics = show_metrics
 
     c1, c2 = st.columns(2)
     start_clicked = c1.button("Start", use_container_width=True, disabled=st.session_state.running)
     reset_clicked = c2.button("Reset", use_container_width=True)
+    # A failed debate keeps its checkpoint: resuming replays the committed stages and retries the rest.
+    resume_clicked = st.session_state.failed and st.button("Resume failed debate", use_container_width=True)
 
     st.markdown("---")
     
 
 
-if reset_clicked:
-    st.session_state.running = False
-    st.session_state.status = "Reset complete."
+def apply_event(event: dict):
+    etype = event.get("type")
+
+    if etype == "stage":
+        nm = event.get("name", "")
+        push_status(f"Stage: {nm}")
+        push_timeline(f"Stage: {nm}")
+        st.session_state.agent_status["Affirmative"] = "Listening"
+        st.session_state.agent_status["Negative"] = "Listening"
+        st.session_state.agent_status["Judge"] = "Idle"
+
+    elif etype == "status":
+        txt = event.get("text", "")
+        push_status(txt)
+        push_timeline(txt)
+
+    elif etype == "delta":
+        name = event.get("agent", "Agent")
+        if name not in st.session_state.live:
+            st.session_state.live[name] = {"role": event.get("role", "Role"), "text": ""}
+            if name in st.session_state.agent_status:
+                st.session_state.agent_status[name] = "Speaking"
+        st.session_state.live[name]["text"] += event.get("text", "")
+
+    elif etype == "msg":
+        name = event.get("agent", "Agent")
+        role = event.get("role", "Role")
+        text = event.get("text", "")
+        st.session_state.live.pop(name, None)
+        push_message(name, role, text)
+
+        # mark who spoke
+        if name == "Affirmative":
+            st.session_state.agent_status["Affirmative"] = "Speaking"
+            st.session_state.agent_status["Negative"] = "Listening"
+        elif name == "Negative":
+            st.session_state.agent_status["Negative"] = "Speaking"
+            st.session_state.agent_status["Affirmative"] = "Listening"
+        elif name == "Judge":
+            st.session_state.agent_status["Judge"] = "Speaking"
+
+    elif etype == "metric":
+        st.session_state.metrics.append(event)
+
+    elif etype == "done":
+        push_status("Debate completed ✅")
+        push_timeline("Debate completed ✅")
+        st.session_state.agent_status["Affirmative"] = "Done"
+        st.session_state.agent_status["Negative"] = "Done"
+        st.session_state.agent_status["Judge"] = "Done"
+
+
+def start_debate(resume: bool = False):
+    # The debate runs on the shared worker and outlives this script run; the page only reads its events.
+    if not resume:
+        if st.session_state.failed and get_checkpoints():
+            # Starting over abandons the failed debate.
+            get_checkpoints().delete(st.session_state.debate_id)
+        st.session_state.debate_id = uuid.uuid4().hex
+        st.session_state.debate_args = (st.session_state.topic, st.session_state.rounds, st.session_state.enable_rag)
+    st.session_state.running = True
+    st.session_state.failed = False
+    st.session_state.cursor = 0
     st.session_state.history = deque(maxlen=500)
+    st.session_state.transcript = DebateState(st.session_state.debate_args[0])
     st.session_state.timeline = deque(maxlen=60)
     st.session_state.agent_status = {"Affirmative": "Idle", "Negative": "Idle", "Judge": "Idle"}
-    st.rerun()
-
-
-
-arena_col, agents_col = st.columns([4.6, 1.4], gap="large")
-
-
-arena_ph = arena_col.empty()
-agents_ph = agents_col.empty()
-
-with arena_ph.container():
-    render_arena()
-
-with agents_ph.container():
-    render_agents_panel()
-
+    st.session_state.live = {}
+    st.session_state.metrics = []
+
+    push_status("Resuming…" if resume else "Initializing…")
+    push_timeline("Resuming…" if resume else "Initializing…")
+
+    args, debate_id = st.session_state.debate_args, st.session_state.debate_id
+    get_worker().submit(lambda: build_orchestrator(*args, debate_id), job_id=debate_id,
+                        topic=args[0], rounds=args[1])
+
+
+def poll_debate() -> bool:
+    """Apply the events the worker published since the last poll; True once the debate has ended."""
+    job = get_worker().get(st.session_state.debate_id)
+    ended = job.done  # checked first: a finished job has published all of its events
+    events, st.session_state.cursor = job.events(st.session_state.cursor)
+    for event in events:
+        apply_event(event)
+    if not ended:
+        return False
+    if job.status == "error":
+        push_status(f"Error: {job.error}")
+        st.session_state.failed = True
+    st.session_state.running = False
+    st.session_state.celebrate = job.status == "done"
+    return True
 
 
-if start_clicked:
-    st.session_state.running = True
+if reset_clicked:
+    if st.session_state.debate_id:
+        # A running debate drops its own checkpoint when its generator closes; delete it
+        # here only when nothing can still append to it.
+        job = get_worker().get(st.session_state.debate_id)
+        was_idle = job is None or job.status != "running"
+        if job is not None:
+            job.cancel()
+        if was_idle and get_checkpoints():
+            get_checkpoints().delete(st.session_state.debate_id)
+    st.session_state.debate_id = None
+    st.session_state.running = False
+    st.session_state.failed = False
+    st.session_state.cursor = 0
+    st.session_state.live = {}
+    st.session_state.metrics = []
+    st.session_state.status = "Reset complete."
     st.session_state.history = deque(maxlen=500)
+    st.session_state.transcript = DebateState(st.session_state.topic)
     st.session_state.timeline = deque(maxlen=60)
     st.session_state.agent_status = {"Affirmative": "Idle", "Negative": "Idle", "Judge": "Idle"}
+    st.rerun()
 
-    push_status("Initializing…")
-    push_timeline("Initializing…")
-
-    
-    with arena_ph.container():
-        render_arena()
-    with agents_ph.container():
-        render_agents_panel()
-
-    gen = build_orchestrator(st.session_state.topic, st.session_state.rounds, st.session_state.enable_rag)
-
-    try:
-        for event in gen:
-            etype = event.get("type")
-
-            if etype == "stage":
-                nm = event.get("name", "")
-                push_status(f"Stage: {nm}")
-                push_timeline(f"Stage: {nm}")
-                st.session_state.agent_status["Affirmative"] = "Listening"
-                st.session_state.agent_status["Negative"] = "Listening"
-                st.session_state.agent_status["Judge"] = "Idle"
-
-            elif etype == "status":
-                txt = event.get("text", "")
-                push_status(txt)
-                push_timeline(txt)
-
-            elif etype == "msg":
-                name = event.get("agent", "Agent")
-                role = event.get("role", "Role")
-                text = event.get("text", "")
-                push_message(name, role, text)
-
-                # mark who spoke
-                if name == "Affirmative":
-                    st.session_state.agent_status["Affirmative"] = "Speaking"
-                    st.session_state.agent_status["Negative"] = "Listening"
-                elif name == "Negative":
-                    st.session_state.agent_status["Negative"] = "Speaking"
-                    st.session_state.agent_status["Affirmative"] = "Listening"
-                elif name == "Judge":
-                    st.session_state.agent_status["Judge"] = "Speaking"
-
-            elif etype == "done":
-                push_status("Debate completed ✅")
-                push_timeline("Debate completed ✅")
-                st.session_state.agent_status["Affirmative"] = "Done"
-                st.session_state.agent_status["Negative"] = "Done"
-                st.session_state.agent_status["Judge"] = "Done"
-
-           
-            arena_ph.empty()
-            agents_ph.empty()
-            with arena_ph.container():
-                render_arena()
-            with agents_ph.container():
-                render_agents_panel()
-
-            time.sleep(0.03)
-
-    except Exception as e:
-        push_status(f"Error: {e}")
-        arena_ph.empty()
-        agents_ph.empty()
-        with arena_ph.container():
-            render_arena()
-        with agents_ph.container():
-            render_agents_panel()
-
-    st.session_state.running = False
+if start_clicked:
+    start_debate()
+elif resume_clicked:
+    start_debate(resume=True)
+
+
+def live_view():
+    slots = LiveSlots()
+    arena_col, agents_col = st.columns([4.6, 1.4], gap="large")
+    with arena_col:
+        render_arena(slots)
+    with agents_col:
+        render_agents_panel(slots)
+
+    # Placeholders only last for one script run, so the run stays here while the debate does: each tick
+    # drains the job's new events and redraws just the bubbles they changed. A widget interaction
+    # interrupts the loop and starts a fresh run, which picks up from the same cursor.
+    while True:
+        ended = st.session_state.running and poll_debate()
+        fill_view(slots)
+        if ended:
+            # Full rerun: re-enables Start and offers Resume after an error.
+            st.rerun()
+        if not st.session_state.running:
+            return
+        slots.tick()
+        time.sleep(UI_POLL_INTERVAL)
+
+
+live_view()
+
+if st.session_state.pop("celebrate", False):
     st.balloons()
@@ -0,0 +1,208 @@
+# src/async_agents.py
+
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+import telemetry
+from config import ENABLE_STREAMING, OLLAMA_MAX_PARALLEL
+from agents import BaseAgent, Debater, Judge, Orchestrator, _annotate_prompt, _cache_for, _chat_options
+from llm_cache import cache_key
+from llm_backends import get_backend
+from debate_state import DebateState
+from stage_profiles import PointCutoff, cut_points, observe
+
+
+# One limiter per event loop, shared by every debate running on it.
+_limiter: Optional[asyncio.Semaphore] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_max_parallel = OLLAMA_MAX_PARALLEL
+
+
+def set_max_parallel(n: int) -> None:
+    global _max_parallel, _limiter
+    _max_parallel = max(1, n)
+    _limiter = None
+
+
+def get_limiter() -> asyncio.Semaphore:
+    global _limiter, _loop
+    loop = asyncio.get_running_loop()
+    if _loop is not loop or _limiter is None:
+        _loop = loop
+        _limiter = asyncio.Semaphore(_max_parallel)
+    return _limiter
+
+
+async def _llm_achat(model: str, messages: List[dict], max_tokens: int, stage: Optional[str] = None,
+                     stop: Optional[List[str]] = None, max_points: int = 0) -> str:
+    _annotate_prompt(messages)
+    opts = _chat_options(max_tokens, stop)
+    cache = _cache_for(stage)
+    if cache:
+        opts = cache.options(opts)
+        key = cache_key(model, messages, opts)
+        hit = cache.get(key)
+        if hit is not None:
+            telemetry.annotate(cached=True)
+            return hit
+    async with get_limiter():
+        text = (await get_backend().achat(model, messages, opts, stage=stage)).strip()
+    if max_points:
+        text = cut_points(text, max_points).strip()
+    if cache:
+        cache.put(key, text)
+    return text
+
+
+async def _llm_achat_stream(model: str, messages: List[dict], max_tokens: int, stage: Optional[str] = None,
+                            stop: Optional[List[str]] = None, max_points: int = 0) -> AsyncIterator[str]:
+    _annotate_prompt(messages)
+    opts = _chat_options(max_tokens, stop)
+    cache = _cache_for(stage)
+    if cache:
+        opts = cache.options(opts)
+        key = cache_key(model, messages, opts)
+        hit = cache.get(key)
+        if hit is not None:
+            telemetry.annotate(cached=True)
+            yield hit
+            return
+    # The slot stays held until the stream is drained, matching how Ollama occupies it.
+    parts = []
+    cutoff = PointCutoff(max_points)
+    async with get_limiter():
+        started = False
+        stream = get_backend().achat_stream(model, messages, opts, stage=stage)
+        try:
+            async for delta in stream:
+                if not started:
+                    delta = delta.lstrip()
+                    started = bool(delta)
+                delta = cutoff.feed(delta)
+                if delta:
+                    parts.append(delta)
+                    yield delta
+                if cutoff.done:
+                    telemetry.annotate(stopped_early=True)
+                    break
+        finally:
+            await stream.aclose()
+    if cache:
+        cache.put(key, "".join(parts).strip())
+
+
+class AsyncBaseAgent(BaseAgent):
+    async def aprompt(self, state: DebateState, stage: str, summary: Optional[str] = None) -> str:
+        # Retrieval is blocking (vector store + embeddings), so keep it off the event loop.
+        if self.retriever:
+            return await asyncio.to_thread(self.prompt, state, stage, summary)
+        return self.prompt(state, stage, summary)
+
+    async def agenerate(self, user_prompt: str, stage: str, retrieved_context: str = "") -> str:
+        messages = self._messages(user_prompt, retrieved_context)
+        model, max_tokens, control = self._generation(stage)
+        with telemetry.span("generation", agent=self.name, stage=stage, model=model) as sp:
+            text = await _llm_achat(model, messages, max_tokens, stage=stage, **control)
+        observe(stage, text, sp.eval_tokens)
+        return text
+
+    async def agenerate_stream(self, user_prompt: str, stage: str, retrieved_context: str = "") -> AsyncIterator[str]:
+        messages = self._messages(user_prompt, retrieved_context)
+        model, max_tokens, control = self._generation(stage)
+        parts = []
+        with telemetry.span("generation", agent=self.name, stage=stage, model=model) as sp:
+            async for delta in _llm_achat_stream(model, messages, max_tokens, stage=stage, **control):
+                sp.first_token()
+                parts.append(delta)
+                yield delta
+        observe(stage, "".join(parts), sp.eval_tokens)
+
+
+class AsyncDebater(AsyncBaseAgent, Debater):
+    async def aact(self, state: DebateState, stage: str, summary: Optional[str] = None) -> str:
+        return await self.agenerate(await self.aprompt(state, stage, summary), stage=stage)
+
+
+class AsyncJudge(AsyncBaseAgent, Judge):
+    async def aact(self, state: DebateState, summary: str) -> str:
+        return await self.agenerate(await self.aprompt(state, "judge", summary), stage="judge")
+
+
+class AsyncOrchestrator(AsyncBaseAgent, Orchestrator):
+    def __init__(self, state: DebateState, proponent: AsyncDebater, opponent: AsyncDebater, judge: AsyncJudge,
+                 stream: bool = ENABLE_STREAMING):
+        Orchestrator.__init__(self, state, proponent, opponent, judge, stream=stream)
+
+    async def asummarize(self, full: bool = False) -> str:
+        req = self.summarizer.request(full)
+        if req is None:
+            return self.summarizer.summary
+        messages, covered, max_tokens = req
+        with telemetry.span("summarization", agent="Summarizer", stage="summary", model=self.summarizer.model):
+            text = await _llm_achat(self.summarizer.model, messages, max_tokens, stage="summary",
+                                    stop=self.summarizer.stop)
+        return self.summarizer.accept(text, covered)
+
+    def _metrics(self, spans: List[telemetry.Span]) -> List[dict]:
+        self.spans.extend(spans)
+        return [telemetry.metric_event(sp) for sp in spans] if self.emit_metrics else []
+
+    async def _asummary_events(self, status: Optional[str] = None):
+        with telemetry.collect() as spans:
+            s = await self.asummarize()
+        events = [{"type": "status", "text": status}] if status else []
+        return s, events + self._metrics(spans)
+
+    async def _aturn(self, agent: AsyncBaseAgent, stage: str, summary: Optional[str] = None,
+                     record: bool = True) -> AsyncIterator[dict]:
+        with telemetry.collect() as spans:
+            prompt = await agent.aprompt(self.state, stage, summary)
+            if self.stream:
+                parts = []
+                async for delta in agent.agenerate_stream(prompt, stage=stage):
+                    parts.append(delta)
+                    yield {"type": "delta", "agent": agent.name, "role": agent.role, "text": delta}
+                text = "".join(parts).strip()
+            else:
+                text = await agent.agenerate(prompt, stage=stage)
+        if record:
+            self.state.add(agent.name, agent.role, text)
+        yield {"type": "msg", "agent": agent.name, "role": agent.role, "text": text}
+        for ev in self._metrics(spans):
+            yield ev
+
+    async def run(self, rebuttal_rounds: int) -> AsyncIterator[dict]:
+        self.prefetch_retrieval(rebuttal_rounds)
+        yield {"type": "stage", "name": "Opening"}
+
+        async for ev in self._aturn(self.proponent, "opening"):
+            yield ev
+        async for ev in self._aturn(self.opponent, "opening"):
+            yield ev
+
+        for i in range(rebuttal_rounds):
+            yield {"type": "stage", "name": f"Rebuttal Round {i+1}"}
+            s, events = await self._asummary_events(status="Summary generated.")
+            for ev in events:
+                yield ev
+
+            async for ev in self._aturn(self.proponent, "rebuttal", summary=s):
+                yield ev
+            async for ev in self._aturn(self.opponent, "rebuttal", summary=s):
+                yield ev
+
+        yield {"type": "stage", "name": "Closing"}
+        s2, events = await self._asummary_events()
+        for ev in events:
+            yield ev
+
+        async for ev in self._aturn(self.proponent, "closing", summary=s2):
+            yield ev
+        async for ev in self._aturn(self.opponent, "closing", summary=s2):
+            yield ev
+
+        yield {"type": "stage", "name": "Judge Summary"}
+        async for ev in self._aturn(self.judge, "judge", summary=s2, record=False):
+            yield ev
+
+        yield {"type": "done"}
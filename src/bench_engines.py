@@ -0,0 +1,95 @@
+# src/bench_engines.py
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from mock_ollama import serve
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Debates/minute: sequential engine vs async engine on a mock Ollama.")
+    parser.add_argument("--debates", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--slots", type=int, default=4, help="mock server parallel slots")
+    parser.add_argument("--max-parallel", type=int, default=None, help="async limiter size (default: --slots)")
+    parser.add_argument("--ttft", type=float, default=0.1)
+    parser.add_argument("--tps", type=float, default=200.0)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--stream", action="store_true", help="use streaming calls in both engines")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser.parse_args()
+
+
+def run_sequential(n: int, rounds: int, stream: bool) -> float:
+    from agents import Debater, Judge, Orchestrator
+    from debate_state import DebateState
+
+    start = time.perf_counter()
+    for i in range(n):
+        state = DebateState(f"Benchmark topic #{i}")
+        # parallel=False: the baseline is the straight-line engine, not the threaded DAG scheduler.
+        orch = Orchestrator(state, Debater("Proponent", "Proponent"), Debater("Opponent", "Opponent"),
+                            Judge(), stream=stream, parallel=False)
+        for _ in orch.run(rounds):
+            pass
+    return time.perf_counter() - start
+
+
+async def _one_async(i: int, rounds: int, stream: bool):
+    from async_agents import AsyncDebater, AsyncJudge, AsyncOrchestrator
+    from debate_state import DebateState
+
+    state = DebateState(f"Benchmark topic #{i}")
+    orch = AsyncOrchestrator(state, AsyncDebater("Proponent", "Proponent"), AsyncDebater("Opponent", "Opponent"),
+                             AsyncJudge(), stream=stream)
+    async for _ in orch.run(rounds):
+        pass
+
+
+def run_async(n: int, rounds: int, stream: bool, max_parallel: int) -> float:
+    import async_agents
+
+    async_agents.set_max_parallel(max_parallel)
+
+    async def _all():
+        await asyncio.gather(*(_one_async(i, rounds, stream) for i in range(n)))
+
+    start = time.perf_counter()
+    asyncio.run(_all())
+    return time.perf_counter() - start
+
+
+def main():
+    args = _parse_args()
+    server = serve(ttft=args.ttft, tokens_per_sec=args.tps, num_tokens=args.tokens, slots=args.slots)
+    # The ollama package reads OLLAMA_HOST when its default client is created, so set it before importing agents.
+    os.environ["OLLAMA_HOST"] = server.url
+
+    seq = run_sequential(args.debates, args.rounds, args.stream)
+    conc = run_async(args.debates, args.rounds, args.stream, args.max_parallel or args.slots)
+    server.shutdown()
+
+    results = {
+        "debates": args.debates,
+        "rounds": args.rounds,
+        "slots": args.slots,
+        "sequential_s": round(seq, 3),
+        "async_s": round(conc, 3),
+        "sequential_debates_per_min": round(args.debates / seq * 60, 2),
+        "async_debates_per_min": round(args.debates / conc * 60, 2),
+        "speedup": round(seq / conc, 2),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.debates} debates x {args.rounds} rebuttal round(s), {args.slots} server slots")
+    print(f"  sequential: {results['sequential_s']:>8.2f}s  {results['sequential_debates_per_min']:>8.2f} debates/min")
+    print(f"  async:      {results['async_s']:>8.2f}s  {results['async_debates_per_min']:>8.2f} debates/min")
+    print(f"  speedup:    {results['speedup']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
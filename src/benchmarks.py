@@ -0,0 +1,446 @@
+# src/benchmarks.py
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from mock_ollama import serve
+
+VOCAB = (
+    "resource sustainable economy growth forest fishery mineral water energy policy market regulation "
+    "investment emission carbon biodiversity yield extraction revenue community future generation "
+    "tax subsidy trade export import land soil climate risk evidence study report data government"
+).split()
+
+
+def _log(msg: str) -> None:
+    print(f"[BENCH] {msg}", file=sys.stderr, flush=True)
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(p / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def latency_stats(samples: List[float], prefix: str) -> Dict[str, float]:
+    ms = [s * 1000 for s in samples]
+    return {
+        f"{prefix}_p50_ms": round(percentile(ms, 50), 3),
+        f"{prefix}_p95_ms": round(percentile(ms, 95), 3),
+        f"{prefix}_p99_ms": round(percentile(ms, 99), 3),
+        f"{prefix}_mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+    }
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[str], line_chars: int = 90) -> None:
+    # Minimal single-font PDF writer, enough for PyPDFLoader to extract the text.
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        words, lines, cur = text.split(), [], ""
+        for w in words:
+            if len(cur) + len(w) + 1 > line_chars:
+                lines.append(cur)
+                cur = w
+            else:
+                cur = f"{cur} {w}".strip()
+        if cur:
+            lines.append(cur)
+        ops = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({_pdf_escape(ln)}) '" for ln in lines) + " ET"
+        objects.append(f"<< /Length {len(ops)} >>\nstream\n{ops}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def make_corpus(directory: str, docs: int, pages: int, words_per_page: int, seed: int = 7) -> int:
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    for d in range(docs):
+        texts = [" ".join(rng.choice(VOCAB) for _ in range(words_per_page)) for _ in range(pages)]
+        write_pdf(os.path.join(directory, f"doc_{d:04d}.pdf"), texts)
+    return docs * pages
+
+
+def bench_debate(rounds_list: List[int], repeat: int) -> Dict[str, dict]:
+    from agents import Debater, Judge, Orchestrator
+    from debate_state import DebateState
+
+    out = {}
+    for rounds in rounds_list:
+        walls, par_walls, stages = [], [], {}
+        for _ in range(repeat):
+            # Sequential, non-streaming run: the gap before each msg is the cost of the call behind it,
+            # minus any summary computed in between (timed separately).
+            state = DebateState("Benchmark topic")
+            orch = Orchestrator(state, Debater("Proponent", "Proponent"), Debater("Opponent", "Opponent"),
+                                Judge(), stream=False, parallel=False)
+            summary_s = []
+            summarize = orch.summarize
+
+            def timed_summarize(full=False, _inner=summarize, _acc=summary_s):
+                t = time.perf_counter()
+                try:
+                    return _inner(full)
+                finally:
+                    _acc.append(time.perf_counter() - t)
+
+            orch.summarize = timed_summarize
+            stage_name, seen = "", 0
+            t0 = last = time.perf_counter()
+            for ev in orch.run(rounds):
+                now = time.perf_counter()
+                spent = sum(summary_s[seen:])
+                if len(summary_s) > seen:
+                    stages.setdefault("summary", []).extend(summary_s[seen:])
+                    seen = len(summary_s)
+                if ev["type"] == "stage":
+                    stage_name = ev["name"].split(" ")[0].lower()
+                elif ev["type"] == "msg":
+                    stages.setdefault(stage_name, []).append(now - last - spent)
+                last = now
+            walls.append(time.perf_counter() - t0)
+
+            state = DebateState("Benchmark topic")
+            orch = Orchestrator(state, Debater("Proponent", "Proponent"), Debater("Opponent", "Opponent"),
+                                Judge(), stream=False, parallel=True)
+            t0 = time.perf_counter()
+            for _ in orch.run(rounds):
+                pass
+            par_walls.append(time.perf_counter() - t0)
+
+        out[f"rounds_{rounds}"] = {
+            "wall_s": round(statistics.median(walls), 4),
+            "wall_parallel_s": round(statistics.median(par_walls), 4),
+            "stage_mean_s": {k: round(statistics.fmean(v), 4) for k, v in sorted(stages.items())},
+        }
+        _log(f"debate rounds={rounds}: {out[f'rounds_{rounds}']['wall_s']}s")
+    return out
+
+
+def bench_summary(turns: int, repeat: int) -> dict:
+    from agents import RollingSummarizer
+    from debate_state import DebateState
+
+    rng = random.Random(11)
+    state = DebateState("Benchmark topic")
+    for i in range(turns):
+        state.add("Proponent" if i % 2 == 0 else "Opponent", "Debater",
+                  " ".join(rng.choice(VOCAB) for _ in range(120)))
+
+    as_text = []
+    for _ in range(max(repeat, 20)):
+        t0 = time.perf_counter()
+        state.as_text()
+        as_text.append(time.perf_counter() - t0)
+
+    full, rolling = [], []
+    for _ in range(repeat):
+        summarizer = RollingSummarizer(state, mode="rolling")
+        t0 = time.perf_counter()
+        summarizer.summarize(full=True)
+        full.append(time.perf_counter() - t0)
+        state.add("Proponent", "Debater", " ".join(rng.choice(VOCAB) for _ in range(120)))
+        state.add("Opponent", "Debater", " ".join(rng.choice(VOCAB) for _ in range(120)))
+        t0 = time.perf_counter()
+        summarizer.summarize()
+        rolling.append(time.perf_counter() - t0)
+
+    res = {"turns": turns, "history_chars": len(state.as_text())}
+    res.update(latency_stats(as_text, "as_text"))
+    res.update(latency_stats(full, "full"))
+    res.update(latency_stats(rolling, "rolling"))
+    _log(f"summary: full p50={res['full_p50_ms']}ms rolling p50={res['rolling_p50_ms']}ms")
+    return res
+
+
+def _rag_pass(kb: str, store: str, queries: int, k: int, reindex: bool) -> Tuple[int, float, List[float]]:
+    from config import CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL
+    from rag_pipeline import get_retriever, index_knowledge_base, store_count
+
+    t0 = time.perf_counter()
+    vs = index_knowledge_base(kb, store, EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, reindex=reindex)
+    index_s = time.perf_counter() - t0
+    if vs is None:
+        raise RuntimeError("indexing failed")
+
+    retriever = get_retriever(vs, k=k)
+    rng = random.Random(3)
+    samples = []
+    for _ in range(queries):
+        q = " ".join(rng.choice(VOCAB) for _ in range(12))
+        t0 = time.perf_counter()
+        retriever.invoke(q)
+        samples.append(time.perf_counter() - t0)
+    return store_count(vs), index_s, samples
+
+
+def bench_rag(workdir: str, docs: int, pages: int, words_per_page: int, queries: int, k: int) -> dict:
+    from embedding_cache import EmbeddingCache, reset_embedding_cache, set_embedding_cache
+
+    kb = os.path.join(workdir, "knowledge")
+    store = os.path.join(workdir, "chroma_db")
+    page_count = make_corpus(kb, docs, pages, words_per_page)
+
+    # The corpus and queries are fixed, so the shared embedding cache would turn every run after the first
+    # into cache hits. Use an empty one in the workdir instead: the first pass embeds everything (cold),
+    # the second rebuilds the index from scratch with every chunk and query cached (warm).
+    set_embedding_cache(EmbeddingCache(os.path.join(workdir, "embeddings.sqlite")))
+    try:
+        chunk_count, index_s, samples = _rag_pass(kb, store, queries, k, reindex=False)
+        _, warm_index_s, warm_samples = _rag_pass(kb, store, queries, k, reindex=True)
+    finally:
+        reset_embedding_cache()
+
+    res = {
+        "docs": docs,
+        "pages": page_count,
+        "chunks": chunk_count,
+        "index_s": round(index_s, 4),
+        "index_chunks_per_s": round(chunk_count / index_s, 2) if index_s else 0.0,
+        "warm_index_s": round(warm_index_s, 4),
+        "warm_index_chunks_per_s": round(chunk_count / warm_index_s, 2) if warm_index_s else 0.0,
+    }
+    res.update(latency_stats(samples, "retrieval"))
+    res.update(latency_stats(warm_samples, "warm_retrieval"))
+    _log(f"rag: {chunk_count} chunks indexed at {res['index_chunks_per_s']}/s cold, "
+         f"{res['warm_index_chunks_per_s']}/s warm; retrieval p99={res['retrieval_p99_ms']}ms cold, "
+         f"{res['warm_retrieval_p99_ms']}ms warm")
+    return res
+
+
+class _FixedEmbeddings:
+    # Query embedding is not what these stores are compared on; vectors are passed in directly.
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+
+def _open_store(backend: str, path: str):
+    if backend == "numpy":
+        from numpy_store import NumpyVectorStore
+        return NumpyVectorStore(path, _FixedEmbeddings())
+    from langchain_chroma import Chroma
+    return Chroma(persist_directory=path, embedding_function=_FixedEmbeddings())
+
+
+def _cold_start(backend: str, path: str, query: List[float], k: int, out) -> None:
+    # Runs in a freshly spawned interpreter: import + open + first query, as a new process would see it.
+    t0 = time.perf_counter()
+    if backend == "numpy":
+        import numpy_store  # noqa: F401
+    else:
+        import langchain_chroma  # noqa: F401
+    t1 = time.perf_counter()
+    vs = _open_store(backend, path)
+    t2 = time.perf_counter()
+    vs.similarity_search_by_vector(query, k=k)
+    t3 = time.perf_counter()
+    out.put({"import_s": t1 - t0, "open_s": t2 - t1, "first_query_s": t3 - t2})
+
+
+def bench_vectors(workdir: str, rows: int, dim: int, queries: int, k: int, batch: int = 5000) -> dict:
+    """Chroma vs the memory-mapped numpy store on identical random unit vectors."""
+    import multiprocessing
+
+    import numpy as np
+
+    from rag_pipeline import store_count, store_persist, store_upsert
+
+    rng = np.random.default_rng(11)
+    res = {"rows": rows, "dim": dim}
+    qs = rng.standard_normal((queries, dim)).astype(np.float32)
+    for backend in ("chroma", "numpy"):
+        path = os.path.join(workdir, backend)
+        vs = _open_store(backend, path)
+        t0 = time.perf_counter()
+        for start in range(0, rows, batch):
+            n = min(batch, rows - start)
+            vecs = rng.standard_normal((n, dim)).astype(np.float32)
+            store_upsert(vs, [f"c{start + i}" for i in range(n)], vecs.tolist(),
+                         [f"chunk {start + i}" for i in range(n)], [{"source": f"doc{(start + i) // 50}.pdf"} for i in range(n)])
+        store_persist(vs)
+        build_s = time.perf_counter() - t0
+        assert store_count(vs) == rows
+
+        samples = []
+        for q in qs:
+            t0 = time.perf_counter()
+            vs.similarity_search_by_vector(q.tolist(), k=k)
+            samples.append(time.perf_counter() - t0)
+        stats = {"build_s": round(build_s, 4), **latency_stats(samples, "query")}
+        if backend == "numpy":
+            t0 = time.perf_counter()
+            vs.search_vectors(qs, k)
+            stats["batch_query_per_s"] = round(queries / (time.perf_counter() - t0), 2)
+
+        ctx = multiprocessing.get_context("spawn")
+        out = ctx.Queue()
+        proc = ctx.Process(target=_cold_start, args=(backend, path, qs[0].tolist(), k, out))
+        proc.start()
+        cold = out.get(timeout=300)
+        proc.join()
+        stats.update({f"cold_{name}": round(v, 4) for name, v in cold.items()})
+        stats["cold_total_s"] = round(sum(cold.values()), 4)
+        res[backend] = stats
+        del vs
+        _log(f"vectors/{backend}: {rows} rows, query p99={stats['query_p99_ms']}ms, "
+             f"cold start={stats['cold_total_s']}s")
+    return res
+
+
+def flatten(d: dict, prefix: str = "") -> Dict[str, float]:
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            out.update(flatten(v, key))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+
+def _direction(metric: str) -> int:
+    # +1: higher is better, -1: lower is better, 0: informational.
+    leaf = metric.rsplit(".", 1)[-1]
+    if leaf.endswith("_per_s") or leaf.endswith("_per_min"):
+        return 1
+    if leaf.endswith("_s") or leaf.endswith("_ms"):
+        return -1
+    return 0
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[dict]:
+    cur, base = flatten(current), flatten(baseline)
+    regressions = []
+    for name, value in cur.items():
+        direction = _direction(name)
+        old = base.get(name)
+        if not direction or not old:
+            continue
+        change = (value - old) / old
+        if (direction < 0 and change > threshold) or (direction > 0 and -change > threshold):
+            regressions.append({"metric": name, "baseline": old, "current": value, "change": round(change, 4)})
+    return regressions
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Debate / summarization / RAG benchmarks against a mock Ollama.")
+    parser.add_argument("--cases", default="debate,summary,rag",
+                        help="comma-separated: debate,summary,rag,vectors")
+    parser.add_argument("--rounds", default="0,1,2,3,4,5", help="rebuttal rounds to benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--summary-turns", type=int, default=12)
+    parser.add_argument("--docs", type=int, default=20, help="synthetic PDFs in the knowledge corpus")
+    parser.add_argument("--pages", type=int, default=5, help="pages per synthetic PDF")
+    parser.add_argument("--words-per-page", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--vector-rows", type=int, default=50000, help="rows in the chroma vs numpy comparison")
+    parser.add_argument("--vector-dim", type=int, default=768)
+    parser.add_argument("--ttft", type=float, default=0.05, help="mock time-to-first-token (s)")
+    parser.add_argument("--tps", type=float, default=500.0, help="mock tokens per second")
+    parser.add_argument("--prefill-tps", type=float, default=4000.0, help="mock prompt tokens per second")
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--embed-latency", type=float, default=0.0005, help="mock seconds per embedded text")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change flagged as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_args()
+    cases = {c.strip() for c in args.cases.split(",") if c.strip()}
+    server = serve(ttft=args.ttft, tokens_per_sec=args.tps, num_tokens=args.tokens, slots=args.slots,
+                   embed_latency=args.embed_latency, prefill_tokens_per_sec=args.prefill_tps)
+    # Point every Ollama client at the mock before anything creates one.
+    os.environ["OLLAMA_HOST"] = server.url
+    from llm_backends import set_backend
+
+    set_backend("ollama")
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mock": {"ttft": args.ttft, "tps": args.tps, "prefill_tps": args.prefill_tps, "tokens": args.tokens,
+                     "slots": args.slots, "embed_latency": args.embed_latency},
+        },
+    }
+    if "debate" in cases:
+        rounds = [int(r) for r in args.rounds.split(",") if r.strip()]
+        results["debate"] = bench_debate(rounds, args.repeat)
+    if "summary" in cases:
+        results["summary"] = bench_summary(args.summary_turns, args.repeat)
+    if "rag" in cases:
+        workdir = tempfile.mkdtemp(prefix="debate-bench-")
+        try:
+            results["rag"] = bench_rag(workdir, args.docs, args.pages, args.words_per_page, args.queries, args.k)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if "vectors" in cases:
+        workdir = tempfile.mkdtemp(prefix="debate-bench-")
+        try:
+            results["vectors"] = bench_vectors(workdir, args.vector_rows, args.vector_dim, args.queries, args.k)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    server.shutdown()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare({k: v for k, v in results.items() if k != "meta"},
+                              {k: v for k, v in baseline.items() if k != "meta"}, args.threshold)
+        results["regressions"] = regressions
+        for r in regressions:
+            _log(f"REGRESSION {r['metric']}: {r['baseline']} -> {r['current']} ({r['change']:+.1%})")
+        if not regressions:
+            _log(f"No regressions beyond {args.threshold:.0%} vs {args.baseline}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    _log(f"Results written to {args.out}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# src/bm25_index.py
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from config import BM25_K1, BM25_B
+
+INDEX_VERSION = 1
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the their this to was were "
+    "will with which not no they them these those than then there been being into over such can could".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS and len(t) > 1]
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index persisted as NumPy arrays.
+
+    Postings are stored term-major: term t owns rows[offsets[t]:offsets[t + 1]] with matching
+    term frequencies, so scoring a query touches only the postings of its terms. Writes
+    (add/delete) are buffered and folded into the arrays by one vectorised compaction.
+    """
+
+    def __init__(self, path: str, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._load()
+
+    # Loading / persistence
+
+    def _empty(self) -> None:
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metas: List[dict] = []
+        self.lengths = np.zeros(0, dtype=np.int32)
+        self.terms: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.rows = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.float32)
+
+    def _load(self) -> None:
+        self._empty()
+        meta_path = os.path.join(self.path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") == INDEX_VERSION:
+                self.terms = meta["terms"]
+                self.offsets = np.load(os.path.join(self.path, "offsets.npy"))
+                self.rows = np.load(os.path.join(self.path, "rows.npy"), mmap_mode="r")
+                self.tfs = np.load(os.path.join(self.path, "tfs.npy"), mmap_mode="r")
+                self.lengths = np.load(os.path.join(self.path, "lengths.npy"))
+                with open(os.path.join(self.path, "docs.jsonl"), encoding="utf-8") as f:
+                    for line in f:
+                        row = json.loads(line)
+                        self.ids.append(row["id"])
+                        self.texts.append(row["text"])
+                        self.metas.append(row["metadata"])
+        self._row = {cid: i for i, cid in enumerate(self.ids)}
+        self._alive = np.ones(len(self.ids), dtype=bool)
+        self._pending: List[Tuple[int, Counter]] = []  # (row, term counts) not yet in the arrays
+        self._pending_lengths: List[int] = []
+        self._norm = None
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._pending) or not self._alive.all()
+
+    def persist(self) -> None:
+        self._compact()
+        os.makedirs(self.path, exist_ok=True)
+        arrays = {"offsets": self.offsets, "rows": np.asarray(self.rows), "tfs": np.asarray(self.tfs),
+                  "lengths": self.lengths}
+        for name, arr in arrays.items():
+            with open(os.path.join(self.path, name + ".npy.tmp"), "wb") as f:
+                np.save(f, arr)
+        with open(os.path.join(self.path, "docs.jsonl.tmp"), "w", encoding="utf-8") as f:
+            for cid, text, meta in zip(self.ids, self.texts, self.metas):
+                f.write(json.dumps({"id": cid, "text": text, "metadata": meta}) + "\n")
+        with open(os.path.join(self.path, "meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "docs": len(self.ids), "terms": self.terms}, f)
+        # meta.json goes last: a reader only trusts the arrays once it has been replaced.
+        for name in list(arrays) + ["docs"]:
+            ext = ".jsonl" if name == "docs" else ".npy"
+            os.replace(os.path.join(self.path, name + ext + ".tmp"), os.path.join(self.path, name + ext))
+        os.replace(os.path.join(self.path, "meta.json.tmp"), os.path.join(self.path, "meta.json"))
+        self._load()
+
+    # Writes
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], metadatas: Optional[Sequence[dict]] = None) -> None:
+        metadatas = metadatas or [{}] * len(ids)
+        for cid, text, meta in zip(ids, texts, metadatas):
+            old = self._row.get(cid)
+            if old is not None:
+                self._alive[old] = False
+            row = len(self.ids)
+            tokens = tokenize(text)
+            self.ids.append(cid)
+            self.texts.append(text)
+            self.metas.append(dict(meta or {}))
+            self._row[cid] = row
+            self._pending.append((row, Counter(tokens)))
+            self._pending_lengths.append(len(tokens))
+        self._alive = np.concatenate([self._alive, np.ones(len(self.ids) - len(self._alive), dtype=bool)])
+
+    def delete(self, ids: Iterable[str]) -> None:
+        for cid in ids:
+            row = self._row.pop(cid, None)
+            if row is not None:
+                self._alive[row] = False
+
+    def reset(self) -> None:
+        self._alive[:] = False
+        self._row.clear()
+
+    def _compact(self) -> None:
+        if not self.dirty:
+            return
+        n_terms = len(self.terms)
+        base_terms = np.repeat(np.arange(n_terms, dtype=np.int64), np.diff(self.offsets))
+        base_rows = np.asarray(self.rows, dtype=np.int64)
+        base_tfs = np.asarray(self.tfs, dtype=np.float32)
+
+        new_t, new_r, new_tf = [], [], []
+        for row, counts in self._pending:
+            if not self._alive[row]:
+                continue
+            for term, tf in counts.items():
+                tid = self.terms.get(term)
+                if tid is None:
+                    tid = self.terms[term] = len(self.terms)
+                new_t.append(tid)
+                new_r.append(row)
+                new_tf.append(tf)
+
+        all_t = np.concatenate([base_terms, np.asarray(new_t, dtype=np.int64)])
+        all_r = np.concatenate([base_rows, np.asarray(new_r, dtype=np.int64)])
+        all_tf = np.concatenate([base_tfs, np.asarray(new_tf, dtype=np.float32)])
+        keep = self._alive[all_r]
+        all_t, all_r, all_tf = all_t[keep], all_r[keep], all_tf[keep]
+
+        # Renumber surviving rows and terms, then regroup postings term-major.
+        new_row = np.cumsum(self._alive) - 1
+        counts = np.bincount(all_t, minlength=len(self.terms))
+        live_terms = counts > 0
+        new_tid = np.cumsum(live_terms) - 1
+        order = np.argsort(all_t, kind="stable")
+        self.rows = new_row[all_r[order]].astype(np.int32)
+        self.tfs = all_tf[order]
+        self.offsets = np.concatenate([[0], np.cumsum(counts[live_terms])]).astype(np.int64)
+        self.terms = {t: int(new_tid[i]) for t, i in self.terms.items() if live_terms[i]}
+
+        lengths = np.concatenate([self.lengths, np.asarray(self._pending_lengths, dtype=np.int32)])
+        alive_rows = np.flatnonzero(self._alive)
+        self.lengths = lengths[alive_rows]
+        self.ids = [self.ids[i] for i in alive_rows]
+        self.texts = [self.texts[i] for i in alive_rows]
+        self.metas = [self.metas[i] for i in alive_rows]
+        self._row = {cid: i for i, cid in enumerate(self.ids)}
+        self._alive = np.ones(len(self.ids), dtype=bool)
+        self._pending = []
+        self._pending_lengths = []
+        self._norm = None
+
+    # Reads
+
+    def count(self) -> int:
+        return int(self._alive.sum())
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """(row, score) of the k best-scoring documents; rows index ids/texts/metas."""
+        self._compact()
+        n = len(self.ids)
+        if not n or k <= 0:
+            return []
+        if self._norm is None:
+            avg_len = float(self.lengths.mean()) or 1.0
+            self._norm = (self.k1 * (1.0 - self.b + self.b * self.lengths / avg_len)).astype(np.float32)
+        norm = self._norm
+        scores = np.zeros(n, dtype=np.float32)
+        for term, qtf in Counter(tokenize(query)).items():
+            tid = self.terms.get(term)
+            if tid is None:
+                continue
+            lo, hi = self.offsets[tid], self.offsets[tid + 1]
+            rows = self.rows[lo:hi]
+            tf = self.tfs[lo:hi]
+            df = hi - lo
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            scores[rows] += qtf * idf * tf * (self.k1 + 1.0) / (tf + norm[rows])
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(int(r), float(scores[r])) for r in hits]
+
+    def document(self, row: int) -> Document:
+        return Document(page_content=self.texts[row], metadata=self.metas[row], id=self.ids[row])
+
+    def search_documents(self, query: str, k: int) -> List[Document]:
+        return [self.document(row) for row, _ in self.search(query, k)]
+
+
+class BM25Retriever(BaseRetriever):
+    """Lexical retrieval only: no embedding call."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: Any
+    k: int = 3
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.index.search_documents(query, self.k)
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 picks prefilter_k candidates, which are reranked by cosine similarity to the query embedding.
+
+    vectors_for(ids) returns (found ids, matrix) for stored chunks, so candidates are never re-embedded.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: Any
+    embed_query: Callable[[str], List[float]]
+    vectors_for: Callable[[List[str]], Tuple[List[str], np.ndarray]]
+    fallback: Optional[Callable[[str, int], List[Document]]] = None
+    k: int = 3
+    prefilter_k: int = 50
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        candidates = self.index.search(query, self.prefilter_k)
+        if not candidates:
+            return self.fallback(query, self.k) if self.fallback else []
+        docs = {self.index.ids[row]: self.index.document(row) for row, _ in candidates}
+        ids, matrix = self.vectors_for(list(docs))
+        if not ids:
+            return [self.index.document(row) for row, _ in candidates[:self.k]]
+        q = np.asarray(self.embed_query(query), dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        m = np.asarray(matrix, dtype=np.float32)
+        m = m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+        order = np.argsort(-(m @ q))[:self.k]
+        return [docs[ids[i]] for i in order]
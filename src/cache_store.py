@@ -0,0 +1,157 @@
+# src/cache_store.py
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class MemoryLRU:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._data: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._data[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, dropped = self._data.popitem(last=False)
+                self.size -= len(dropped)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+
+class SQLiteLRU:
+    """Byte values in one SQLite table, evicted least-recently-used once over max_bytes."""
+
+    def __init__(self, path: str, max_bytes: int, table: str = "entries"):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.table = table
+        self.evictions = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_used ON {table}(last_used)")
+        self.size = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (time.time(), key))
+            return bytes(row[0])
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table}(key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            self.size += len(value) - (old[0] if old else 0)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        """Batched get: one transaction instead of a read and an update per key."""
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(f"SELECT key, value FROM {self.table} WHERE key IN ({marks})", part)
+                found.update((k, bytes(v)) for k, v in rows)
+            if found:
+                now = time.time()
+                self._conn.execute("BEGIN")
+                self._conn.executemany(f"UPDATE {self.table} SET last_used = ? WHERE key = ?",
+                                       [(now, k) for k in found])
+                self._conn.execute("COMMIT")
+        return found
+
+    def put_many(self, items: Dict[str, bytes]) -> None:
+        items = {k: v for k, v in items.items() if len(v) <= self.max_bytes}
+        if not items:
+            return
+        with self._lock:
+            keys = list(items)
+            old = 0
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                old += self._conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM {self.table} WHERE key IN ({marks})", part).fetchone()[0]
+            now = time.time()
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table}(key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                [(k, v, len(v), now) for k, v in items.items()],
+            )
+            self._conn.execute("COMMIT")
+            self.size += sum(len(v) for v in items.values()) - old
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Trim to 90% so a full cache does not evict on every insert.
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_used ASC").fetchall()
+        drop = []
+        for key, size in rows:
+            if self.size <= target:
+                break
+            drop.append((key,))
+            self.size -= size
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", drop)
+        self.evictions += len(drop)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self.size = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,97 @@
+# src/checkpoints.py
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from config import DEBATE_CHECKPOINTS, DEBATE_CHECKPOINT_PATH
+
+
+class DebateCheckpoints:
+    """Append-only log of committed debate stages in SQLite, one row per stage.
+
+    A row holds the stage's result, the events its commit emitted, the turns it added to
+    DebateState and, when it changed, the summarizer state: everything needed to rebuild the
+    debate up to that stage without calling a model.
+    """
+
+    def __init__(self, path: str = DEBATE_CHECKPOINT_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS debates ("
+            "id TEXT PRIMARY KEY, topic TEXT NOT NULL, rounds INTEGER NOT NULL, "
+            "created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stages ("
+            "debate_id TEXT NOT NULL, seq INTEGER NOT NULL, key TEXT NOT NULL, value TEXT, "
+            "events TEXT NOT NULL, turns TEXT NOT NULL, summarizer TEXT, PRIMARY KEY (debate_id, seq))"
+        )
+
+    def begin(self, debate_id: str, topic: str, rounds: int) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO debates VALUES (?, ?, ?, ?, ?)",
+                               (debate_id, topic, rounds, now, now))
+
+    def append(self, debate_id: str, seq: int, key: str, value, events: List[dict], turns: List[dict],
+               summarizer: Optional[dict] = None) -> None:
+        row = (debate_id, seq, key, json.dumps(value), json.dumps(events), json.dumps(turns),
+               json.dumps(summarizer) if summarizer is not None else None)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            self._conn.execute("UPDATE debates SET updated = ? WHERE id = ?", (time.time(), debate_id))
+            self._conn.execute("COMMIT")
+
+    def load(self, debate_id: str) -> Optional[dict]:
+        with self._lock:
+            meta = self._conn.execute("SELECT topic, rounds FROM debates WHERE id = ?", (debate_id,)).fetchone()
+            if meta is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT key, value, events, turns, summarizer FROM stages WHERE debate_id = ? ORDER BY seq",
+                (debate_id,)).fetchall()
+        stages = [{"key": key, "value": json.loads(value), "events": json.loads(events), "turns": json.loads(turns),
+                   "summarizer": json.loads(summ) if summ else None}
+                  for key, value, events, turns, summ in rows]
+        return {"id": debate_id, "topic": meta[0], "rounds": meta[1], "stages": stages}
+
+    def unfinished(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.id, d.topic, d.rounds, d.updated, COUNT(s.seq) FROM debates d "
+                "LEFT JOIN stages s ON s.debate_id = d.id GROUP BY d.id ORDER BY d.updated DESC").fetchall()
+        return [{"id": r[0], "topic": r[1], "rounds": r[2], "updated": r[3], "stages": r[4]} for r in rows]
+
+    def delete(self, debate_id: str) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM stages WHERE debate_id = ?", (debate_id,))
+            self._conn.execute("DELETE FROM debates WHERE id = ?", (debate_id,))
+            self._conn.execute("COMMIT")
+
+
+_store: Optional[DebateCheckpoints] = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoints() -> Optional[DebateCheckpoints]:
+    global _store
+    if not DEBATE_CHECKPOINTS:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = DebateCheckpoints()
+        return _store
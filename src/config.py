@@ -2,9 +2,80 @@
 DEBATE_TOPIC = "Should nations prioritize sustainable use over economic exploitation of natural resources?"
 NUMBER_OF_REBUTTAL_ROUNDS = 2  
 
+# Emit "delta" events with partial tokens before each final "msg" event
+ENABLE_STREAMING = True
+
 #Model configuration
 DEFAULT_MODEL = "dolphin-phi:latest"
-SUMMARY_MODEL = DEFAULT_MODEL
+SUMMARY_MODEL = DEFAULT_MODEL         # summaries and the judge (STAGE_PROFILES); point at a smaller model to cut latency
+
+#LLM backend: "ollama" (live server) or "stub" (deterministic, offline; for benchmarking)
+LLM_BACKEND = "ollama"
+STUB_TTFT = 0.2                       # seconds before the first token
+STUB_TOKENS_PER_SEC = 50.0            # 0 -> no generation delay
+STUB_NUM_TOKENS = 60                  # tokens per completion (capped by num_predict)
+STUB_EMBED_DIM = 256
+STUB_TEXT = (
+    "1. Sustainable use preserves resources for future generations and stabilizes long-term growth. "
+    "2. Exploitation delivers short-term revenue but externalizes environmental costs onto society. "
+    "3. Evidence from fisheries and forestry shows managed yields outperform boom-and-bust cycles."
+)
+
+#Ollama server
+OLLAMA_HOST = None                    # None -> $OLLAMA_HOST or http://localhost:11434
+OLLAMA_MAX_PARALLEL = 4               # keep <= the server's OLLAMA_NUM_PARALLEL
+OLLAMA_KEEP_ALIVE = "30m"             # keep models loaded between turns
+OLLAMA_POOL_SIZE = 8                  # pooled HTTP connections shared by all callers
+OLLAMA_CONNECT_TIMEOUT = 5.0
+OLLAMA_TIMEOUTS = {                   # read timeouts (seconds) per stage
+    "default": 120,
+    "opening": 180,
+    "rebuttal": 150,
+    "closing": 150,
+    "judge": 120,
+    "summary": 90,
+    "embed": 60,
+    "warmup": 300,
+}
+OLLAMA_MAX_RETRIES = 2                # retries on connection errors, timeouts and 5xx
+OLLAMA_RETRY_BACKOFF = 0.5            # seconds, doubled on each retry
+WARM_UP_ON_START = True               # load DEFAULT_MODEL / EMBEDDING_MODEL before the first debate
+
+#Turn scheduling
+PARALLEL_TURNS = True                 # run independent calls (e.g. both openings) concurrently
+SCHEDULER_MAX_WORKERS = OLLAMA_MAX_PARALLEL
+
+#Telemetry: per-call spans emitted as "metric" events
+ENABLE_TELEMETRY = True
+
+#Batch runs (python main.py --topics FILE)
+BATCH_WORKERS = 2                     # worker processes; each loads the RAG index and client once
+BATCH_OUTPUT_PATH = "./debates.jsonl"
+
+#Background debate worker (shared by every UI session in the process)
+DEBATE_WORKERS = 2                    # debates generating at once; more wait their turn
+DEBATE_JOB_TTL = 3600                 # seconds a finished job's events stay readable
+UI_POLL_INTERVAL = 0.25               # seconds between UI polls of a running job's events
+
+#HTTP/SSE service (python server.py)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_MAX_RUNNING = max(1, OLLAMA_MAX_PARALLEL // 2)   # a debate keeps up to 2 model calls in flight
+SERVER_MAX_QUEUED = 16                # debates waiting for a slot; more are refused with 429
+SERVER_MAX_ROUNDS = 5
+SERVER_SSE_KEEPALIVE = 15.0           # seconds between keep-alive comments on an idle event stream
+
+#Debate checkpoints: every committed stage is logged so an interrupted debate resumes where it stopped
+DEBATE_CHECKPOINTS = True
+DEBATE_CHECKPOINT_PATH = "./.cache/debates.sqlite"
+
+#LLM response cache (content-addressed by model, messages and options)
+ENABLE_LLM_CACHE = False
+LLM_CACHE_PATH = "./.cache/llm_responses.sqlite"   # None -> memory tier only
+LLM_CACHE_STAGES = ("opening", "rebuttal", "closing", "judge", "summary")
+LLM_CACHE_MEMORY_MAX_BYTES = 16 * 1024 * 1024
+LLM_CACHE_DISK_MAX_BYTES = 256 * 1024 * 1024
+LLM_CACHE_DETERMINISTIC_OPTIONS = {"temperature": 0, "seed": 42}
 
 #RAG Configuration
 KB_DIRECTORY = "./knowledge"          
@@ -14,6 +85,27 @@ CHUNK_SIZE = 500
 CHUNK_OVERLAP = 50
 ENABLE_RAG = True
 RETRIEVER_K = 3
+RETRIEVAL_MODE = "vector"             # "vector", "bm25" (lexical, no embedding call) or "hybrid" (BM25 prefilter, vector rerank)
+BM25_K1 = 1.5                         # term-frequency saturation
+BM25_B = 0.75                         # document-length normalisation
+HYBRID_PREFILTER_K = 50               # BM25 candidates reranked by vector similarity in hybrid mode
+VECTOR_BACKEND = "chroma"             # "chroma" or "numpy" (memory-mapped matrix, see numpy_store.py)
+NUMPY_STORE_DTYPE = "float32"         # "float16" halves the file and page-cache footprint
+NUMPY_SEARCH_BLOCK_ROWS = 65536       # rows scored per matrix product
+NUMPY_COMPACT_DEAD_FRACTION = 0.25    # deleted/replaced rows that make persist() rewrite the files instead of appending
+EMBED_BATCH_SIZE = 64                 # chunks per embedding request
+EMBED_MAX_WORKERS = OLLAMA_MAX_PARALLEL   # embedding requests in flight while indexing
+EMBED_LOG_EVERY = 5.0                 # seconds between indexing progress lines
+INDEX_SAVE_EVERY = 50                 # embedding batches between store/manifest/checkpoint saves while indexing (0 = at the end)
+INGEST_WORKERS = 2                    # processes parsing and splitting PDFs while earlier files embed
+INGEST_MAX_PENDING_FILES = 4          # parsed files allowed to wait for the embedder (bounds memory)
+INGEST_POOL_MIN_BYTES = 16 * 1024 * 1024   # smaller batches of PDFs are parsed in-process
+
+#Embedding cache: vectors keyed by (embedding model, text hash), for chunks and queries
+ENABLE_EMBED_CACHE = True
+EMBED_CACHE_PATH = "./.cache/embeddings.sqlite"    # None -> memory tier only
+EMBED_CACHE_MEMORY_MAX_BYTES = 32 * 1024 * 1024
+EMBED_CACHE_DISK_MAX_BYTES = 1024 * 1024 * 1024
 
 # Agent Prompts (System Instructions) 
 AGENT_SYSTEM_PROMPTS = {
@@ -79,6 +171,18 @@ SUMMARY_PROMPT_TEMPLATE = (
     "Keep it short."
 )
 
+# Rolling summarization: fold only the turns added since the last summary into it
+ROLLING_SUMMARY_PROMPT_TEMPLATE = (
+    "Debate topic: {topic}\n\n"
+    "Summary of the debate so far:\n{previous_summary}\n\n"
+    "New arguments since that summary:\n\n{new_turns}\n\n"
+    "Update the summary so it also covers the new arguments from both teams. "
+    "Return only the updated summary, at most {max_words} words."
+)
+SUMMARY_MODE = "rolling"      # "rolling" or "full" (re-summarize the whole history every time)
+SUMMARY_TOKEN_CAP = 160       # num_predict for rolling summaries
+SUMMARY_FULL_EVERY = 0        # force a full re-summarize every N summaries (0 = never)
+
 #Token Limits
 MAX_TOKENS_PER_STAGE = {
     "opening": 280,
@@ -88,6 +192,48 @@ MAX_TOKENS_PER_STAGE = {
 }
 MAX_SUMMARY_TOKENS = 120
 
+#Stage generation profiles
+# model: for agents not given one explicitly (None -> DEFAULT_MODEL).
+# num_predict: cap (None for "summary" keeps the summarizer's caps).
+# max_points: stop once that many numbered points are complete, on the stream and via a "\n{n+1}." stop
+# sequence, and size num_predict from the tokens per point seen so far (0 = off). stop: extra stop sequences.
+STAGE_PROFILES = {
+    "opening": {"model": None, "num_predict": MAX_TOKENS_PER_STAGE["opening"], "max_points": 4, "stop": []},
+    "rebuttal": {"model": None, "num_predict": MAX_TOKENS_PER_STAGE["rebuttal"], "max_points": 3, "stop": []},
+    "closing": {"model": None, "num_predict": MAX_TOKENS_PER_STAGE["closing"], "max_points": 3, "stop": []},
+    "judge": {"model": SUMMARY_MODEL, "num_predict": MAX_TOKENS_PER_STAGE["judge"], "max_points": 0, "stop": []},
+    "summary": {"model": SUMMARY_MODEL, "num_predict": None, "max_points": 0, "stop": []},
+}
+ADAPTIVE_NUM_PREDICT = True           # off -> always the profile's num_predict
+TOKENS_PER_POINT = 60                 # estimate until a stage's first turn has been measured
+NUM_PREDICT_HEADROOM = 1.3            # num_predict = max_points * tokens per point * this, at most the cap
+
+#Prompt budgets (tokens, counted with tiktoken; ~4 chars/token if it is unavailable)
+# "total" includes the system prompt and template wording; the other keys cap one section each.
+PROMPT_TOKEN_ENCODING = "cl100k_base"
+PROMPT_BUDGETS = {
+    "default": {"total": 1536},
+    "opening": {"total": 1536, "context": 1000},
+    "rebuttal": {"total": 1536, "context": 700, "summary": 450},
+    "closing": {"total": 1536, "context": 700, "summary": 450},
+    "judge": {"total": 1536, "summary": 900},
+    "summary": {"total": 1792, "summary": 400, "history": 1300},
+}
+PROMPT_TRIM_ORDER = ("context", "history", "summary")   # trimmed first -> last when over "total"
+RETRIEVAL_QUERY_INCLUDE_SUMMARY = False                  # True makes rebuttal/closing queries unknowable at start
+RETRIEVAL_QUERY_SUMMARY_TOKENS = 64                      # summary excerpt added to retrieval queries
+PREFETCH_RETRIEVAL = True                                # retrieve every planned turn's context at debate start
+
+#Retrieved context packing: merge overlapping chunks, drop near-duplicates, fit the stage's "context" budget
+CONTEXT_PACKING = True
+CONTEXT_MIN_OVERLAP_CHARS = 20        # shortest end-to-start overlap merged (CHUNK_OVERLAP produces up to 50)
+CONTEXT_SHINGLE_WORDS = 5             # word n-grams compared for near-duplicate detection
+CONTEXT_DEDUPE_THRESHOLD = 0.7        # drop a passage when this share of its shingles is already in the context
+CONTEXT_MIN_PASSAGE_TOKENS = 48       # don't squeeze in a truncated passage shorter than this
+CONTEXT_MMR = False                   # over-fetch CONTEXT_FETCH_K chunks and diversify them by MMR
+CONTEXT_MMR_LAMBDA = 0.7              # relevance vs. novelty (1.0 = keep retriever order)
+CONTEXT_FETCH_K = 8
+
 
 PROMPT_EXAMPLES = {
     "opening": [
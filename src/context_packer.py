@@ -0,0 +1,146 @@
+# src/context_packer.py
+
+from __future__ import annotations
+
+import re
+from typing import List, Optional, Tuple
+
+from config import (
+    CONTEXT_DEDUPE_THRESHOLD, CONTEXT_SHINGLE_WORDS, CONTEXT_MIN_OVERLAP_CHARS,
+    CONTEXT_MIN_PASSAGE_TOKENS, CONTEXT_MMR, CONTEXT_MMR_LAMBDA,
+)
+from prompt_budget import count_tokens, truncate
+
+HEADER = "Relevant information from knowledge base:\n\n"
+SEPARATOR = "\n---\n"
+
+_WORD = re.compile(r"\w+")
+
+
+def format_passage(source: str, text: str) -> str:
+    return f"Source: {source}\nContent: {text}"
+
+
+def format_context(passages: List[str]) -> str:
+    return HEADER + SEPARATOR.join(passages) + "\n\n"
+
+
+def shingles(text: str, n: int = CONTEXT_SHINGLE_WORDS) -> frozenset:
+    words = _WORD.findall(text.lower())
+    if len(words) <= n:
+        return frozenset([" ".join(words)]) if words else frozenset()
+    return frozenset(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+
+
+def _overlap(a: str, b: str, min_chars: int) -> int:
+    """Length of the longest suffix of a that is also a prefix of b, or 0 if under min_chars."""
+    if min(len(a), len(b)) < min_chars:
+        return 0
+    head = b[:min_chars]
+    i = a.find(head, max(0, len(a) - len(b)))
+    while i != -1:
+        if b.startswith(a[i:]):
+            return len(a) - i
+        i = a.find(head, i + 1)
+    return 0
+
+
+class _Passage:
+    def __init__(self, source: str, page, text: str):
+        self.source = source
+        self.page = page
+        self.text = text
+
+    def absorb(self, text: str, min_chars: int) -> bool:
+        """Merge text into this passage if one contains the other or they overlap end to start."""
+        if text in self.text:
+            pass
+        elif self.text in text:
+            self.text = text
+        elif (n := _overlap(self.text, text, min_chars)):
+            self.text += text[n:]
+        elif (n := _overlap(text, self.text, min_chars)):
+            self.text = text + self.text[n:]
+        else:
+            return False
+        return True
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _mmr(passages: List[_Passage], lam: float) -> List[_Passage]:
+    """Reorder by maximal marginal relevance: rank-based relevance against shingle similarity."""
+    n = len(passages)
+    sh = {id(p): shingles(p.text) for p in passages}
+    rel = {id(p): 1.0 - i / n for i, p in enumerate(passages)}
+    left, out = list(passages), []
+    while left:
+        best = max(left, key=lambda p: lam * rel[id(p)]
+                   - (1 - lam) * max((_jaccard(sh[id(p)], sh[id(q)]) for q in out), default=0.0))
+        left.remove(best)
+        out.append(best)
+    return out
+
+
+def pack_context(docs, k: int, max_tokens: Optional[int] = None, mmr: bool = CONTEXT_MMR) -> Tuple[str, dict]:
+    """Turn retrieved documents into a compact context block and a report of what it saved.
+
+    Chunks from the same source and page are merged where they overlap (the splitter's
+    CHUNK_OVERLAP) or contain each other, near-duplicates are dropped by shingle containment,
+    and at most k passages are packed into max_tokens. The report compares the result with
+    the top-k chunks pasted verbatim.
+    """
+    raw = format_context([format_passage(d.metadata.get("source", "N/A"), d.page_content) for d in docs[:k]])
+
+    passages: List[_Passage] = []
+    merged = 0
+    for d in docs:
+        meta = d.metadata or {}
+        source, page = meta.get("source", "N/A"), meta.get("page")
+        for p in passages:
+            if p.source == source and p.page == page and p.absorb(d.page_content, CONTEXT_MIN_OVERLAP_CHARS):
+                merged += 1
+                break
+        else:
+            passages.append(_Passage(source, page, d.page_content))
+    if mmr:
+        passages = _mmr(passages, CONTEXT_MMR_LAMBDA)
+
+    seen, kept, deduped = set(), [], 0
+    for p in passages:
+        sh = shingles(p.text)
+        if sh and len(sh & seen) / len(sh) >= CONTEXT_DEDUPE_THRESHOLD:
+            deduped += 1
+            continue
+        seen |= sh
+        kept.append(p)
+
+    budget = None if max_tokens is None else max_tokens - count_tokens(HEADER)
+    pieces, used, over_budget = [], 0, 0
+    for p in kept:
+        if len(pieces) == k:
+            break
+        piece = format_passage(p.source, p.text)
+        cost = count_tokens(piece) + (count_tokens(SEPARATOR) if pieces else 0)
+        if budget is not None and used + cost > budget:
+            room = budget - used - (count_tokens(SEPARATOR) if pieces else 0)
+            if room < CONTEXT_MIN_PASSAGE_TOKENS:
+                over_budget += 1
+                continue
+            piece = truncate(piece, room)
+            cost = count_tokens(piece) + (count_tokens(SEPARATOR) if pieces else 0)
+        pieces.append(piece)
+        used += cost
+
+    text = format_context(pieces)
+    raw_tokens, tokens = count_tokens(raw), count_tokens(text)
+    return text, {
+        "context_raw_tokens": raw_tokens,
+        "context_tokens": tokens,
+        "context_saved_tokens": max(0, raw_tokens - tokens),
+        "context_merged": merged,
+        "context_deduped": deduped,
+        "context_over_budget": over_budget,
+    }
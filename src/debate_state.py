@@ -1,19 +1,77 @@
 # src/debate_state.py
 
+from typing import Dict, List, Optional
+
+
+class Turn:
+    __slots__ = ("index", "agent", "role", "text")
+
+    def __init__(self, index: int, agent: str, role: str, text: str):
+        self.index = index
+        self.agent = agent
+        self.role = role
+        self.text = text
+
+    def render(self) -> str:
+        return f"[{self.role} - {self.agent}]\n{self.text}\n"
+
+    def to_dict(self) -> dict:
+        return {"agent": self.agent, "role": self.role, "text": self.text}
+
+
 class DebateState:
+    """Append-only transcript.
+
+    Each turn is rendered once, when it is added; the joined transcript and the per-agent and
+    per-role indexes are extended in place, so reads cost time in the new turns only.
+    """
+
     def __init__(self, topic: str):
         self.topic = topic
-        self.history = []  # [{agent, role, text}]
+        self.history: List[Turn] = []
+        self._rendered: List[str] = []
+        self._by_agent: Dict[str, List[Turn]] = {}
+        self._by_role: Dict[str, List[Turn]] = {}
+        self._joined = ""
+        self._joined_turns = 0
+
+    def add(self, agent: str, role: str, text: str) -> Turn:
+        turn = Turn(len(self.history), agent, role, text)
+        self.history.append(turn)
+        self._rendered.append(turn.render())
+        self._by_agent.setdefault(agent, []).append(turn)
+        self._by_role.setdefault(role, []).append(turn)
+        return turn
+
+    def by_agent(self, agent: str) -> List[Turn]:
+        return self._by_agent.get(agent, [])
+
+    def by_role(self, role: str) -> List[Turn]:
+        return self._by_role.get(role, [])
+
+    def last_by_agent(self, agent: str) -> Optional[Turn]:
+        turns = self._by_agent.get(agent)
+        return turns[-1] if turns else None
+
+    def last_by_role(self, role: str) -> Optional[Turn]:
+        turns = self._by_role.get(role)
+        return turns[-1] if turns else None
 
-    def add(self, agent: str, role: str, text: str):
-        self.history.append({"agent": agent, "role": role, "text": text})
+    def turns_text(self, start: int = 0) -> str:
+        if start > 0:
+            return "\n".join(self._rendered[start:])
+        n = len(self._rendered)
+        if self._joined_turns < n:
+            new = "\n".join(self._rendered[self._joined_turns:])
+            self._joined = f"{self._joined}\n{new}" if self._joined_turns else new
+            self._joined_turns = n
+        return self._joined
 
     def as_text(self) -> str:
         out = [f"Debate Topic: {self.topic}", "", "-- Debate History --"]
         if not self.history:
             out.append("No arguments yet.")
         else:
-            for item in self.history:
-                out.append(f"[{item['role']} - {item['agent']}]\n{item['text']}\n")
+            out.append(self.turns_text())
         out.append("-- End --")
         return "\n".join(out)
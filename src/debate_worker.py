@@ -0,0 +1,183 @@
+# src/debate_worker.py
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import DEBATE_WORKERS, DEBATE_JOB_TTL
+from scheduler import stopping
+
+FINISHED = ("done", "error", "cancelled")
+
+
+class WorkerBusy(RuntimeError):
+    """Raised by DebateWorker.submit when every slot and queue place is taken."""
+
+
+class DebateJob:
+    """One debate run by the worker: its status and the append-only log of its events.
+
+    Readers keep their own cursor into the log, so a UI poll, a reconnecting stream and a
+    late subscriber each see every event exactly once.
+    """
+
+    def __init__(self, job_id: str, run: Callable[[], Iterator[dict]], **info):
+        self.id = job_id
+        self.info = info
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._run = run
+        self._events: List[dict] = []
+        self._cond = threading.Condition()
+        self._cancel = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        with self._cond:
+            if self.status == "queued":
+                self._finish("cancelled")
+
+    def publish(self, event: dict) -> None:
+        with self._cond:
+            self._events.append(event)
+            self._cond.notify_all()
+
+    def events(self, cursor: int = 0, timeout: Optional[float] = 0) -> Tuple[List[dict], int]:
+        """Events after cursor and the new cursor; waits up to timeout (None: forever) for one."""
+        with self._cond:
+            if timeout != 0:
+                self._cond.wait_for(lambda: len(self._events) > cursor or self.done, timeout)
+            new = self._events[cursor:]
+            return new, cursor + len(new)
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "events": len(self._events),
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            **self.info,
+        }
+
+    def _finish(self, status: str, error: Optional[str] = None) -> None:
+        # Caller holds self._cond.
+        self.status, self.error, self.finished = status, error, time.time()
+        self._cond.notify_all()
+
+    def _execute(self) -> None:
+        with self._cond:
+            if self.done:
+                return
+            self.status, self.started = "running", time.time()
+        gen = None
+        try:
+            # Cancelling also stops the debate before its next stage or model call (scheduler.Cancelled).
+            with stopping(self._cancel):
+                gen = self._run()
+                for event in gen:
+                    self.publish(event)
+                    if self.cancelled:
+                        break
+        except Exception as e:
+            with self._cond:
+                if self.cancelled:
+                    self._finish("cancelled")
+                else:
+                    self._finish("error", str(e))
+            return
+        finally:
+            if gen is not None:
+                gen.close()
+        with self._cond:
+            self._finish("cancelled" if self.cancelled else "done")
+
+
+class DebateWorker:
+    """Runs debates on a thread pool, off the caller's thread.
+
+    Generation is I/O on the Ollama client, so threads share one client, one retriever and
+    one set of caches; max_workers debates run at once and the rest wait in order. With
+    max_pending set, at most that many may wait and further submissions are refused.
+    """
+
+    def __init__(self, max_workers: int = DEBATE_WORKERS, job_ttl: float = DEBATE_JOB_TTL,
+                 max_pending: Optional[int] = None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="debate")
+        self._jobs: Dict[str, DebateJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, run: Callable[[], Iterator[dict]], job_id: Optional[str] = None, **info) -> DebateJob:
+        """Queue run (a callable returning an event generator, e.g. Orchestrator.run) as a job."""
+        job = DebateJob(job_id or uuid.uuid4().hex, run, **info)
+        with self._lock:
+            self._expire()
+            if job.id in self._jobs and not self._jobs[job.id].done:
+                raise ValueError(f"Debate {job.id} is already running")
+            if self.max_pending is not None and self.active() >= self.max_workers + self.max_pending:
+                raise WorkerBusy(f"{self.max_workers} debates running and {self.max_pending} waiting")
+            self._jobs[job.id] = job
+        self._pool.submit(job._execute)
+        return job
+
+    def get(self, job_id: str) -> Optional[DebateJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[DebateJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def active(self) -> int:
+        return sum(1 for j in self._jobs.values() if not j.done)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def shutdown(self, cancel: bool = True) -> None:
+        if cancel:
+            for job in self.jobs():
+                job.cancel()
+        self._pool.shutdown(wait=True)
+
+    def _expire(self) -> None:
+        # Caller holds self._lock. Finished jobs stay readable for job_ttl seconds.
+        cutoff = time.time() - self.job_ttl
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+
+_worker: Optional[DebateWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_worker() -> DebateWorker:
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = DebateWorker()
+        return _worker
@@ -0,0 +1,159 @@
+# src/embedding_cache.py
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from array import array
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from config import (
+    ENABLE_EMBED_CACHE, EMBED_CACHE_PATH,
+    EMBED_CACHE_MEMORY_MAX_BYTES, EMBED_CACHE_DISK_MAX_BYTES,
+)
+from cache_store import MemoryLRU, SQLiteLRU
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    # float32 is what the embedding models produce; half the size of the float64 default.
+    return array("f", vector).tobytes()
+
+
+def _unpack(value: bytes) -> List[float]:
+    vec = array("f")
+    vec.frombytes(value)
+    return vec.tolist()
+
+
+class EmbeddingCache:
+    def __init__(self, path: Optional[str] = EMBED_CACHE_PATH,
+                 memory_max_bytes: int = EMBED_CACHE_MEMORY_MAX_BYTES,
+                 disk_max_bytes: int = EMBED_CACHE_DISK_MAX_BYTES):
+        self.memory = MemoryLRU(memory_max_bytes)
+        self.disk = SQLiteLRU(path, disk_max_bytes, table="embeddings") if path else None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> dict:
+        found = {}
+        for key in keys:
+            value = self.memory.get(key)
+            if value is not None:
+                found[key] = value
+        hits_memory = len(found)
+        missing = [k for k in keys if k not in found]
+        if missing and self.disk is not None:
+            from_disk = self.disk.get_many(missing)
+            for key, value in from_disk.items():
+                self.memory.put(key, value)
+            found.update(from_disk)
+        with self._lock:
+            self.hits_memory += hits_memory
+            self.hits_disk += len(found) - hits_memory
+            self.misses += len(keys) - len(found)
+        return {k: _unpack(v) for k, v in found.items()}
+
+    def put_many(self, vectors: dict) -> None:
+        packed = {k: _pack(v) for k, v in vectors.items()}
+        for key, value in packed.items():
+            self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put_many(packed)
+        with self._lock:
+            self.stores += len(packed)
+
+    def stats(self) -> dict:
+        hits = self.hits_memory + self.hits_disk
+        total = hits + self.misses
+        return {
+            "hits": hits,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "stores": self.stores,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.size,
+            "disk_bytes": self.disk.size if self.disk is not None else 0,
+            "evictions": self.memory.evictions + (self.disk.evictions if self.disk is not None else 0),
+        }
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an Embeddings and only sends texts it has not embedded before with this model."""
+
+    def __init__(self, inner: Embeddings, model: str, cache: EmbeddingCache):
+        self.inner = inner
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        keys = [embedding_key(self.model, t) for t in texts]
+        found = self.cache.get_many(keys)
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                todo.setdefault(key, text)
+        if todo:
+            vectors = self.inner.embed_documents(list(todo.values()))
+            fresh = dict(zip(todo, vectors))
+            self.cache.put_many(fresh)
+            # Round-trip through float32 so a cold run returns exactly what a cached run would.
+            found.update((k, _unpack(_pack(v))) for k, v in fresh.items())
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = embedding_key(self.model, text)
+        hit = self.cache.get_many([key])
+        if key in hit:
+            return hit[key]
+        vector = self.inner.embed_query(text)
+        self.cache.put_many({key: vector})
+        return _unpack(_pack(vector))
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_set = False
+_cache_lock = threading.Lock()
+
+
+def set_embedding_cache(cache: Optional[EmbeddingCache]) -> None:
+    """Use cache (None: no caching) instead of the configured one, e.g. to keep a benchmark off EMBED_CACHE_PATH."""
+    global _cache, _cache_set
+    with _cache_lock:
+        _cache, _cache_set = cache, True
+
+
+def reset_embedding_cache() -> None:
+    """Undo set_embedding_cache: back to the cache configured by ENABLE_EMBED_CACHE."""
+    global _cache, _cache_set
+    with _cache_lock:
+        _cache, _cache_set = None, False
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    global _cache
+    with _cache_lock:
+        if _cache_set:
+            return _cache
+    if not ENABLE_EMBED_CACHE:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
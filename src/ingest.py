@@ -0,0 +1,70 @@
+# src/ingest.py
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from multiprocessing import get_context
+from typing import Iterable, Iterator, List, Sequence
+
+from config import INGEST_WORKERS, INGEST_MAX_PENDING_FILES, INGEST_POOL_MIN_BYTES
+
+
+def parse_pdf(path: str, chunk_size: int, chunk_overlap: int) -> dict:
+    """Hash, load and split one PDF. Runs in a worker process, so it returns plain data."""
+    from rag_pipeline import _file_sha256, load_pdf, split_into_chunks
+
+    st = os.stat(path)
+    chunks = split_into_chunks(load_pdf(path), chunk_size, chunk_overlap)
+    return {
+        "path": path,
+        "sha256": _file_sha256(path),
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "chunks": [(c.page_content, c.metadata) for c in chunks],
+    }
+
+
+def parse_files(
+    paths: Sequence[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    workers: int = INGEST_WORKERS,
+    max_pending: int = INGEST_MAX_PENDING_FILES,
+) -> Iterator[dict]:
+    """Yield parse_pdf results in completion order.
+
+    At most max_pending files are being parsed, waiting to be consumed or in the consumer's
+    hands; the next file is submitted only after the consumer returns for another result, so a
+    slow consumer (the embedder) holds the parsers back instead of letting parsed pages pile up.
+    """
+    paths = list(paths)
+    # Spawning workers costs seconds of imports; a small batch parses faster in-process.
+    if workers <= 1 or len(paths) <= 1 or sum(os.path.getsize(p) for p in paths) < INGEST_POOL_MIN_BYTES:
+        for path in paths:
+            yield parse_pdf(path, chunk_size, chunk_overlap)
+        return
+
+    queue = iter(paths)
+    max_pending = max(1, max_pending)
+    # More processes than files in flight would sit idle.
+    with ProcessPoolExecutor(max_workers=min(workers, max_pending), mp_context=get_context("spawn")) as pool:
+        pending = {pool.submit(parse_pdf, path, chunk_size, chunk_overlap) for path in islice(queue, max_pending)}
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                yield fut.result()
+                # Only once the consumer is done with it does a file leave the window.
+                nxt = next(queue, None)
+                if nxt is not None:
+                    pending.add(pool.submit(parse_pdf, nxt, chunk_size, chunk_overlap))
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
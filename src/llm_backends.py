@@ -0,0 +1,246 @@
+# src/llm_backends.py
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import math
+import threading
+import time
+from typing import AsyncIterator, Iterator, List, Optional, Protocol, Union
+
+import telemetry
+from config import (
+    LLM_BACKEND,
+    STUB_TTFT, STUB_TOKENS_PER_SEC, STUB_NUM_TOKENS, STUB_TEXT, STUB_EMBED_DIM,
+)
+
+
+class LLMBackend(Protocol):
+    name: str
+
+    def chat(self, model: str, messages: List[dict], options: dict, stage: Optional[str] = None) -> str: ...
+
+    def chat_stream(self, model: str, messages: List[dict], options: dict,
+                    stage: Optional[str] = None) -> Iterator[str]: ...
+
+    async def achat(self, model: str, messages: List[dict], options: dict, stage: Optional[str] = None) -> str: ...
+
+    def achat_stream(self, model: str, messages: List[dict], options: dict,
+                     stage: Optional[str] = None) -> AsyncIterator[str]: ...
+
+    def embed(self, model: str, texts: List[str]) -> List[List[float]]: ...
+
+    def warm_up(self, with_embeddings: bool = True) -> None: ...
+
+
+def _record(res) -> None:
+    telemetry.record_usage(res.get("prompt_eval_count"), res.get("eval_count"),
+                           res.get("prompt_eval_duration"), res.get("eval_duration"))
+
+
+class OllamaBackend:
+    name = "ollama"
+
+    def __init__(self):
+        self._aclients = {}
+        self._atransport = None
+        self._aloop = None
+
+    def _async_client(self, stage: Optional[str] = None):
+        import httpx
+        import ollama
+        from ollama_client import get_client
+
+        # httpx async clients are bound to the loop they were first used on. As on the sync path,
+        # there is one client per distinct stage timeout, all sharing one pooled transport.
+        loop = asyncio.get_running_loop()
+        client = get_client()
+        if self._aloop is not loop:
+            self._aclients = {}
+            self._atransport = httpx.AsyncHTTPTransport(limits=client.httpx_kwargs()["limits"])
+            self._aloop = loop
+        timeout = client.timeout_for(stage)
+        acl = self._aclients.get(timeout)
+        if acl is None:
+            acl = self._aclients[timeout] = ollama.AsyncClient(
+                host=client.host, transport=self._atransport, timeout=client.httpx_kwargs(stage)["timeout"])
+        return acl
+
+    def chat(self, model, messages, options, stage=None) -> str:
+        from ollama_client import get_client
+
+        res = get_client().chat(model=model, messages=messages, options=options, stage=stage)
+        _record(res)
+        return res["message"]["content"]
+
+    def chat_stream(self, model, messages, options, stage=None) -> Iterator[str]:
+        from ollama_client import get_client
+
+        chunks, done = 0, False
+        try:
+            for part in get_client().chat_stream(model=model, messages=messages, options=options, stage=stage):
+                if part.get("done"):
+                    _record(part)
+                    done = True
+                chunks += 1
+                yield part["message"]["content"]
+        finally:
+            if not done:
+                # Closed before the final chunk (early stop): Ollama streams one token per chunk.
+                telemetry.record_usage(eval_tokens=chunks)
+
+    async def achat(self, model, messages, options, stage=None) -> str:
+        from ollama_client import get_client
+
+        res = await self._async_client(stage).chat(model=model, messages=messages, options=options,
+                                              keep_alive=get_client().keep_alive)
+        _record(res)
+        return res["message"]["content"]
+
+    async def achat_stream(self, model, messages, options, stage=None) -> AsyncIterator[str]:
+        from ollama_client import get_client
+
+        stream = await self._async_client(stage).chat(model=model, messages=messages, options=options,
+                                                 keep_alive=get_client().keep_alive, stream=True)
+        chunks, done = 0, False
+        try:
+            async for part in stream:
+                if part.get("done"):
+                    _record(part)
+                    done = True
+                chunks += 1
+                yield part["message"]["content"]
+        finally:
+            if not done:
+                telemetry.record_usage(eval_tokens=chunks)
+
+    def embed(self, model, texts) -> List[List[float]]:
+        from ollama_client import get_client
+
+        return list(get_client().embed(model=model, input=texts)["embeddings"])
+
+    def warm_up(self, with_embeddings: bool = True) -> None:
+        from ollama_client import warm_up
+
+        warm_up(with_embeddings=with_embeddings)
+
+
+def hash_embedding(text: str, dim: int) -> List[float]:
+    # Deterministic bag-of-words hashing, so lexically similar texts get similar vectors.
+    vec = [0.0] * dim
+    for word in text.lower().split():
+        h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+class StubBackend:
+    """Deterministic offline backend: fixed time-to-first-token, then tokens at a fixed rate."""
+
+    name = "stub"
+
+    def __init__(self, ttft: float = STUB_TTFT, tokens_per_sec: float = STUB_TOKENS_PER_SEC,
+                 num_tokens: int = STUB_NUM_TOKENS, text: str = STUB_TEXT, embed_dim: int = STUB_EMBED_DIM):
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.num_tokens = num_tokens
+        self.words = text.split()
+        self.embed_dim = embed_dim
+
+    def _tokens(self, options: dict) -> List[str]:
+        n = self.num_tokens
+        if options and options.get("num_predict"):
+            n = min(n, int(options["num_predict"]))
+        tokens = [("" if i == 0 else " ") + self.words[i % len(self.words)] for i in range(n)]
+        stops = (options or {}).get("stop")
+        if stops:
+            text = ""
+            for i, tok in enumerate(tokens):
+                text += tok
+                if any(s in text for s in stops):
+                    return tokens[:i]
+        return tokens
+
+    def _delay(self) -> float:
+        return 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+    def _record(self, messages: List[dict], tokens: List[str]) -> None:
+        prompt_tokens = max(1, sum(len(m.get("content", "")) for m in messages) // 4)
+        telemetry.record_usage(prompt_tokens, len(tokens), int(self.ttft * 1e9),
+                               int(self._delay() * len(tokens) * 1e9))
+
+    def chat(self, model, messages, options, stage=None) -> str:
+        tokens = self._tokens(options)
+        time.sleep(self.ttft + self._delay() * len(tokens))
+        self._record(messages, tokens)
+        return "".join(tokens)
+
+    def chat_stream(self, model, messages, options, stage=None) -> Iterator[str]:
+        time.sleep(self.ttft)
+        delay = self._delay()
+        tokens = self._tokens(options)
+        sent = 0
+        try:
+            for tok in tokens:
+                sent += 1
+                yield tok
+                if delay:
+                    time.sleep(delay)
+        finally:
+            self._record(messages, tokens[:sent])
+
+    async def achat(self, model, messages, options, stage=None) -> str:
+        tokens = self._tokens(options)
+        await asyncio.sleep(self.ttft + self._delay() * len(tokens))
+        self._record(messages, tokens)
+        return "".join(tokens)
+
+    async def achat_stream(self, model, messages, options, stage=None) -> AsyncIterator[str]:
+        await asyncio.sleep(self.ttft)
+        delay = self._delay()
+        tokens = self._tokens(options)
+        sent = 0
+        try:
+            for tok in tokens:
+                sent += 1
+                yield tok
+                if delay:
+                    await asyncio.sleep(delay)
+        finally:
+            self._record(messages, tokens[:sent])
+
+    def embed(self, model, texts) -> List[List[float]]:
+        return [hash_embedding(t, self.embed_dim) for t in texts]
+
+    def warm_up(self, with_embeddings: bool = True) -> None:
+        pass
+
+
+BACKENDS = {
+    "ollama": OllamaBackend,
+    "stub": StubBackend,
+}
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+
+def set_backend(backend: Union[str, LLMBackend]) -> LLMBackend:
+    global _backend
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown LLM backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+        backend = BACKENDS[backend]()
+    with _backend_lock:
+        _backend = backend
+    return backend
+
+
+def get_backend() -> LLMBackend:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = BACKENDS[LLM_BACKEND]()
+        return _backend
@@ -0,0 +1,105 @@
+# src/llm_cache.py
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from typing import List, Optional
+
+from config import (
+    ENABLE_LLM_CACHE, LLM_CACHE_PATH, LLM_CACHE_STAGES,
+    LLM_CACHE_MEMORY_MAX_BYTES, LLM_CACHE_DISK_MAX_BYTES,
+    LLM_CACHE_DETERMINISTIC_OPTIONS,
+)
+from cache_store import MemoryLRU, SQLiteLRU
+
+
+def cache_key(model: str, messages: List[dict], options: dict) -> str:
+    payload = json.dumps({"model": model, "messages": messages, "options": options},
+                         sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: Optional[str] = LLM_CACHE_PATH, stages=LLM_CACHE_STAGES,
+                 memory_max_bytes: int = LLM_CACHE_MEMORY_MAX_BYTES,
+                 disk_max_bytes: int = LLM_CACHE_DISK_MAX_BYTES,
+                 deterministic_options: Optional[dict] = None):
+        self.stages = set(stages)
+        self.deterministic_options = dict(LLM_CACHE_DETERMINISTIC_OPTIONS if deterministic_options is None
+                                          else deterministic_options)
+        self.memory = MemoryLRU(memory_max_bytes)
+        self.disk = SQLiteLRU(path, disk_max_bytes, table="llm_responses") if path else None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+
+    def enabled_for(self, stage: Optional[str]) -> bool:
+        return stage in self.stages
+
+    def options(self, options: dict) -> dict:
+        # Cached stages run with deterministic sampling, otherwise a hit would replay one random draw.
+        return {**options, **self.deterministic_options}
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits_memory += 1
+            return value.decode("utf-8")
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+                with self._lock:
+                    self.hits_disk += 1
+                return value.decode("utf-8")
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, text: str) -> None:
+        value = text.encode("utf-8")
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+        with self._lock:
+            self.stores += 1
+
+    def stats(self) -> dict:
+        hits = self.hits_memory + self.hits_disk
+        total = hits + self.misses
+        return {
+            "hits": hits,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "stores": self.stores,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.size,
+            "disk_bytes": self.disk.size if self.disk is not None else 0,
+            "evictions": self.memory.evictions + (self.disk.evictions if self.disk is not None else 0),
+        }
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    global _cache
+    if not ENABLE_LLM_CACHE:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -1,41 +1,270 @@
 # src/main.py
 
-from config import DEBATE_TOPIC, NUMBER_OF_REBUTTAL_ROUNDS, ENABLE_RAG
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from config import (
+    DEBATE_TOPIC, NUMBER_OF_REBUTTAL_ROUNDS, ENABLE_RAG, WARM_UP_ON_START, LLM_BACKEND,
+    BATCH_WORKERS, BATCH_OUTPUT_PATH,
+)
 from debate_state import DebateState
-from rag_pipeline import index_knowledge_base, get_retriever
+from rag_pipeline import get_shared_retriever
 from agents import Debater, Judge, Orchestrator
+from checkpoints import get_checkpoints
+from llm_cache import get_response_cache
+from embedding_cache import get_embedding_cache
+from llm_backends import BACKENDS, get_backend, set_backend
+import telemetry
 
 
-def main():
-    retriever = None
-    if ENABLE_RAG:
-        vs = index_knowledge_base(
-            kb_directory="./knowledge",
-            vector_store_path="./chroma_db",
-            embedding_model="nomic-embed-text",
-            chunk_size=500,
-            chunk_overlap=50
-        )
-        retriever = get_retriever(vs) if vs else None
-
-    state = DebateState(DEBATE_TOPIC)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a multi-agent debate in the terminal.")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=LLM_BACKEND,
+                        help="LLM backend (stub = deterministic offline model)")
+    parser.add_argument("--metrics", action="store_true", help="print a line per metric event")
+    parser.add_argument("--metrics-jsonl", help="append every span to this JSONL file")
+    parser.add_argument("--metrics-prom", help="write aggregated spans in Prometheus text format")
+    parser.add_argument("--reindex", action="store_true", help="rebuild the knowledge-base index from scratch")
+    parser.add_argument("--resume", metavar="ID", help="continue an interrupted debate from its checkpoint")
+    parser.add_argument("--list-unfinished", action="store_true", help="list debates that can be resumed")
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument("--topics", help="run every topic in this file (.txt: one per line; "
+                                        ".jsonl: {\"topic\", \"rounds\", \"id\"} per line)")
+    batch.add_argument("--out", default=BATCH_OUTPUT_PATH, help="JSONL file to append finished debates to")
+    batch.add_argument("--workers", type=int, default=BATCH_WORKERS, help="worker processes (1 = in-process)")
+    batch.add_argument("--rounds", type=int, default=NUMBER_OF_REBUTTAL_ROUNDS,
+                       help="rebuttal rounds for topics that don't set their own")
+    return parser.parse_args()
+
+
+def build_retriever(reindex: bool = False):
+    if not ENABLE_RAG:
+        return None
+    return get_shared_retriever(reindex=reindex)
+
+
+def build_orchestrator(topic: str, retriever=None, **kwargs) -> Orchestrator:
+    state = DebateState(topic)
 
     pro = Debater(name="Proponent", role="Proponent", retriever=retriever)
     opp = Debater(name="Opponent", role="Opponent", retriever=retriever)
     judge = Judge(name="Judge")
 
-    orch = Orchestrator(state, pro, opp, judge)
+    return Orchestrator(state, pro, opp, judge, **kwargs)
+
+
+def run_single(args):
+    if WARM_UP_ON_START:
+        get_backend().warm_up(with_embeddings=ENABLE_RAG)
 
-    for event in orch.run(NUMBER_OF_REBUTTAL_ROUNDS):
+    topic, rounds = DEBATE_TOPIC, NUMBER_OF_REBUTTAL_ROUNDS
+    checkpoints = get_checkpoints()
+    if args.resume:
+        saved = checkpoints.load(args.resume) if checkpoints else None
+        if saved is None:
+            raise SystemExit(f"No checkpoint for debate {args.resume}")
+        topic, rounds = saved["topic"], saved["rounds"]
+        print(f"[Checkpoint] resuming {args.resume}: {len(saved['stages'])} stages done")
+    orch = build_orchestrator(topic, build_retriever(reindex=args.reindex),
+                              checkpoints=checkpoints, debate_id=args.resume)
+    state = orch.state
+    if checkpoints and not args.resume:
+        print(f"[Checkpoint] debate {orch.debate_id} (continue after a crash with --resume {orch.debate_id})")
+
+    streaming = False
+    for event in orch.run(rounds):
         if event["type"] == "stage":
             print(f"\n=== {event['name']} ===\n")
         elif event["type"] == "status":
             print(f"[{event['text']}]")
+        elif event["type"] == "delta":
+            if not streaming:
+                print(f"{event['agent']} ({event['role']}):")
+                streaming = True
+            print(event["text"], end="", flush=True)
         elif event["type"] == "msg":
-            print(f"{event['agent']} ({event['role']}):\n{event['text']}\n")
+            if streaming:
+                # Tokens are already on screen; just close the turn.
+                print("\n")
+                streaming = False
+            else:
+                print(f"{event['agent']} ({event['role']}):\n{event['text']}\n")
+        elif event["type"] == "metric" and args.metrics:
+            print(f"[metric] {event['kind']:<13} {event['agent'] or '':<10} {event['stage'] or '':<8} "
+                  f"{event['wall_s']:.2f}s prompt={event['prompt_tokens']} gen={event['eval_tokens']} "
+                  f"{event['tokens_per_sec']:.1f} tok/s"
+                  + (f" dropped={event['prompt_dropped_tokens']}" if event.get("prompt_dropped_tokens") else "")
+                  + (f" ctx_saved={event['context_saved_tokens']}" if event.get("context_saved_tokens") else ""))
         elif event["type"] == "done":
             print("\n✅ Debate complete.")
 
+    spans = orch.spans
+    if spans:
+        print(f"[Telemetry] {len(spans)} spans, "
+              f"{sum(sp.prompt_tokens for sp in spans)} prompt tokens, "
+              f"{sum(sp.eval_tokens for sp in spans)} generated tokens, "
+              f"{sum(sp.wall_s for sp in spans):.1f}s in calls")
+    if args.metrics_jsonl:
+        telemetry.write_jsonl(spans, args.metrics_jsonl, topic=state.topic)
+    if args.metrics_prom:
+        with open(args.metrics_prom, "w", encoding="utf-8") as f:
+            f.write(telemetry.to_prometheus(spans))
+
+    cache = get_response_cache()
+    if cache:
+        print(f"[LLM cache] {cache.stats()}")
+    embed_cache = get_embedding_cache()
+    if ENABLE_RAG and embed_cache:
+        print(f"[Embedding cache] {embed_cache.stats()}")
+
+
+# Batch mode. Each worker process builds its backend and retriever once, in _init_worker.
+_worker = {}
+
+
+def _init_worker(backend: str):
+    set_backend(backend)
+    if WARM_UP_ON_START:
+        get_backend().warm_up(with_embeddings=ENABLE_RAG)
+    _worker["retriever"] = build_retriever()
+
+
+def run_debate(item: dict) -> dict:
+    record = {"id": item["id"], "topic": item["topic"], "rounds": item["rounds"], "worker": os.getpid()}
+    try:
+        # A stable id per topic: rerunning the batch after a crash resumes half-finished debates.
+        debate_id, checkpoints = f"batch:{item['id']}", get_checkpoints()
+        saved = checkpoints.load(debate_id) if checkpoints else None
+        if saved and (saved["topic"], saved["rounds"]) != (item["topic"], item["rounds"]):
+            # The topic's rounds (or text) changed since that run: it cannot be resumed, so start over.
+            print(f"[Checkpoint] discarding {debate_id}: it was for {saved['rounds']} rounds of {saved['topic']!r}")
+            checkpoints.delete(debate_id)
+        orch = build_orchestrator(item["topic"], _worker.get("retriever"), stream=False, emit_metrics=False,
+                                  checkpoints=checkpoints, debate_id=debate_id)
+        start = time.perf_counter()
+        verdict = ""
+        for event in orch.run(item["rounds"]):
+            if event["type"] == "msg" and event["agent"] == orch.judge.name:
+                verdict = event["text"]
+        wall = time.perf_counter() - start
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        return record
+
+    timings = {}
+    for sp in orch.spans:
+        key = f"{sp.kind}:{sp.stage}" if sp.stage else sp.kind
+        timings[key] = round(timings.get(key, 0.0) + sp.wall_s, 4)
+    record.update({
+        "transcript": [turn.to_dict() for turn in orch.state.history],
+        "summary": orch.summarizer.summary,
+        "verdict": verdict,
+        "wall_s": round(wall, 4),
+        "timings": timings,
+        "prompt_tokens": sum(sp.prompt_tokens for sp in orch.spans),
+        "eval_tokens": sum(sp.eval_tokens for sp in orch.spans),
+        "finished_at": time.time(),
+    })
+    return record
+
+
+def load_topics(path: str, default_rounds: int):
+    items, seen = [], set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                row = json.loads(line)
+                topic = row["topic"]
+                item = {"id": str(row.get("id", topic)), "topic": topic,
+                        "rounds": int(row.get("rounds", default_rounds))}
+            else:
+                item = {"id": line, "topic": line, "rounds": default_rounds}
+            if item["id"] not in seen:
+                seen.add(item["id"])
+                items.append(item)
+    return items
+
+
+def load_done(path: str) -> set:
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # partial line from an interrupted run
+            if "error" not in rec:
+                done.add(rec["id"])
+    return done
+
+
+def run_batch(args):
+    items = load_topics(args.topics, args.rounds)
+    done = load_done(args.out)
+    todo = [item for item in items if item["id"] not in done]
+    workers = max(1, min(args.workers, len(todo) or 1))
+    print(f"[Batch] {len(items)} topics, {len(items) - len(todo)} already done, "
+          f"{len(todo)} to run on {workers} worker(s) -> {args.out}")
+    if not todo:
+        return
+
+    # Index once up front so workers only load the existing store.
+    if ENABLE_RAG and (workers > 1 or args.reindex):
+        build_retriever(reindex=args.reindex)
+
+    start = time.perf_counter()
+    failed = 0
+    pool = None
+    if workers == 1:
+        _init_worker(args.backend)
+        results = map(run_debate, todo)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                   initializer=_init_worker, initargs=(args.backend,))
+        futures = [pool.submit(run_debate, item) for item in todo]
+        results = (fut.result() for fut in as_completed(futures))
+
+    try:
+        with open(args.out, "a", encoding="utf-8") as out:
+            for n, rec in enumerate(results, 1):
+                out.write(json.dumps(rec) + "\n")
+                out.flush()
+                if "error" in rec:
+                    failed += 1
+                    print(f"[Batch] {n}/{len(todo)} FAILED {rec['id']}: {rec['error']}")
+                else:
+                    print(f"[Batch] {n}/{len(todo)} {rec['wall_s']:.1f}s {rec['id']}")
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    print(f"[Batch] finished {len(todo) - failed}/{len(todo)} in {elapsed:.1f}s "
+          f"({(len(todo) - failed) / elapsed * 60:.1f} debates/min)"
+          + (f", {failed} failed (rerun to retry)" if failed else ""))
+
+
+def main():
+    args = parse_args()
+    set_backend(args.backend)
+    if args.list_unfinished:
+        for row in (get_checkpoints().unfinished() if get_checkpoints() else []):
+            print(f"{row['id']}  {row['stages']} stages  {time.ctime(row['updated'])}  {row['topic']}")
+        return
+    if args.topics:
+        run_batch(args)
+    else:
+        run_single(args)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,188 @@
+# src/mock_ollama.py
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from config import STUB_TEXT
+from llm_backends import hash_embedding
+
+CANNED_TEXT = STUB_TEXT
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class MockOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, ttft: float, tokens_per_sec: float, num_tokens: int, slots: int,
+                 embed_latency: float = 0.0, embed_dim: int = 256, prefill_tokens_per_sec: float = 0.0):
+        super().__init__(addr, _Handler)
+        self.prefill_tokens_per_sec = prefill_tokens_per_sec
+        self.embed_latency = embed_latency
+        self.embed_dim = embed_dim
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.num_tokens = num_tokens
+        # Requests beyond the slot count queue up, like OLLAMA_NUM_PARALLEL.
+        self.slots = threading.Semaphore(max(1, slots))
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def tokens(self, options: dict):
+        n = self.num_tokens
+        if options.get("num_predict"):
+            n = min(n, int(options["num_predict"]))
+        words = CANNED_TEXT.split()
+        return [words[i % len(words)] if i == 0 else " " + words[i % len(words)] for i in range(n)]
+
+    def embedding(self, text: str):
+        return hash_embedding(text, self.embed_dim)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockOllamaServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload: dict, status: int = 200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path in ("/", "/api/version"):
+            self._send_json({"version": "0.0.0-mock"})
+        elif self.path == "/api/tags":
+            self._send_json({"models": []})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        body = self._body()
+        with self.server._lock:
+            self.server.requests += 1
+        if self.path == "/api/chat":
+            self._chat(body)
+        elif self.path == "/api/embed":
+            self._embed(body)
+        elif self.path == "/api/generate":
+            # Only used to load models (warm-up); answer immediately.
+            self._send_json({"model": body.get("model", "mock"), "created_at": _now(), "response": "",
+                             "done": True, "done_reason": "load"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _chat(self, body: dict):
+        srv = self.server
+        model = body.get("model", "mock")
+        tokens = srv.tokens(body.get("options") or {})
+        prompt_tokens = max(1, sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4)
+        delay = 1.0 / srv.tokens_per_sec if srv.tokens_per_sec > 0 else 0.0
+        # Prefill cost grows with the prompt, like a real model.
+        prefill = prompt_tokens / srv.prefill_tokens_per_sec if srv.prefill_tokens_per_sec > 0 else 0.0
+
+        with srv.slots:
+            start = time.perf_counter()
+            time.sleep(srv.ttft + prefill)
+            first = time.perf_counter()
+            final = {
+                "model": model,
+                "created_at": _now(),
+                "done": True,
+                "done_reason": "stop",
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int((first - start) * 1e9),
+                "eval_count": len(tokens),
+            }
+
+            if not body.get("stream", True):
+                time.sleep(delay * len(tokens))
+                final["eval_duration"] = int((time.perf_counter() - first) * 1e9)
+                final["message"] = {"role": "assistant", "content": "".join(tokens)}
+                self._send_json(final)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for tok in tokens:
+                self._chunk({"model": model, "created_at": _now(), "done": False,
+                             "message": {"role": "assistant", "content": tok}})
+                time.sleep(delay)
+            final["eval_duration"] = int((time.perf_counter() - first) * 1e9)
+            final["message"] = {"role": "assistant", "content": ""}
+            self._chunk(final)
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _embed(self, body: dict):
+        srv = self.server
+        texts = body.get("input", "")
+        if isinstance(texts, str):
+            texts = [texts]
+        with srv.slots:
+            time.sleep(srv.embed_latency * len(texts))
+            vectors = [srv.embedding(t) for t in texts]
+        self._send_json({"model": body.get("model", "mock"), "embeddings": vectors,
+                         "prompt_eval_count": sum(len(t) // 4 for t in texts)})
+
+    def _chunk(self, payload: dict):
+        data = json.dumps(payload).encode() + b"\n"
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, ttft: float = 0.2, tokens_per_sec: float = 50.0,
+          num_tokens: int = 60, slots: int = 4, embed_latency: float = 0.0, embed_dim: int = 256,
+          prefill_tokens_per_sec: float = 0.0, background: bool = True) -> Optional[MockOllamaServer]:
+    server = MockOllamaServer((host, port), ttft, tokens_per_sec, num_tokens, slots, embed_latency, embed_dim,
+                              prefill_tokens_per_sec)
+    if not background:
+        server.serve_forever()
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama-compatible mock server with simulated latency.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tps", type=float, default=50.0, help="generated tokens per second")
+    parser.add_argument("--tokens", type=int, default=60, help="tokens per completion (capped by num_predict)")
+    parser.add_argument("--slots", type=int, default=4, help="parallel request slots")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per embedded text")
+    parser.add_argument("--embed-dim", type=int, default=256)
+    parser.add_argument("--prefill-tps", type=float, default=0.0, help="prompt tokens per second (0 = free)")
+    args = parser.parse_args()
+    print(f"Mock Ollama on http://{args.host}:{args.port}", flush=True)
+    serve(args.host, args.port, args.ttft, args.tps, args.tokens, args.slots,
+          args.embed_latency, args.embed_dim, args.prefill_tps, background=False)
+
+
+if __name__ == "__main__":
+    main()
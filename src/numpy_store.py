@@ -0,0 +1,366 @@
+# src/numpy_store.py
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from config import NUMPY_STORE_DTYPE, NUMPY_SEARCH_BLOCK_ROWS, NUMPY_COMPACT_DEAD_FRACTION
+
+VECTORS_NAME = "vectors.npy"
+DOCS_NAME = "docs.jsonl"
+DELETED_NAME = "deleted.jsonl"
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    m = np.asarray(m, dtype=np.float32)
+    if m.ndim == 1:
+        m = m[None, :]
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column-wise indices of the k largest scores, best first. scores: (rows, queries)."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty((0, scores.shape[1]), dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1, axis=0)[:k]
+    order = np.argsort(-np.take_along_axis(scores, idx, axis=0), axis=0)
+    return np.take_along_axis(idx, order, axis=0)
+
+
+class NumpyVectorStore(VectorStore):
+    """Cosine-similarity store: a memory-mapped (rows, dim) .npy matrix plus a JSONL sidecar.
+
+    Vectors are L2-normalised on write, so a top-k search is one matrix product and an
+    argpartition. Writes are staged in memory and only reach disk on persist(), which appends
+    the new rows to both files and logs the rows that died to deleted.jsonl; once dead rows
+    pass NUMPY_COMPACT_DEAD_FRACTION it rewrites the files without them. Reads never need more
+    than the rows of one search block in RAM.
+    """
+
+    def __init__(self, path: str, embedding_function: Embeddings, dtype: str = NUMPY_STORE_DTYPE):
+        self.path = path
+        self._embedding = embedding_function
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        self._load()
+
+    # Loading / persistence
+
+    def _load(self) -> None:
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metas: List[dict] = []
+        self._docs_end = 0
+        vectors = os.path.join(self.path, VECTORS_NAME)
+        docs = os.path.join(self.path, DOCS_NAME)
+        if os.path.exists(vectors) and os.path.exists(docs):
+            self._matrix = np.load(vectors, mmap_mode="r")
+            # Lines past the matrix's rows are from an append that never updated the header.
+            with open(docs, "rb") as f:
+                for _ in range(self._matrix.shape[0]):
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        break
+                    row = json.loads(line)
+                    self._ids.append(row["id"])
+                    self._texts.append(row["text"])
+                    self._metas.append(row["metadata"])
+                self._docs_end = f.tell()
+            if len(self._ids) != self._matrix.shape[0]:
+                raise ValueError(f"{self.path}: {len(self._ids)} docs for {self._matrix.shape[0]} vectors")
+        self._row = {cid: i for i, cid in enumerate(self._ids)}
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        if len(self._row) != len(self._ids):
+            # An id appended again supersedes its earlier rows, even if their tombstones were never logged.
+            self._alive[[i for i, cid in enumerate(self._ids) if self._row[cid] != i]] = False
+        deleted = os.path.join(self.path, DELETED_NAME)
+        if self._matrix is not None and os.path.exists(deleted):
+            with open(deleted, encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    self._alive[[i for i in json.loads(line) if i < len(self._alive)]] = False
+        self._disk_alive = self._alive.copy()
+        self._staged: Dict[str, Tuple[np.ndarray, str, dict]] = {}
+        self._staged_cache = None
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._staged) or not np.array_equal(self._alive, self._disk_alive)
+
+    def persist(self) -> None:
+        """Write staged rows and deletions: appended in place, or a full rewrite when compacting."""
+        with self._lock:
+            if not self.dirty and self._matrix is not None:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            dead = len(self._alive) - int(self._alive.sum())
+            if self._matrix is None or dead > NUMPY_COMPACT_DEAD_FRACTION * len(self._alive) or not self._append():
+                self._rewrite()
+
+    def _append(self) -> bool:
+        """Append staged rows and log new tombstones; False if the files cannot take them in place."""
+        vectors = os.path.join(self.path, VECTORS_NAME)
+        docs = os.path.join(self.path, DOCS_NAME)
+        staged = list(self._staged.items())
+        n, dim = self._matrix.shape
+        if staged and staged[0][1][0].shape[0] != dim:
+            return False
+        with open(vectors, "rb") as f:
+            if np.lib.format.read_magic(f) != (1, 0):
+                return False
+            np.lib.format.read_array_header_1_0(f)
+            offset = f.tell()
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {"descr": np.lib.format.dtype_to_descr(self.dtype),
+                                                      "fortran_order": False, "shape": (n + len(staged), dim)})
+        if len(header.getvalue()) != offset:
+            return False
+
+        if staged:
+            # Rows first, the header that makes them visible last; drop our memmap while writing under it.
+            self._matrix = None
+            with open(vectors, "r+b") as f:
+                f.truncate(offset + n * dim * self.dtype.itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(np.stack([vec for _, (vec, _, _) in staged]).astype(self.dtype).tobytes())
+            with open(docs, "r+b") as f:
+                f.truncate(self._docs_end)
+                f.seek(self._docs_end)
+                f.write("".join(json.dumps({"id": cid, "text": text, "metadata": meta}) + "\n"
+                                for cid, (_, text, meta) in staged).encode("utf-8"))
+                self._docs_end = f.tell()
+            with open(vectors, "r+b") as f:
+                f.write(header.getvalue())
+            self._matrix = np.load(vectors, mmap_mode="r")
+            for cid, (_, text, meta) in staged:
+                self._row[cid] = len(self._ids)
+                self._ids.append(cid)
+                self._texts.append(text)
+                self._metas.append(meta)
+            self._alive = np.concatenate([self._alive, np.ones(len(staged), dtype=bool)])
+            self._disk_alive = np.concatenate([self._disk_alive, np.ones(len(staged), dtype=bool)])
+        died = np.flatnonzero(self._disk_alive & ~self._alive)
+        if len(died):
+            with open(os.path.join(self.path, DELETED_NAME), "a", encoding="utf-8") as f:
+                f.write(json.dumps(died.tolist()) + "\n")
+        self._disk_alive = self._alive.copy()
+        self._staged = {}
+        self._staged_cache = None
+        return True
+
+    def _rewrite(self) -> None:
+        """Rewrite vectors.npy and docs.jsonl with every live row, replacing them atomically."""
+        keep = np.flatnonzero(self._alive)
+        staged = list(self._staged.items())
+        dim = self._dim()
+        n = len(keep) + len(staged)
+        vectors = os.path.join(self.path, VECTORS_NAME)
+        docs = os.path.join(self.path, DOCS_NAME)
+        out = np.lib.format.open_memmap(vectors + ".tmp", mode="w+", dtype=self.dtype, shape=(n, dim or 0))
+        for start in range(0, len(keep), NUMPY_SEARCH_BLOCK_ROWS):
+            rows = keep[start:start + NUMPY_SEARCH_BLOCK_ROWS]
+            out[start:start + len(rows)] = self._matrix[rows]
+        for i, (_, (vec, _, _)) in enumerate(staged):
+            out[len(keep) + i] = vec
+        out.flush()
+        del out
+        with open(docs + ".tmp", "w", encoding="utf-8") as f:
+            for i in keep:
+                f.write(json.dumps({"id": self._ids[i], "text": self._texts[i], "metadata": self._metas[i]}) + "\n")
+            for cid, (_, text, meta) in staged:
+                f.write(json.dumps({"id": cid, "text": text, "metadata": meta}) + "\n")
+        # Drop our memmap before replacing the file under it.
+        self._matrix = None
+        os.replace(vectors + ".tmp", vectors)
+        os.replace(docs + ".tmp", docs)
+        # The tombstones name rows of the old files.
+        if os.path.exists(os.path.join(self.path, DELETED_NAME)):
+            os.remove(os.path.join(self.path, DELETED_NAME))
+        self._load()
+
+    def _dim(self) -> int:
+        if self._matrix is not None and self._matrix.shape[0]:
+            return self._matrix.shape[1]
+        for vec, _, _ in self._staged.values():
+            return vec.shape[0]
+        return 0
+
+    # Writes
+
+    def upsert(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]],
+               documents: Sequence[str], metadatas: Optional[Sequence[dict]] = None) -> None:
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32)).astype(self.dtype)
+        metadatas = metadatas or [{}] * len(ids)
+        with self._lock:
+            for cid, vec, text, meta in zip(ids, vectors, documents, metadatas):
+                row = self._row.get(cid)
+                if row is not None:
+                    self._alive[row] = False
+                self._staged[cid] = (vec, text, dict(meta or {}))
+            self._staged_cache = None
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        import uuid
+
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        self.upsert(ids, self._embedding.embed_documents(texts), texts, metadatas)
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            for cid in ids or []:
+                row = self._row.get(cid)
+                if row is not None:
+                    self._alive[row] = False
+                self._staged.pop(cid, None)
+            self._staged_cache = None
+        return True
+
+    def reset_collection(self) -> None:
+        with self._lock:
+            self._alive[:] = False
+            self._staged.clear()
+            self._staged_cache = None
+
+    # Reads
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._alive.sum()) + len(self._staged)
+
+    def has(self, ids: Iterable[str]) -> Set[str]:
+        with self._lock:
+            return {cid for cid in ids
+                    if cid in self._staged or (cid in self._row and self._alive[self._row[cid]])}
+
+    def items(self) -> List[Tuple[str, dict]]:
+        """(id, metadata) for every live row."""
+        with self._lock:
+            out = [(self._ids[i], self._metas[i]) for i in np.flatnonzero(self._alive)]
+            out += [(cid, meta) for cid, (_, _, meta) in self._staged.items()]
+            return out
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            out = []
+            for cid in ids:
+                if cid in self._staged:
+                    _, text, meta = self._staged[cid]
+                elif cid in self._row and self._alive[self._row[cid]]:
+                    row = self._row[cid]
+                    text, meta = self._texts[row], self._metas[row]
+                else:
+                    continue
+                out.append(Document(page_content=text, metadata=meta, id=cid))
+            return out
+
+    def vectors(self, ids: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        """(found ids, their normalised vectors), skipping ids that are not stored."""
+        with self._lock:
+            found, rows = [], []
+            for cid in ids:
+                if cid in self._staged:
+                    found.append(cid)
+                    rows.append(np.asarray(self._staged[cid][0], dtype=np.float32))
+                elif cid in self._row and self._alive[self._row[cid]]:
+                    found.append(cid)
+                    rows.append(np.asarray(self._matrix[self._row[cid]], dtype=np.float32))
+            return found, (np.stack(rows) if rows else np.empty((0, self._dim()), dtype=np.float32))
+
+    def _staged_snapshot(self):
+        with self._lock:
+            if self._staged_cache is None:
+                items = list(self._staged.items())
+                matrix = np.stack([vec for _, (vec, _, _) in items]).astype(np.float32) if items else None
+                self._staged_cache = (matrix, [(cid, text, meta) for cid, (_, text, meta) in items])
+            return self._staged_cache, self._matrix, self._alive.copy()
+
+    def search_vectors(self, queries: np.ndarray, k: int) -> List[List[Tuple[Document, float]]]:
+        """Top-k (Document, cosine similarity) for each row of queries, in one pass over the matrix."""
+        q = _normalize(queries).T  # (dim, n_queries)
+        (staged, staged_docs), matrix, alive = self._staged_snapshot()
+        best_scores = np.full((0, q.shape[1]), -np.inf, dtype=np.float32)
+        best_refs = np.empty((0, q.shape[1]), dtype=np.int64)  # >= 0: matrix row, < 0: -1 - staged index
+
+        blocks = []
+        if matrix is not None and matrix.shape[0]:
+            for start in range(0, matrix.shape[0], NUMPY_SEARCH_BLOCK_ROWS):
+                blocks.append((start, matrix[start:start + NUMPY_SEARCH_BLOCK_ROWS], alive[start:start + NUMPY_SEARCH_BLOCK_ROWS]))
+        if staged is not None:
+            blocks.append((None, staged, None))
+
+        for start, block, block_alive in blocks:
+            scores = np.asarray(block, dtype=np.float32) @ q
+            if block_alive is not None and not block_alive.all():
+                scores[~block_alive] = -np.inf
+            top = _top_k(scores, k)
+            refs = top + start if start is not None else -1 - top
+            # Merge this block's winners with the running top-k.
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=0)])
+            best_refs = np.concatenate([best_refs, refs])
+            keep = _top_k(best_scores, k)
+            best_scores = np.take_along_axis(best_scores, keep, axis=0)
+            best_refs = np.take_along_axis(best_refs, keep, axis=0)
+
+        results = []
+        for j in range(q.shape[1]):
+            hits = []
+            for ref, score in zip(best_refs[:, j], best_scores[:, j]):
+                if not np.isfinite(score):
+                    continue
+                if ref >= 0:
+                    doc = Document(page_content=self._texts[ref], metadata=self._metas[ref], id=self._ids[ref])
+                else:
+                    cid, text, meta = staged_docs[-1 - ref]
+                    doc = Document(page_content=text, metadata=meta, id=cid)
+                hits.append((doc, float(score)))
+            results.append(hits)
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.search_vectors(np.asarray([embedding]), k)[0]]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.search_vectors(np.asarray([self._embedding.embed_query(query)]), k)[0]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def similarity_search_batch(self, queries: List[str], k: int = 4) -> List[List[Document]]:
+        """Several queries in one matrix product."""
+        if not queries:
+            return []
+        vectors = np.asarray([self._embedding.embed_query(q) for q in queries])
+        return [[doc for doc, _ in hits] for hits in self.search_vectors(vectors, k)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] -> relevance in [0, 1].
+        return lambda score: (score + 1.0) / 2.0
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, path: str = "./numpy_db", **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(path, embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+        return store
@@ -0,0 +1,150 @@
+# src/ollama_client.py
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional
+
+import httpx
+import ollama
+
+from config import (
+    OLLAMA_HOST, OLLAMA_TIMEOUTS, OLLAMA_CONNECT_TIMEOUT, OLLAMA_KEEP_ALIVE,
+    OLLAMA_MAX_RETRIES, OLLAMA_RETRY_BACKOFF, OLLAMA_POOL_SIZE,
+    DEFAULT_MODEL, SUMMARY_MODEL, EMBEDDING_MODEL,
+)
+from stage_profiles import profile_models
+
+
+def _log(msg: str) -> None:
+    print(f"[LLM] {msg}", flush=True)
+
+
+def _retryable(e: Exception) -> bool:
+    if isinstance(e, ollama.ResponseError):
+        return e.status_code >= 500 or e.status_code == 429
+    return isinstance(e, (ConnectionError, httpx.TransportError))
+
+
+class OllamaClient:
+    """Process-wide Ollama client: one pooled HTTP transport, per-stage timeouts, retries and keep-alive.
+
+    Each distinct timeout gets its own thin ollama.Client, but they all share the same
+    httpx transport, so connections are pooled across agents, summaries and embeddings.
+    """
+
+    def __init__(self, host: Optional[str] = OLLAMA_HOST, timeouts: Optional[dict] = None,
+                 keep_alive=OLLAMA_KEEP_ALIVE, max_retries: int = OLLAMA_MAX_RETRIES,
+                 backoff: float = OLLAMA_RETRY_BACKOFF, pool_size: int = OLLAMA_POOL_SIZE):
+        self.host = host
+        self.timeouts = dict(OLLAMA_TIMEOUTS if timeouts is None else timeouts)
+        self.keep_alive = keep_alive
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.retries = 0
+        self._limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self._transport = httpx.HTTPTransport(limits=self._limits)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def timeout_for(self, stage: Optional[str]) -> float:
+        return self.timeouts.get(stage, self.timeouts.get("default", 120))
+
+    def httpx_kwargs(self, stage: Optional[str] = None) -> dict:
+        return {"timeout": httpx.Timeout(self.timeout_for(stage), connect=OLLAMA_CONNECT_TIMEOUT),
+                "limits": self._limits}
+
+    def client(self, stage: Optional[str] = None) -> ollama.Client:
+        timeout = self.timeout_for(stage)
+        with self._lock:
+            cl = self._clients.get(timeout)
+            if cl is None:
+                cl = ollama.Client(host=self.host, transport=self._transport,
+                                   timeout=httpx.Timeout(timeout, connect=OLLAMA_CONNECT_TIMEOUT))
+                self._clients[timeout] = cl
+            return cl
+
+    def _call(self, what: str, fn):
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not _retryable(e):
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                attempt += 1
+                self.retries += 1
+                _log(f"{what} failed ({e}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def chat(self, model: str, messages: List[dict], options: Optional[dict] = None, stage: Optional[str] = None):
+        cl = self.client(stage)
+        return self._call(f"chat[{stage}]", lambda: cl.chat(model=model, messages=messages, options=options,
+                                                            keep_alive=self.keep_alive))
+
+    def chat_stream(self, model: str, messages: List[dict], options: Optional[dict] = None,
+                    stage: Optional[str] = None) -> Iterator:
+        cl = self.client(stage)
+
+        # A stream can only be retried until its first chunk has been handed out.
+        def start():
+            it = cl.chat(model=model, messages=messages, options=options, keep_alive=self.keep_alive, stream=True)
+            return it, next(it, None)
+
+        it, first = self._call(f"chat_stream[{stage}]", start)
+        if first is not None:
+            yield first
+            yield from it
+
+    def embed(self, model: str = "", input="", truncate: Optional[bool] = None, options=None,
+              keep_alive=None, dimensions: Optional[int] = None):
+        # Same signature as ollama.Client.embed so OllamaEmbeddings can use this object as its client.
+        cl = self.client("embed")
+        kwargs = {"truncate": truncate, "options": options, "keep_alive": keep_alive or self.keep_alive}
+        if dimensions is not None:
+            kwargs["dimensions"] = dimensions
+        return self._call("embed", lambda: cl.embed(model=model, input=input, **kwargs))
+
+    def warm_up(self, models: Iterable[str] = (), embedding_models: Iterable[str] = ()) -> None:
+        # An empty generate/embed request makes Ollama load the model and pin it for keep_alive.
+        cl = self.client("warmup")
+        for m in dict.fromkeys(models):
+            try:
+                t0 = time.perf_counter()
+                self._call(f"warm_up[{m}]", lambda: cl.generate(model=m, prompt="", keep_alive=self.keep_alive))
+                _log(f"Loaded {m} in {time.perf_counter() - t0:.1f}s (keep_alive={self.keep_alive})")
+            except Exception as e:
+                _log(f"Warm-up of {m} failed: {e}")
+        for m in dict.fromkeys(embedding_models):
+            try:
+                t0 = time.perf_counter()
+                self.embed(model=m, input="warm up")
+                _log(f"Loaded {m} in {time.perf_counter() - t0:.1f}s (keep_alive={self.keep_alive})")
+            except Exception as e:
+                _log(f"Warm-up of {m} failed: {e}")
+
+
+_client: Optional[OllamaClient] = None
+_client_lock = threading.Lock()
+_warmed = False
+
+
+def get_client() -> OllamaClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
+
+
+def warm_up(with_embeddings: bool = True) -> None:
+    global _warmed
+    with _client_lock:
+        if _warmed:
+            return
+        _warmed = True
+    get_client().warm_up(models=(DEFAULT_MODEL, SUMMARY_MODEL, *profile_models()),
+                         embedding_models=(EMBEDDING_MODEL,) if with_embeddings else ())
@@ -0,0 +1,170 @@
+# src/prompt_budget.py
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+from config import PROMPT_BUDGETS, PROMPT_TRIM_ORDER, PROMPT_TOKEN_ENCODING
+
+CHARS_PER_TOKEN = 4  # rough estimate used when tiktoken is unavailable
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str = PROMPT_TOKEN_ENCODING):
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception:
+        # tiktoken missing, or its encoding files can't be downloaded: fall back to estimates.
+        return None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _encoding()
+    if enc is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate(text: str, max_tokens: int, keep: str = "head") -> str:
+    """Cut text to at most max_tokens, keeping its start ("head") or its end ("tail")."""
+    if max_tokens <= 0 or not text:
+        return ""
+    enc = _encoding()
+    if enc is None:
+        n = max_tokens * CHARS_PER_TOKEN
+        if len(text) <= n:
+            return text
+        # Snap to a word boundary so the estimate never splits a word.
+        if keep == "tail":
+            cut = text[-n:]
+            space = cut.find(" ")
+            return cut[space + 1:] if 0 <= space < len(cut) - 1 else cut
+        cut = text[:n]
+        space = cut.rfind(" ")
+        return cut[:space] if space > 0 else cut
+    ids = enc.encode(text, disallowed_special=())
+    if len(ids) <= max_tokens:
+        return text
+    ids = ids[-max_tokens:] if keep == "tail" else ids[:max_tokens]
+    return enc.decode(ids).strip()
+
+
+class BudgetedPrompt(str):
+    """A prompt string that carries the PromptReport it was fitted with."""
+
+    report: Optional["PromptReport"] = None
+
+    def __new__(cls, text: str, report: Optional["PromptReport"] = None):
+        obj = super().__new__(cls, text)
+        obj.report = report
+        return obj
+
+
+class PromptReport:
+    def __init__(self, stage: str, budget: int):
+        self.stage = stage
+        self.budget = budget
+        self.tokens: Dict[str, int] = {}
+        self.dropped: Dict[str, int] = {}
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens.values())
+
+    @property
+    def dropped_tokens(self) -> int:
+        return sum(self.dropped.values())
+
+    def attrs(self) -> dict:
+        attrs = {"prompt_budget": self.budget, "prompt_est_tokens": self.total_tokens,
+                 "prompt_dropped_tokens": self.dropped_tokens}
+        for name, n in self.dropped.items():
+            if n:
+                attrs[f"prompt_dropped_{name}"] = n
+        return attrs
+
+
+class _Section:
+    def __init__(self, name: str, text: str, keep: str, sep: Optional[str]):
+        self.name = name
+        self.text = text or ""
+        self.keep = keep
+        self.sep = sep
+        self.original = count_tokens(self.text)
+        self.tokens = self.original
+
+    def fit(self, max_tokens: int) -> None:
+        if self.tokens <= max_tokens:
+            return
+        if self.sep:
+            # Drop whole units (e.g. retrieved chunks, debate turns) from the end we don't keep.
+            units = self.text.split(self.sep)
+            while len(units) > 1 and count_tokens(self.sep.join(units)) > max_tokens:
+                units = units[1:] if self.keep == "tail" else units[:-1]
+            self.text = self.sep.join(units)
+        self.text = truncate(self.text, max_tokens, keep=self.keep)
+        self.tokens = count_tokens(self.text)
+
+
+def stage_limits(stage: str, budgets: Optional[dict] = None) -> dict:
+    budgets = PROMPT_BUDGETS if budgets is None else budgets
+    return dict(budgets.get(stage) or budgets.get("default") or {})
+
+
+class PromptBuilder:
+    """Fits named prompt sections into a stage's token budget.
+
+    Each section is first capped at its own budget; if the prompt is still over the stage
+    total, sections are trimmed further in PROMPT_TRIM_ORDER. Fixed text (system prompt,
+    template wording) is counted but never trimmed.
+    """
+
+    def __init__(self, stage: str, budgets: Optional[dict] = None, trim_order: Sequence[str] = PROMPT_TRIM_ORDER):
+        self.stage = stage
+        self.limits = stage_limits(stage, budgets)
+        self.trim_order = list(trim_order)
+        self.fixed_tokens = 0
+        self.sections: List[_Section] = []
+
+    def fixed(self, *texts: str) -> "PromptBuilder":
+        self.fixed_tokens += sum(count_tokens(t) for t in texts)
+        return self
+
+    def add(self, name: str, text: str, keep: str = "head", sep: Optional[str] = None) -> "PromptBuilder":
+        self.sections.append(_Section(name, text, keep, sep))
+        return self
+
+    def fit(self):
+        """Returns ({section name: fitted text}, PromptReport)."""
+        total = self.limits.get("total", 0)
+        for sec in self.sections:
+            if sec.name in self.limits:
+                sec.fit(self.limits[sec.name])
+
+        if total:
+            order = sorted(self.sections, key=lambda s: self.trim_order.index(s.name)
+                           if s.name in self.trim_order else len(self.trim_order))
+            for sec in order:
+                over = self.fixed_tokens + sum(s.tokens for s in self.sections) - total
+                if over <= 0:
+                    break
+                sec.fit(max(0, sec.tokens - over))
+
+        report = PromptReport(self.stage, total)
+        report.tokens["fixed"] = self.fixed_tokens
+        for sec in self.sections:
+            report.tokens[sec.name] = sec.tokens
+            report.dropped[sec.name] = max(0, sec.original - sec.tokens)
+        return {sec.name: sec.text for sec in self.sections}, report
+
+
+def report_of(messages: List[dict]) -> Optional[PromptReport]:
+    for m in messages:
+        report = getattr(m.get("content"), "report", None)
+        if report is not None:
+            return report
+    return None
@@ -2,42 +2,47 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
 import os
-from typing import Optional
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
 
-from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
-from langchain_core.retrievers import BaseRetriever
+from langchain_core.embeddings import Embeddings
 
+from config import (
+    EMBED_BATCH_SIZE, EMBED_MAX_WORKERS, EMBED_LOG_EVERY, VECTOR_BACKEND, INDEX_SAVE_EVERY,
+    RETRIEVAL_MODE, HYBRID_PREFILTER_K,
+    KB_DIRECTORY, VECTOR_STORE_PATH, EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, RETRIEVER_K,
+    CONTEXT_MMR, CONTEXT_FETCH_K,
+)
+from embedding_cache import CachedEmbeddings, get_embedding_cache
+from ingest import batched, parse_files
+from llm_backends import get_backend
 
-def _log(msg: str) -> None:
-    print(f"[RAG] {msg}", flush=True)
+# Loaders, splitters and vector stores (chromadb, pypdf, ...) take over a second to import;
+# they are imported where used so that a run with RAG off never pays for them.
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from langchain_core.retrievers import BaseRetriever
+    from langchain_core.vectorstores import VectorStore
 
+    from bm25_index import BM25Index
 
-def load_documents(kb_directory: str):
-    if not os.path.exists(kb_directory) or not os.path.isdir(kb_directory):
-        _log(f"Knowledge directory not found: {kb_directory}")
-        return []
 
-    _log(f"Loading PDFs from: {kb_directory}")
-    loader = DirectoryLoader(
-        kb_directory,
-        glob="*.pdf",
-        loader_cls=PyPDFLoader,
-        show_progress=True,
-        use_multithreading=True,
-    )
-    docs = loader.load()
-    _log(f"Loaded {len(docs)} document pages.")
-    return docs
+def _log(msg: str) -> None:
+    print(f"[RAG] {msg}", flush=True)
 
 
 def split_into_chunks(documents, chunk_size: int, chunk_overlap: int):
     if not documents:
         return []
 
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     _log(f"Splitting into chunks (chunk_size={chunk_size}, overlap={chunk_overlap})")
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
@@ -48,25 +53,120 @@ def split_into_chunks(documents, chunk_size: int, chunk_overlap: int):
     return chunks
 
 
-def create_embeddings(embedding_model: str) -> Optional[OllamaEmbeddings]:
+class BackendEmbeddings(Embeddings):
+    """Embeddings served by a non-Ollama LLM backend (e.g. the offline stub)."""
+
+    def __init__(self, backend, model: str):
+        self.backend = backend
+        self.model = model
+
+    def embed_documents(self, texts):
+        return self.backend.embed(self.model, list(texts))
+
+    def embed_query(self, text):
+        return self.backend.embed(self.model, [text])[0]
+
+
+def create_embeddings(embedding_model: str) -> Optional[Embeddings]:
     try:
-        _log(f"Initializing OllamaEmbeddings(model={embedding_model})")
-        return OllamaEmbeddings(model=embedding_model)
+        backend = get_backend()
+        if backend.name != "ollama":
+            _log(f"Initializing {backend.name} backend embeddings(model={embedding_model})")
+            embeddings = BackendEmbeddings(backend, embedding_model)
+        else:
+            from langchain_ollama import OllamaEmbeddings
+            from ollama_client import get_client
+
+            _log(f"Initializing OllamaEmbeddings(model={embedding_model})")
+            client = get_client()
+            embeddings = OllamaEmbeddings(model=embedding_model, base_url=client.host)
+            # Route embedding calls through the shared pooled client (same .embed signature).
+            embeddings._client = client
+
+        cache = get_embedding_cache()
+        if cache is not None:
+            # Backends are cached separately: the stub's vectors must never answer for a real model.
+            embeddings = CachedEmbeddings(embeddings, f"{backend.name}:{embedding_model}", cache)
+        return embeddings
     except Exception as e:
         _log(f"Failed to create embeddings: {e}")
         return None
 
 
-def load_vector_store(vector_store_path: str, embeddings: OllamaEmbeddings) -> Optional[Chroma]:
+def open_vector_store(vector_store_path: str, embeddings: Embeddings) -> VectorStore:
+    if VECTOR_BACKEND == "numpy":
+        from numpy_store import NumpyVectorStore
+
+        return NumpyVectorStore(vector_store_path, embeddings)
+    from langchain_chroma import Chroma
+
+    return Chroma(persist_directory=vector_store_path, embedding_function=embeddings)
+
+
+# The few collection operations indexing needs, for either backend.
+
+def _is_numpy(vs: VectorStore) -> bool:
+    from numpy_store import NumpyVectorStore
+
+    return isinstance(vs, NumpyVectorStore)
+
+
+def store_count(vs: VectorStore) -> int:
+    return vs.count() if _is_numpy(vs) else vs._collection.count()
+
+
+def store_upsert(vs: VectorStore, ids, vectors, documents, metadatas) -> None:
+    target = vs if _is_numpy(vs) else vs._collection
+    target.upsert(ids=ids, embeddings=vectors, documents=documents, metadatas=metadatas)
+
+
+def store_has(vs: VectorStore, ids: List[str]) -> set:
+    if not ids:
+        return set()
+    if _is_numpy(vs):
+        return vs.has(ids)
+    return set(vs._collection.get(ids=ids, include=[])["ids"])
+
+
+def store_items(vs: VectorStore):
+    """(id, metadata) for every stored chunk."""
+    if _is_numpy(vs):
+        return vs.items()
+    data = vs._collection.get(include=["metadatas"])
+    return list(zip(data["ids"], data["metadatas"]))
+
+
+def store_ids(vs: VectorStore) -> List[str]:
+    if _is_numpy(vs):
+        return [cid for cid, _ in vs.items()]
+    return vs._collection.get(include=[])["ids"]
+
+
+def store_vectors(vs: VectorStore, ids: List[str]):
+    """(found ids, matrix) of the stored vectors for ids, in the order given."""
+    if _is_numpy(vs):
+        return vs.vectors(ids)
+    data = vs._collection.get(ids=ids, include=["embeddings"])
+    by_id = dict(zip(data["ids"], data["embeddings"]))
+    found = [cid for cid in ids if cid in by_id]
+    return found, [by_id[cid] for cid in found]
+
+
+def store_persist(vs: VectorStore) -> None:
+    # Chroma writes through on every call; the numpy store stages writes until persist().
+    if _is_numpy(vs):
+        vs.persist()
+
+
+def load_vector_store(vector_store_path: str, embeddings: Embeddings) -> Optional[VectorStore]:
     if not os.path.exists(vector_store_path) or not os.path.isdir(vector_store_path):
         _log(f"Vector store path not found: {vector_store_path}")
         return None
 
     try:
-        _log(f"Loading Chroma vector store from: {vector_store_path}")
-        vs = Chroma(persist_directory=vector_store_path, embedding_function=embeddings)
-        
-        _ = vs._collection.count()
+        _log(f"Loading {VECTOR_BACKEND} vector store from: {vector_store_path}")
+        vs = open_vector_store(vector_store_path, embeddings)
+        _ = store_count(vs)
         _log("Vector store loaded successfully.")
         return vs
     except Exception as e:
@@ -74,81 +174,457 @@ def load_vector_store(vector_store_path: str, embeddings: OllamaEmbeddings) -> O
         return None
 
 
-def create_vector_store(chunks, vector_store_path: str, embeddings: OllamaEmbeddings) -> Optional[Chroma]:
-    if not chunks:
-        _log("No chunks provided. Cannot create vector store.")
-        return None
+def upsert_stream(
+    vs: VectorStore,
+    items: Iterable[Tuple[str, Document]],
+    embeddings: Embeddings,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_workers: int = EMBED_MAX_WORKERS,
+    on_batch: Optional[Callable[[List[str]], None]] = None,
+    total: Optional[int] = None,
+) -> int:
+    """Embed (id, chunk) pairs in batches with up to max_workers requests in flight and upsert each batch as it lands.
 
-    try:
-        _log(f"Creating new Chroma store at: {vector_store_path}")
-        vs = Chroma.from_documents(
-            documents=chunks,
-            embedding=embeddings,
-            persist_directory=vector_store_path,
-        )
-        _log("Vector store created and persisted.")
-        return vs
-    except Exception as e:
-        _log(f"Failed to create vector store: {e}")
-        return None
+    items is pulled lazily, a batch at a time, so a generator source only ever has a couple of
+    batches per worker materialised. on_batch is called with the ids of every batch once it is
+    stored, so callers can checkpoint.
+    """
+    def embed(batch):
+        return embeddings.embed_documents([c.page_content for _, c in batch])
+
+    def log(now):
+        _log(f"Embedded {done}{f'/{total}' if total else ''} chunks ({done / max(now - start, 1e-9):.1f} chunks/s)")
+
+    done = 0
+    start = last_log = time.perf_counter()
+    queue = batched(items, batch_size)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        # A couple of batches per worker in flight keeps requests flowing without holding every vector in memory.
+        pending = {}
+        for batch in queue:
+            pending[pool.submit(embed, batch)] = batch
+            if len(pending) >= 2 * max(1, max_workers):
+                break
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                batch = pending.pop(fut)
+                vectors = fut.result()
+                batch_ids = [cid for cid, _ in batch]
+                # Store writes stay on this thread; only the embedding requests run concurrently.
+                store_upsert(vs, batch_ids, vectors, [c.page_content for _, c in batch],
+                             [c.metadata for _, c in batch])
+                done += len(batch_ids)
+                if on_batch:
+                    on_batch(batch_ids)
+                nxt = next(queue, None)
+                if nxt is not None:
+                    pending[pool.submit(embed, nxt)] = nxt
+            now = time.perf_counter()
+            if now - last_log >= EMBED_LOG_EVERY:
+                last_log = now
+                log(now)
+    if done:
+        log(time.perf_counter())
+    return done
 
 
-def get_retriever(vector_store: Optional[Chroma], k: int = 3) -> Optional[BaseRetriever]:
+BM25_DIR_NAME = "bm25"
+
+# BM25 index belonging to each open vector store (set by index_knowledge_base).
+_bm25_indexes = weakref.WeakKeyDictionary()
+
+
+def sync_bm25_index(vs: VectorStore, vector_store_path: str) -> BM25Index:
+    """Open the store's BM25 index and bring it in line with the chunks the store holds.
+
+    Only the difference is tokenised, so this is a no-op on an up-to-date index and builds
+    the index from the stored chunk texts the first time a lexical mode is used.
+    """
+    from bm25_index import BM25Index
+
+    index = BM25Index(os.path.join(vector_store_path, BM25_DIR_NAME))
+    stored = set(store_ids(vs))
+    indexed = set(index.ids)
+    extra = indexed - stored
+    missing = [cid for cid in stored if cid not in indexed]
+    if extra:
+        index.delete(extra)
+    for i in range(0, len(missing), 5000):
+        docs = vs.get_by_ids(missing[i:i + 5000])
+        index.add([d.id for d in docs], [d.page_content for d in docs], [d.metadata for d in docs])
+    if index.dirty:
+        index.persist()
+        _log(f"BM25 index updated: {len(missing)} added, {len(extra)} removed ({index.count()} chunks).")
+    _bm25_indexes[vs] = index
+    return index
+
+
+def get_retriever(vector_store: Optional[VectorStore], k: int = 3, mode: str = RETRIEVAL_MODE) -> Optional[BaseRetriever]:
     if not vector_store:
         return None
     try:
-        _log(f"Creating retriever (k={k})")
-        return vector_store.as_retriever(search_kwargs={"k": k})
+        from bm25_index import BM25Retriever, HybridRetriever
+
+        _log(f"Creating {mode} retriever (k={k})")
+        if mode == "vector":
+            return vector_store.as_retriever(search_kwargs={"k": k})
+        index = _bm25_indexes.get(vector_store)
+        if index is None:
+            _log("No BM25 index for this store (was it opened by index_knowledge_base?).")
+            return None
+        if mode == "bm25":
+            return BM25Retriever(index=index, k=k)
+        if mode == "hybrid":
+            return HybridRetriever(
+                index=index,
+                k=k,
+                prefilter_k=HYBRID_PREFILTER_K,
+                embed_query=vector_store.embeddings.embed_query,
+                vectors_for=lambda ids: store_vectors(vector_store, ids),
+                fallback=lambda query, n: vector_store.similarity_search(query, k=n),
+            )
+        _log(f"Unknown retrieval mode: {mode}")
+        return None
     except Exception as e:
         _log(f"Failed to create retriever: {e}")
         return None
 
 
+MANIFEST_NAME = "kb_manifest.json"
+CHECKPOINT_NAME = "kb_checkpoint.json"
+MANIFEST_VERSION = 1
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_id(name: str, digest: str, i: int) -> str:
+    # The file name is part of the id, so byte-identical PDFs under different names own separate chunks.
+    return f"{hashlib.sha256(name.encode('utf-8')).hexdigest()[:8]}-{digest[:16]}-{i}"
+
+
+def manifest_path(vector_store_path: str) -> str:
+    return os.path.join(vector_store_path, MANIFEST_NAME)
+
+
+def load_manifest(vector_store_path: str) -> Optional[dict]:
+    try:
+        with open(manifest_path(vector_store_path), encoding="utf-8") as f:
+            manifest = json.load(f)
+        return manifest if manifest.get("version") == MANIFEST_VERSION else None
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: dict) -> None:
+    # Write-then-rename so an interrupted run never leaves a half-written file.
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def save_manifest(vector_store_path: str, manifest: dict) -> None:
+    _write_json(manifest_path(vector_store_path), manifest)
+
+
+def load_checkpoint(vector_store_path: str) -> dict:
+    """{file name: {"sha256", "done_ids"}} for files whose embedding was interrupted."""
+    try:
+        with open(os.path.join(vector_store_path, CHECKPOINT_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_checkpoint(vector_store_path: str, checkpoint: dict) -> None:
+    _write_json(os.path.join(vector_store_path, CHECKPOINT_NAME), checkpoint)
+
+
+def scan_knowledge_dir(kb_directory: str) -> Dict[str, str]:
+    """{file name: path} for the PDFs directly inside kb_directory."""
+    if not os.path.isdir(kb_directory):
+        return {}
+    return {name: os.path.join(kb_directory, name)
+            for name in sorted(os.listdir(kb_directory)) if name.lower().endswith(".pdf")}
+
+
+def diff_manifest(files: Dict[str, str], manifest_files: dict):
+    """Returns (added, changed, deleted, unchanged); refreshes size/mtime of unchanged entries."""
+    added, changed, unchanged = [], [], []
+    for name, path in files.items():
+        st = os.stat(path)
+        entry = manifest_files.get(name)
+        if entry is None:
+            added.append(name)
+            continue
+        # Only hash when size or mtime moved, so a no-op startup stays cheap.
+        if entry.get("size") == st.st_size and entry.get("mtime") == st.st_mtime:
+            unchanged.append(name)
+            continue
+        if _file_sha256(path) == entry.get("sha256"):
+            entry.update(size=st.st_size, mtime=st.st_mtime)
+            unchanged.append(name)
+        else:
+            changed.append(name)
+    deleted = [name for name in manifest_files if name not in files]
+    return added, changed, deleted, unchanged
+
+
+def load_pdf(path: str):
+    from langchain_community.document_loaders import PyPDFLoader
+
+    try:
+        return PyPDFLoader(path).load()
+    except Exception as e:
+        _log(f"Failed to load {path}: {e}")
+        return []
+
+
+def _manifest_from_store(vs: VectorStore, files: Dict[str, str]) -> dict:
+    # Stores built before the manifest existed: group their chunk ids by source file and
+    # treat files that are still present as up to date.
+    by_source = {}
+    for cid, meta in store_items(vs):
+        src = (meta or {}).get("source", "")
+        by_source.setdefault(os.path.basename(src), []).append(cid)
+    manifest_files = {}
+    for name, ids in by_source.items():
+        entry = {"chunk_ids": ids}
+        if name in files:
+            st = os.stat(files[name])
+            entry.update(sha256=_file_sha256(files[name]), size=st.st_size, mtime=st.st_mtime)
+        manifest_files[name] = entry
+    return manifest_files
+
+
 def index_knowledge_base(
     kb_directory: str,
     vector_store_path: str,
     embedding_model: str,
     chunk_size: int,
     chunk_overlap: int,
-) -> Optional[Chroma]:
+    reindex: bool = False,
+) -> Optional[VectorStore]:
     embeddings = create_embeddings(embedding_model)
     if not embeddings:
         _log("Embedding init failed. Aborting KB setup.")
         return None
 
-    # Try load existing store
-    if os.path.exists(vector_store_path) and os.path.isdir(vector_store_path) and os.listdir(vector_store_path):
-        vs = load_vector_store(vector_store_path, embeddings)
-        if vs:
-            _log("Using existing vector store (skipping indexing).")
-            return vs
-        else:
-            _log("Existing store found but failed to load. Will re-index.")
-
-    # Otherwise build new store
-    docs = load_documents(kb_directory)
-    if not docs:
-        _log("No PDFs found (or failed to load). Aborting indexing.")
-        return None
+    if not os.path.isdir(kb_directory):
+        # Without the source directory there is nothing to compare against; serve the store as is.
+        _log(f"Knowledge directory not found: {kb_directory}")
+        vs = load_vector_store(vector_store_path, embeddings) if not reindex else None
+        if vs and RETRIEVAL_MODE != "vector":
+            sync_bm25_index(vs, vector_store_path)
+        return vs
 
-    chunks = split_into_chunks(docs, chunk_size, chunk_overlap)
-    if not chunks:
-        _log("Chunking produced 0 chunks. Aborting indexing.")
+    files = scan_knowledge_dir(kb_directory)
+    store_exists = os.path.isdir(vector_store_path) and any(
+        name not in (MANIFEST_NAME, CHECKPOINT_NAME, BM25_DIR_NAME) for name in os.listdir(vector_store_path))
+    if not files and not store_exists:
+        _log(f"No PDFs found in {kb_directory}. Aborting indexing.")
         return None
 
-    # Ensure path exists
     os.makedirs(vector_store_path, exist_ok=True)
-
-    vs = create_vector_store(chunks, vector_store_path, embeddings)
+    vs = load_vector_store(vector_store_path, embeddings)
     if not vs:
-        _log("Vector store creation failed.")
+        _log("Vector store could not be opened. Aborting KB setup.")
         return None
 
-    # Reload to verify
-    verified = load_vector_store(vector_store_path, embeddings)
-    if verified:
-        _log("Vector store verified by reload.")
-        return verified
+    settings = {"embedding_model": embedding_model, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap,
+                "vector_backend": VECTOR_BACKEND}
+    manifest = load_manifest(vector_store_path)
+    if manifest:
+        manifest.setdefault("vector_backend", "chroma")  # manifests written before the numpy backend
+    if manifest and {k: manifest.get(k) for k in settings} != settings:
+        _log("Embedding model, chunking or vector backend changed since the last index. Rebuilding.")
+        reindex = True
+    checkpoint = load_checkpoint(vector_store_path)
+    if reindex:
+        _log("Full rebuild requested: clearing the vector store.")
+        vs.reset_collection()
+        manifest = None
+        checkpoint = {}
+    elif manifest is None and store_exists:
+        _log("No manifest for the existing store; adopting its chunks by source file.")
+        manifest = {"files": _manifest_from_store(vs, files)}
+
+    manifest = {"version": MANIFEST_VERSION, **settings, "files": (manifest or {}).get("files", {})}
+    # While embedding, the store is persisted and then the manifest and checkpoint saved every INDEX_SAVE_EVERY
+    # batches: both JSON files list every chunk id, and stores that stage writes until persist() must not be
+    # claimed to hold chunks they have not written yet.
+    durable = not _is_numpy(vs)
+    batches = 0
+    added, changed, deleted, unchanged = diff_manifest(files, manifest["files"])
+    _log(f"Knowledge base: {len(added)} added, {len(changed)} changed, "
+         f"{len(deleted)} deleted, {len(unchanged)} unchanged.")
+
+    stale = [cid for name in changed + deleted for cid in manifest["files"][name].get("chunk_ids", [])]
+    if stale:
+        _log(f"Removing {len(stale)} chunks from changed/deleted files.")
+        vs.delete(ids=stale)
+    for name in deleted:
+        del manifest["files"][name]
+    if durable:
+        save_manifest(vector_store_path, manifest)
+
+    # New/changed PDFs are parsed in worker processes and their chunks streamed straight into the
+    # embedder, so parsing overlaps embedding and only a few files' chunks are in memory at once.
+    entries, owner, remaining = {}, {}, {}
+    for name in list(checkpoint):
+        if name not in added and name not in changed:
+            # Interrupted file that has since been deleted.
+            vs.delete(ids=checkpoint.pop(name)["done_ids"])
+    if durable:
+        save_checkpoint(vector_store_path, checkpoint)
+
+    def finish(name):
+        manifest["files"][name] = entries[name]
+        checkpoint.pop(name, None)
+        _log(f"Indexed {name}: {len(entries[name]['chunk_ids'])} chunks.")
+
+    def save_all():
+        store_persist(vs)
+        save_manifest(vector_store_path, manifest)
+        save_checkpoint(vector_store_path, checkpoint)
+
+    def on_batch(batch_ids):
+        # owner: chunk id -> file still being embedded; remaining: file -> chunks not yet stored.
+        nonlocal batches
+        finished = []
+        for cid in batch_ids:
+            name = owner.pop(cid)
+            checkpoint.setdefault(name, {"sha256": entries[name]["sha256"], "done_ids": []})["done_ids"].append(cid)
+            remaining[name] -= 1
+            if not remaining[name]:
+                finished.append(name)
+        for name in finished:
+            finish(name)
+        batches += 1
+        if INDEX_SAVE_EVERY and batches % INDEX_SAVE_EVERY == 0:
+            save_all()
+
+    from langchain_core.documents import Document
+
+    names = {files[name]: name for name in added + changed}
+
+    def pending_chunks():
+        for parsed in parse_files(list(names), chunk_size, chunk_overlap):
+            name, digest = names[parsed["path"]], parsed["sha256"]
+            ids = [chunk_id(name, digest, i) for i in range(len(parsed["chunks"]))]
+            entries[name] = {"sha256": digest, "size": parsed["size"], "mtime": parsed["mtime"], "chunk_ids": ids}
+
+            partial = checkpoint.get(name)
+            done = set()
+            if partial and partial.get("sha256") == digest:
+                wanted = set(ids)
+                # Ids from before chunk ids included the file name: drop them and embed again.
+                old = [cid for cid in partial["done_ids"] if cid not in wanted]
+                if old:
+                    vs.delete(ids=old)
+                done = store_has(vs, [cid for cid in partial["done_ids"] if cid in wanted])
+                _log(f"Resuming {name}: {len(done)}/{len(ids)} chunks already embedded.")
+            elif partial:
+                # The file changed again after an interrupted run; drop what that run stored.
+                vs.delete(ids=partial["done_ids"])
+                del checkpoint[name]
+            # Count the whole file before yielding any of it, so a landed batch cannot finish it early.
+            todo = [(cid, Document(page_content=text, metadata=meta))
+                    for cid, (text, meta) in zip(ids, parsed["chunks"]) if cid not in done]
+            # chunk_id() is unique per file; a clash would hand one file's landed batch to another.
+            clash = next((cid for cid, _ in todo if cid in owner), None)
+            if clash is not None:
+                raise ValueError(f"Chunk id {clash} of {name} is already being indexed for {owner[clash]}")
+            owner.update((cid, name) for cid, _ in todo)
+            remaining[name] = len(todo)
+            if not todo:
+                finish(name)
+            yield from todo
+
+    upsert_stream(vs, pending_chunks(), embeddings, on_batch=on_batch)
+    save_all()
 
-    _log("Warning: store created but verification reload failed.")
+    if isinstance(embeddings, CachedEmbeddings):
+        _log(f"Embedding cache: {embeddings.cache.stats()}")
+
+    count = store_count(vs)
+    if not count:
+        _log("Vector store is empty. Aborting KB setup.")
+        return None
+    if RETRIEVAL_MODE != "vector":
+        sync_bm25_index(vs, vector_store_path)
+    _log(f"Vector store ready ({count} chunks).")
     return vs
+
+
+# Process-wide retrievers, shared by every Streamlit session and batch debate in this process.
+_shared: Dict[tuple, dict] = {}
+_shared_lock = threading.Lock()
+
+
+def _kb_fingerprint(kb_directory: str, vector_store_path: str) -> tuple:
+    """Cheap (stat-only) signature of the PDFs and of the last index written to the store."""
+    files = tuple((name, st.st_size, st.st_mtime_ns)
+                  for name, path in scan_knowledge_dir(kb_directory).items() for st in [os.stat(path)])
+    try:
+        indexed = os.stat(manifest_path(vector_store_path)).st_mtime_ns
+    except OSError:
+        indexed = None
+    return files, indexed
+
+
+def get_shared_retriever(
+    kb_directory: str = KB_DIRECTORY,
+    vector_store_path: str = VECTOR_STORE_PATH,
+    embedding_model: str = EMBEDDING_MODEL,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    k: Optional[int] = None,
+    mode: str = RETRIEVAL_MODE,
+    reindex: bool = False,
+) -> Optional[BaseRetriever]:
+    """The retriever for this knowledge base, indexed at most once per change to it.
+
+    Later calls only stat the PDFs and the manifest; index_knowledge_base runs again when a
+    file was added, changed or removed, or another process re-indexed the store.
+    """
+    if k is None:
+        # MMR packing over-fetches candidates and keeps RETRIEVER_K diverse passages.
+        k = CONTEXT_FETCH_K if CONTEXT_MMR else RETRIEVER_K
+    key = (os.path.abspath(kb_directory), os.path.abspath(vector_store_path), embedding_model,
+           chunk_size, chunk_overlap, k, mode, VECTOR_BACKEND, get_backend().name)
+    with _shared_lock:
+        entry = _shared.setdefault(key, {"lock": threading.Lock(), "fingerprint": None, "retriever": None})
+    # Per-key lock: concurrent sessions wait for one build instead of indexing side by side.
+    with entry["lock"]:
+        # A None retriever (empty or missing knowledge base) is kept too, so it is not rebuilt every call.
+        if not reindex and entry["fingerprint"] == _kb_fingerprint(kb_directory, vector_store_path):
+            return entry["retriever"]
+        vs = index_knowledge_base(kb_directory, vector_store_path, embedding_model,
+                                  chunk_size, chunk_overlap, reindex=reindex)
+        retriever = get_retriever(vs, k=k, mode=mode) if vs else None
+        entry["retriever"] = retriever
+        entry["fingerprint"] = _kb_fingerprint(kb_directory, vector_store_path)
+        return retriever
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index the knowledge base (only new or changed PDFs).")
+    parser.add_argument("--kb", default=KB_DIRECTORY)
+    parser.add_argument("--store", default=VECTOR_STORE_PATH)
+    parser.add_argument("--reindex", action="store_true", help="drop the store and re-embed every PDF")
+    args = parser.parse_args()
+    index_knowledge_base(args.kb, args.store, EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, reindex=args.reindex)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# src/scheduler.py
+
+import inspect
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+
+class Cancelled(Exception):
+    """Raised by stop_point() once the run the calling thread works for has been stopped."""
+
+
+_local = threading.local()
+
+
+def _stops() -> tuple:
+    return getattr(_local, "stops", ())
+
+
+@contextmanager
+def stopping(*events: threading.Event):
+    """Make stop_point() on this thread raise once any of events is set, on top of the enclosing ones."""
+    prev = _stops()
+    _local.stops = prev + events
+    try:
+        yield
+    finally:
+        _local.stops = prev
+
+
+def stop_point() -> None:
+    """Raise Cancelled if this thread's run was stopped; called before each stage and model call."""
+    if any(ev.is_set() for ev in _stops()):
+        raise Cancelled()
+
+
+class Stage:
+    """One node of the debate graph.
+
+    `run(results)` returns the node's result, or is a generator function that yields
+    events produced while working (e.g. token deltas) and returns the result.
+    `results` maps the keys of already committed stages to their results.
+    `commit(result)` applies side effects and returns the events to emit; it is
+    always called in canonical order.
+    """
+
+    def __init__(self, key: str, run: Optional[Callable] = None, deps: Sequence[str] = (),
+                 commit: Optional[Callable] = None):
+        self.key = key
+        self.run = run
+        self.deps = tuple(deps)
+        self.commit = commit
+
+    @classmethod
+    def marker(cls, key: str, *events: dict) -> "Stage":
+        return cls(key, commit=lambda _: list(events))
+
+    def execute(self, results: Dict[str, object]):
+        out = self.run(results)
+        if inspect.isgenerator(out):
+            return (yield from out)
+        return out
+
+    def committed(self, result) -> Iterable[dict]:
+        return self.commit(result) if self.commit else ()
+
+
+def run_sequential(stages: List[Stage], results: Optional[Dict[str, object]] = None) -> Iterator[dict]:
+    results = {} if results is None else results
+    for st in stages:
+        stop_point()
+        value = None
+        if st.run is not None:
+            value = yield from st.execute(results)
+        results[st.key] = value
+        yield from st.committed(value)
+
+
+def run_parallel(stages: List[Stage], max_workers: int,
+                 results: Optional[Dict[str, object]] = None) -> Iterator[dict]:
+    """Run stages whose dependencies are committed concurrently, emitting in list order.
+
+    Events produced by the stage at the head of the list are forwarded as they arrive;
+    events of stages further ahead are buffered until they reach the head. Closing the
+    generator stops the stages still running at their next event or stop_point() and
+    waits for them, so nothing runs on after it.
+    """
+    results = {} if results is None else results
+    inbox: "queue.Queue" = queue.Queue()
+    started, finished, buffers = set(), {}, {}
+    head = 0
+    stop = threading.Event()
+    outer = _stops()  # e.g. the job's cancel event, honoured by the stage threads too
+
+    def work(st: Stage, snapshot: Dict[str, object]):
+        gen = None
+        try:
+            with stopping(*outer, stop):
+                stop_point()
+                gen = st.execute(snapshot)
+                while True:
+                    event = next(gen)
+                    stop_point()
+                    inbox.put(("event", st.key, event))
+        except StopIteration as done:
+            inbox.put(("done", st.key, done.value))
+        except BaseException as e:
+            inbox.put(("error", st.key, e))
+        finally:
+            if gen is not None:
+                gen.close()
+
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="debate-stage")
+
+    def submit_ready():
+        for st in stages[head:]:
+            if st.key in started or not all(d in results for d in st.deps):
+                continue
+            started.add(st.key)
+            if st.run is None:
+                finished[st.key] = ("done", None)
+            else:
+                pool.submit(work, st, dict(results))
+
+    try:
+        submit_ready()
+        while head < len(stages):
+            stop_point()
+            st = stages[head]
+            if st.key in finished:
+                kind, value = finished.pop(st.key)
+                if kind == "error":
+                    raise value
+                results[st.key] = value
+                yield from st.committed(value)
+                head += 1
+                if head < len(stages):
+                    yield from buffers.pop(stages[head].key, [])
+                submit_ready()
+                continue
+
+            kind, key, value = inbox.get()
+            if kind != "event":
+                finished[key] = (kind, value)
+            elif key == st.key:
+                yield value
+            else:
+                buffers.setdefault(key, []).append(value)
+    finally:
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,220 @@
+# src/server.py
+
+import argparse
+import json
+import re
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from config import (
+    NUMBER_OF_REBUTTAL_ROUNDS, ENABLE_RAG, WARM_UP_ON_START, LLM_BACKEND, DEBATE_JOB_TTL,
+    SERVER_HOST, SERVER_PORT, SERVER_MAX_RUNNING, SERVER_MAX_QUEUED, SERVER_MAX_ROUNDS, SERVER_SSE_KEEPALIVE,
+)
+from checkpoints import get_checkpoints
+from debate_worker import DebateWorker, WorkerBusy
+from llm_backends import BACKENDS, get_backend, set_backend
+from main import build_orchestrator, build_retriever
+from scheduler import Cancelled
+
+_JOB_PATH = re.compile(r"^/debates/([\w:.-]+)(/events)?$")
+
+
+class DebateService:
+    """Debates as jobs behind one worker, the shared retriever and one model client.
+
+    SERVER_MAX_RUNNING debates generate at once, sized so their concurrent calls fit the
+    Ollama server's parallel slots; SERVER_MAX_QUEUED more may wait and the rest are refused.
+    Each job asks get_retriever for the retriever, so knowledge-base changes reach new debates.
+    """
+
+    def __init__(self, get_retriever=build_retriever, max_running: int = SERVER_MAX_RUNNING,
+                 max_queued: int = SERVER_MAX_QUEUED):
+        self.get_retriever = get_retriever
+        self.worker = DebateWorker(max_workers=max_running, job_ttl=DEBATE_JOB_TTL, max_pending=max_queued)
+
+    def submit(self, body: dict):
+        topic = str(body.get("topic", "")).strip()
+        if not topic:
+            raise ValueError("topic is required")
+        rounds = int(body.get("rounds", NUMBER_OF_REBUTTAL_ROUNDS))
+        if not 0 <= rounds <= SERVER_MAX_ROUNDS:
+            raise ValueError(f"rounds must be between 0 and {SERVER_MAX_ROUNDS}")
+        stream = bool(body.get("stream", True))
+        job_id = str(body.get("id") or uuid.uuid4().hex)
+        if not re.fullmatch(r"[\w:.-]+", job_id):
+            raise ValueError("id may only contain letters, digits and _ : . -")
+
+        def run():
+            # The job id doubles as the checkpoint id, so resubmitting an id resumes that debate.
+            orch = build_orchestrator(topic, self.get_retriever(), stream=stream,
+                                      checkpoints=get_checkpoints(), debate_id=job_id)
+            try:
+                yield from orch.run(rounds)
+            except (GeneratorExit, Cancelled):
+                # Cancelled mid-debate: drop the checkpoint once nothing can append to it.
+                if orch.checkpoints is not None:
+                    orch.checkpoints.delete(job_id)
+                raise
+
+        return self.worker.submit(run, job_id=job_id, topic=topic, rounds=rounds)
+
+    def status(self, job) -> dict:
+        out = job.summary()
+        events, _ = job.events()
+        out["transcript"] = [{"agent": ev["agent"], "role": ev["role"], "text": ev["text"]}
+                             for ev in events if ev.get("type") == "msg"]
+        return out
+
+    def cancel(self, job) -> None:
+        was_queued = job.status == "queued"
+        job.cancel()
+        if was_queued and get_checkpoints():
+            get_checkpoints().delete(job.id)
+
+    def health(self) -> dict:
+        jobs = self.worker.jobs()
+        return {
+            "backend": type(get_backend()).__name__,
+            "running": sum(1 for j in jobs if j.status == "running"),
+            "queued": sum(1 for j in jobs if j.status == "queued"),
+            "max_running": self.worker.max_workers,
+            "max_queued": self.worker.max_pending,
+        }
+
+
+class DebateHandler(BaseHTTPRequestHandler):
+    """
+    POST   /debates               {"topic", "rounds"?, "stream"?, "id"?} -> 202 job, 429 when full
+    GET    /debates               every job still held
+    GET    /debates/ID            status and transcript so far
+    GET    /debates/ID/events     Server-Sent Events; resumes after Last-Event-ID or ?after=N
+    DELETE /debates/ID            cancel: 202 while the debate is stopping, 200 once it has
+    GET    /health
+    """
+
+    service: DebateService = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, code: int, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job(self):
+        m = _JOB_PATH.match(urlparse(self.path).path)
+        job = self.service.worker.get(m.group(1)) if m else None
+        if job is None:
+            self._json(404, {"error": "no such debate"})
+        return job, bool(m and m.group(2))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            return self._json(200, self.service.health())
+        if path == "/debates":
+            return self._json(200, [j.summary() for j in self.service.worker.jobs()])
+        job, events = self._job()
+        if job is None:
+            return
+        if events:
+            return self._stream(job)
+        self._json(200, self.service.status(job))
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/debates":
+            return self._json(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            job = self.service.submit(body)
+        except WorkerBusy as e:
+            return self._json(429, {"error": str(e)}, {"Retry-After": "30"})
+        except (ValueError, TypeError, AttributeError) as e:
+            return self._json(400, {"error": str(e)})
+        self._json(202, job.summary(), {"Location": f"/debates/{job.id}"})
+
+    def do_DELETE(self):
+        job, _ = self._job()
+        if job is None:
+            return
+        self.service.cancel(job)
+        self._json(200 if job.done else 202, job.summary())
+
+    def _stream(self, job):
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            cursor = int(self.headers.get("Last-Event-ID") or query.get("after", ["-1"])[0]) + 1
+        except ValueError:
+            cursor = 0
+        deltas = query.get("deltas", ["1"])[0] != "0"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            while True:
+                ended = job.done
+                events, start = job.events(cursor, timeout=None if ended else SERVER_SSE_KEEPALIVE)
+                if events:
+                    chunk = "".join(f"id: {i}\nevent: {ev['type']}\ndata: {json.dumps(ev)}\n\n"
+                                    for i, ev in enumerate(events, cursor)
+                                    if deltas or ev["type"] != "delta")
+                    cursor = start
+                elif ended:
+                    chunk = f"event: end\ndata: {json.dumps(job.summary())}\n\n"
+                else:
+                    chunk = ": keep-alive\n\n"
+                if chunk:
+                    self.wfile.write(chunk.encode("utf-8"))
+                    self.wfile.flush()
+                if ended and not events:
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return  # client went away; the debate keeps running
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve debates over HTTP with Server-Sent Events.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=LLM_BACKEND,
+                        help="LLM backend (stub = deterministic offline model)")
+    parser.add_argument("--max-running", type=int, default=SERVER_MAX_RUNNING)
+    parser.add_argument("--max-queued", type=int, default=SERVER_MAX_QUEUED)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    set_backend(args.backend)
+    if WARM_UP_ON_START:
+        get_backend().warm_up(with_embeddings=ENABLE_RAG)
+    build_retriever()  # index up front; jobs reuse it until the knowledge base changes
+    DebateHandler.service = DebateService(build_retriever, args.max_running, args.max_queued)
+    server = ThreadingHTTPServer((args.host, args.port), DebateHandler)
+    server.daemon_threads = True
+    print(f"[Server] http://{args.host}:{args.port} "
+          f"({args.max_running} running, {args.max_queued} queued)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        DebateHandler.service.worker.shutdown()
+
+
+if __name__ == "__main__":
+    main()
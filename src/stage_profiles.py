@@ -0,0 +1,120 @@
+# src/stage_profiles.py
+
+import math
+import re
+import threading
+from typing import Dict, List, Optional
+
+from config import (
+    STAGE_PROFILES, MAX_TOKENS_PER_STAGE, ADAPTIVE_NUM_PREDICT, TOKENS_PER_POINT, NUM_PREDICT_HEADROOM,
+)
+
+# "3." / "3)" / "**3." at the start of a line.
+_MARKER = re.compile(r"(?m)^[ \t]*(?:\*\*)?(\d+)[.)](?=\s)")
+# An unindented numbered line. Only one numbered past the last allowed point ends it: a blank
+# line can sit between a point's heading and its body, so it ends nothing on its own.
+_NEXT = re.compile(r"(?m)^(?:\*\*)?(\d+)[.)](?=\s)")
+
+
+def stage_profile(stage: Optional[str]) -> dict:
+    prof = {"model": None, "num_predict": MAX_TOKENS_PER_STAGE.get(stage, 200), "max_points": 0, "stop": []}
+    prof.update(STAGE_PROFILES.get("default", {}))
+    prof.update(STAGE_PROFILES.get(stage, {}))
+    return prof
+
+
+def profile_models() -> List[str]:
+    return [p["model"] for p in STAGE_PROFILES.values() if p.get("model")]
+
+
+def stop_sequences(prof: dict) -> List[str]:
+    # The next point's marker stops the server even when nobody reads the stream.
+    stop = list(prof.get("stop") or [])
+    n = prof.get("max_points") or 0
+    if n:
+        stop += [f"\n{n + 1}.", f"\n{n + 1})"]
+    return stop
+
+
+def count_points(text: str) -> int:
+    return len({m.group(1) for m in _MARKER.finditer(text)})
+
+
+class PointCutoff:
+    """Cuts a streamed answer once it holds max_points complete numbered points.
+
+    feed(delta) returns the part of delta to keep; after the cut, done is set and the caller
+    should stop reading. The last point counts as complete once an unindented line starts a
+    higher number; anything else, filler included, is kept until then or a stop sequence.
+    """
+
+    def __init__(self, max_points: int):
+        self.max_points = max_points
+        self.text = ""
+        self.done = False
+        self._last: Optional[int] = None  # offset just past the marker of point max_points
+
+    def feed(self, delta: str) -> str:
+        if self.done:
+            return ""
+        if not self.max_points:
+            return delta
+        start = len(self.text)
+        self.text += delta
+        if self._last is None:
+            for m in _MARKER.finditer(self.text, max(0, start - 8)):
+                if int(m.group(1)) >= self.max_points:
+                    self._last = m.end()
+                    break
+            if self._last is None:
+                return delta
+        # From the last marker, not the new delta: the next number's line may have begun a few deltas ago.
+        end = next((m for m in _NEXT.finditer(self.text, self._last) if int(m.group(1)) > self.max_points), None)
+        if end is None:
+            return delta
+        self.done = True
+        cut = max(start, end.start() - 1)
+        self.text = self.text[:cut]
+        return self.text[start:]
+
+
+def cut_points(text: str, max_points: int) -> str:
+    return PointCutoff(max_points).feed(text)
+
+
+class _PointStats:
+    """Moving average of generated tokens per numbered point, per stage."""
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self._avg: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, stage: str) -> float:
+        return self._avg.get(stage, TOKENS_PER_POINT)
+
+    def observe(self, stage: str, points: int, eval_tokens: int) -> None:
+        if points <= 0 or eval_tokens <= 0:
+            return
+        per_point = eval_tokens / points
+        with self._lock:
+            prev = self._avg.get(stage)
+            self._avg[stage] = per_point if prev is None else prev + self.alpha * (per_point - prev)
+
+
+_stats = _PointStats()
+
+
+def num_predict(stage: str, adaptive: bool = ADAPTIVE_NUM_PREDICT) -> int:
+    """The stage's num_predict: its cap, or less when max_points and the observed tokens per point allow."""
+    prof = stage_profile(stage)
+    cap = prof["num_predict"]
+    n = prof["max_points"]
+    if not (adaptive and n and cap):
+        return cap
+    return min(cap, math.ceil(n * _stats.get(stage) * NUM_PREDICT_HEADROOM))
+
+
+def observe(stage: str, text: str, eval_tokens: int) -> None:
+    if stage_profile(stage)["max_points"]:
+        _stats.observe(stage, count_points(text), eval_tokens)
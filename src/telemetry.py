@@ -0,0 +1,157 @@
+# src/telemetry.py
+
+from __future__ import annotations
+
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, List, Optional
+
+_current: ContextVar[Optional["Span"]] = ContextVar("debate_span", default=None)
+_sink: ContextVar[Optional[list]] = ContextVar("debate_span_sink", default=None)
+
+
+class Span:
+    def __init__(self, kind: str, agent: Optional[str] = None, stage: Optional[str] = None,
+                 model: Optional[str] = None):
+        self.kind = kind  # "retrieval" | "generation" | "summarization"
+        self.agent = agent
+        self.stage = stage
+        self.model = model
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.wall_s = 0.0
+        self.ttft_s: Optional[float] = None
+        self.prompt_tokens = 0
+        self.eval_tokens = 0
+        self.prompt_eval_s = 0.0
+        self.eval_s = 0.0
+        self.attrs = {}
+
+    def first_token(self) -> None:
+        if self.ttft_s is None:
+            self.ttft_s = time.perf_counter() - self._t0
+
+    def finish(self) -> None:
+        self.wall_s = time.perf_counter() - self._t0
+
+    @property
+    def tokens_per_sec(self) -> float:
+        if not self.eval_tokens:
+            return 0.0
+        secs = self.eval_s or self.wall_s
+        return self.eval_tokens / secs if secs else 0.0
+
+    def to_dict(self) -> dict:
+        d = {
+            "kind": self.kind,
+            "agent": self.agent,
+            "stage": self.stage,
+            "model": self.model,
+            "start": round(self.start, 6),
+            "wall_s": round(self.wall_s, 6),
+            "ttft_s": round(self.ttft_s, 6) if self.ttft_s is not None else None,
+            "prompt_tokens": self.prompt_tokens,
+            "eval_tokens": self.eval_tokens,
+            "prompt_eval_s": round(self.prompt_eval_s, 6),
+            "eval_s": round(self.eval_s, 6),
+            "tokens_per_sec": round(self.tokens_per_sec, 3),
+        }
+        d.update(self.attrs)
+        return d
+
+
+@contextmanager
+def span(kind: str, agent: Optional[str] = None, stage: Optional[str] = None, model: Optional[str] = None):
+    sp = Span(kind, agent=agent, stage=stage, model=model)
+    token = _current.set(sp)
+    try:
+        yield sp
+    finally:
+        sp.finish()
+        _current.reset(token)
+        sink = _sink.get()
+        if sink is not None:
+            sink.append(sp)
+
+
+@contextmanager
+def collect():
+    """Collect every span finished in this context (thread / task) into the yielded list."""
+    spans: List[Span] = []
+    token = _sink.set(spans)
+    try:
+        yield spans
+    finally:
+        _sink.reset(token)
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+def record_usage(prompt_tokens: Optional[int] = None, eval_tokens: Optional[int] = None,
+                 prompt_eval_ns: Optional[int] = None, eval_ns: Optional[int] = None) -> None:
+    # Called by LLM backends with the counters the server reports; accumulates on the open span.
+    sp = _current.get()
+    if sp is None:
+        return
+    sp.prompt_tokens += prompt_tokens or 0
+    sp.eval_tokens += eval_tokens or 0
+    sp.prompt_eval_s += (prompt_eval_ns or 0) / 1e9
+    sp.eval_s += (eval_ns or 0) / 1e9
+
+
+def annotate(**attrs) -> None:
+    sp = _current.get()
+    if sp is not None:
+        sp.attrs.update(attrs)
+
+
+def metric_event(sp: Span) -> dict:
+    return {"type": "metric", **sp.to_dict()}
+
+
+def write_jsonl(spans: Iterable[Span], path: str, **extra) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        for sp in spans:
+            f.write(json.dumps({**extra, **sp.to_dict()}) + "\n")
+
+
+def _labels(**labels) -> str:
+    parts = []
+    for k, v in labels.items():
+        v = str(v if v is not None else "").replace("\\", "\\\\").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def to_prometheus(spans: Iterable[Span], prefix: str = "debate") -> str:
+    """Aggregate spans into Prometheus text exposition format (one series per kind/stage/model)."""
+    agg = {}
+    for sp in spans:
+        key = (sp.kind, sp.stage or "", sp.model or "")
+        a = agg.setdefault(key, {"count": 0, "wall": 0.0, "prompt": 0, "eval": 0, "eval_s": 0.0})
+        a["count"] += 1
+        a["wall"] += sp.wall_s
+        a["prompt"] += sp.prompt_tokens
+        a["eval"] += sp.eval_tokens
+        a["eval_s"] += sp.eval_s or (sp.wall_s if sp.eval_tokens else 0.0)
+
+    metrics = [
+        ("span_count", "counter", "Number of spans recorded.", lambda a: a["count"]),
+        ("span_wall_seconds_total", "counter", "Total wall time of spans.", lambda a: round(a["wall"], 6)),
+        ("prompt_tokens_total", "counter", "Prompt tokens evaluated.", lambda a: a["prompt"]),
+        ("generated_tokens_total", "counter", "Tokens generated.", lambda a: a["eval"]),
+        ("tokens_per_second", "gauge", "Generated tokens per second of generation time.",
+         lambda a: round(a["eval"] / a["eval_s"], 3) if a["eval_s"] else 0.0),
+    ]
+    lines = []
+    for name, mtype, help_text, fn in metrics:
+        full = f"{prefix}_{name}"
+        lines.append(f"# HELP {full} {help_text}")
+        lines.append(f"# TYPE {full} {mtype}")
+        for (kind, stage, model), a in sorted(agg.items()):
+            lines.append(f"{full}{_labels(kind=kind, stage=stage, model=model)} {fn(a)}")
+    return "\n".join(lines) + "\n"
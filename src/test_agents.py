@@ -0,0 +1,43 @@
+# src/test_agents.py
+
+import pytest
+
+import agents
+from agents import Debater, Judge, RollingSummarizer
+from config import DEFAULT_MODEL, STAGE_PROFILES
+from debate_state import DebateState
+
+
+class _Recorder:
+    def __init__(self):
+        self.models = []
+
+    def chat(self, model, messages, options, stage=None):
+        self.models.append(model)
+        return "1. Managed yields outlast boom and bust."
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    rec = _Recorder()
+    monkeypatch.setattr(agents, "get_backend", lambda: rec)
+    monkeypatch.setattr(agents, "get_response_cache", lambda: None)
+    monkeypatch.setitem(STAGE_PROFILES, "judge", dict(STAGE_PROFILES["judge"], model="profile-judge"))
+    monkeypatch.setitem(STAGE_PROFILES, "opening", dict(STAGE_PROFILES["opening"], model=None))
+    return rec
+
+
+def test_profile_model_is_the_default(backend):
+    Judge().generate("Who won?", stage="judge")
+    Debater("Proponent", "Proponent").generate("Open.", stage="opening")
+    assert backend.models == ["profile-judge", DEFAULT_MODEL]
+
+
+def test_explicit_model_wins_over_the_profile(backend):
+    Judge(model="my-judge").generate("Who won?", stage="judge")
+    Debater("Proponent", "Proponent", model="my-debater").generate("Open.", stage="opening")
+    assert backend.models == ["my-judge", "my-debater"]
+
+
+def test_summarizer_prefers_its_explicit_model():
+    assert RollingSummarizer(DebateState("t"), model="my-summary").model == "my-summary"
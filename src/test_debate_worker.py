@@ -0,0 +1,28 @@
+# src/test_debate_worker.py
+
+import threading
+
+from debate_worker import DebateWorker
+from scheduler import Stage, run_sequential, stop_point
+
+
+def test_cancel_stops_before_the_next_model_call():
+    calls, in_call, release = [], threading.Event(), threading.Event()
+
+    def model_call(results):
+        stop_point()
+        calls.append(len(calls))
+        in_call.set()
+        release.wait(5)
+        return "text"
+
+    stages = [Stage(f"turn{i}", model_call) for i in range(5)]
+    worker = DebateWorker(max_workers=1)
+    job = worker.submit(lambda: run_sequential(stages))
+    assert in_call.wait(5)
+    job.cancel()
+    release.set()
+    worker.shutdown(cancel=False)
+
+    assert job.status == "cancelled"
+    assert calls == [0]
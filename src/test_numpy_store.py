@@ -0,0 +1,57 @@
+# src/test_numpy_store.py
+
+import os
+
+import numpy as np
+
+from numpy_store import DELETED_NAME, DOCS_NAME, VECTORS_NAME, NumpyVectorStore
+
+
+def _add(vs, ids):
+    vs.upsert(ids, np.random.default_rng(len(ids)).random((len(ids), 8)), [f"text {cid}" for cid in ids])
+
+
+def test_persist_appends_in_place(tmp_path):
+    vs = NumpyVectorStore(str(tmp_path), None)
+    _add(vs, ["a", "b", "d", "e", "f"])
+    vs.persist()
+    inode = os.stat(tmp_path / VECTORS_NAME).st_ino
+
+    _add(vs, ["c"])
+    vs.delete(["a"])
+    vs.persist()
+    assert os.stat(tmp_path / VECTORS_NAME).st_ino == inode
+
+    fresh = NumpyVectorStore(str(tmp_path), None)
+    assert fresh.count() == 5 and fresh.has(["a", "b", "c"]) == {"b", "c"}
+    assert [d.page_content for d in fresh.get_by_ids(["c"])] == ["text c"]
+
+
+def test_replaced_rows_stay_dead_and_compaction_drops_them(tmp_path):
+    vs = NumpyVectorStore(str(tmp_path), None)
+    _add(vs, [str(i) for i in range(10)])
+    vs.persist()
+    _add(vs, ["0"])
+    vs.persist()
+    assert NumpyVectorStore(str(tmp_path), None).count() == 10
+
+    vs.delete([str(i) for i in range(1, 6)])
+    vs.persist()
+    assert not (tmp_path / DELETED_NAME).exists()
+    fresh = NumpyVectorStore(str(tmp_path), None)
+    assert fresh.count() == 5 and fresh._matrix.shape[0] == 5
+
+
+def test_interrupted_append_is_ignored(tmp_path):
+    vs = NumpyVectorStore(str(tmp_path), None)
+    _add(vs, ["a"])
+    vs.persist()
+    with open(tmp_path / VECTORS_NAME, "ab") as f:
+        f.write(b"\0" * 40)
+    with open(tmp_path / DOCS_NAME, "a", encoding="utf-8") as f:
+        f.write('{"id": "torn", "te')
+
+    vs = NumpyVectorStore(str(tmp_path), None)
+    _add(vs, ["b"])
+    vs.persist()
+    assert NumpyVectorStore(str(tmp_path), None).has(["a", "b", "torn"]) == {"a", "b"}
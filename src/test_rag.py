@@ -0,0 +1,98 @@
+# src/test_rag.py
+
+import os
+from functools import partial
+
+import pytest
+
+import rag_pipeline
+from benchmarks import write_pdf
+from llm_backends import set_backend
+
+
+PAGES = [" ".join(f"Line {i}: managed fisheries and forests keep yields stable across decades." for i in range(40))]
+
+
+@pytest.fixture(params=["numpy", "chroma"])
+def kb(request, tmp_path, monkeypatch):
+    set_backend("stub")
+    monkeypatch.setattr(rag_pipeline, "VECTOR_BACKEND", request.param)
+    monkeypatch.setattr(rag_pipeline, "get_embedding_cache", lambda: None)
+    kb_dir = tmp_path / "kb"
+    kb_dir.mkdir()
+
+    def index():
+        return rag_pipeline.index_knowledge_base(str(kb_dir), str(tmp_path / "store"), "test-embed", 200, 20)
+
+    return kb_dir, tmp_path / "store", index
+
+
+def test_identical_pdfs_get_their_own_chunks(kb):
+    kb_dir, store, index = kb
+    write_pdf(str(kb_dir / "a.pdf"), PAGES)
+    single = rag_pipeline.store_count(index())
+
+    write_pdf(str(kb_dir / "b_copy.pdf"), PAGES)
+    vs = index()
+    assert rag_pipeline.store_count(vs) == 2 * single
+
+    files = rag_pipeline.load_manifest(str(store))["files"]
+    assert not set(files["a.pdf"]["chunk_ids"]) & set(files["b_copy.pdf"]["chunk_ids"])
+
+
+def test_deleting_one_copy_keeps_the_other(kb):
+    kb_dir, store, index = kb
+    write_pdf(str(kb_dir / "a.pdf"), PAGES)
+    write_pdf(str(kb_dir / "b_copy.pdf"), PAGES)
+    index()
+    kept = rag_pipeline.load_manifest(str(store))["files"]["a.pdf"]["chunk_ids"]
+
+    os.remove(kb_dir / "b_copy.pdf")
+    vs = index()
+    assert rag_pipeline.store_count(vs) == len(kept)
+    assert rag_pipeline.store_has(vs, kept) == set(kept)
+
+
+def test_interrupted_index_keeps_landed_batches(kb, monkeypatch):
+    kb_dir, store, index = kb
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        write_pdf(str(kb_dir / name), PAGES)
+    monkeypatch.setattr(rag_pipeline, "INDEX_SAVE_EVERY", 1)
+    monkeypatch.setattr(rag_pipeline, "upsert_stream", partial(rag_pipeline.upsert_stream, batch_size=8, max_workers=1))
+    upsert, calls = rag_pipeline.store_upsert, []
+
+    def flaky(*args, **kwargs):
+        calls.append(args[1])
+        if len(calls) > 3:
+            raise RuntimeError("embedder went away")
+        return upsert(*args, **kwargs)
+
+    monkeypatch.setattr(rag_pipeline, "store_upsert", flaky)
+    with pytest.raises(RuntimeError):
+        index()
+    landed = {cid for ids in calls[:3] for cid in ids}
+    files = rag_pipeline.load_manifest(str(store))["files"]
+    assert files and all(set(f["chunk_ids"]) <= landed for f in files.values())
+
+    monkeypatch.setattr(rag_pipeline, "store_upsert", upsert)
+    vs = index()
+    files = rag_pipeline.load_manifest(str(store))["files"]
+    assert sorted(files) == ["a.pdf", "b.pdf", "c.pdf"]
+    assert rag_pipeline.store_count(vs) == sum(len(f["chunk_ids"]) for f in files.values()) > len(landed)
+
+
+def test_missing_knowledge_base_is_not_rescanned(tmp_path, monkeypatch):
+    set_backend("stub")
+    calls = []
+    index = rag_pipeline.index_knowledge_base
+    monkeypatch.setattr(rag_pipeline, "index_knowledge_base", lambda *a, **k: calls.append(a) or index(*a, **k))
+    kb_dir, store = str(tmp_path / "kb"), str(tmp_path / "store")
+    assert rag_pipeline.get_shared_retriever(kb_dir, store, "test-embed", 200, 20) is None
+    assert rag_pipeline.get_shared_retriever(kb_dir, store, "test-embed", 200, 20) is None
+    assert len(calls) == 1
+
+    (tmp_path / "kb").mkdir()
+    write_pdf(str(tmp_path / "kb" / "a.pdf"), PAGES)
+    monkeypatch.setattr(rag_pipeline, "get_embedding_cache", lambda: None)
+    assert rag_pipeline.get_shared_retriever(kb_dir, store, "test-embed", 200, 20) is not None
+    assert len(calls) == 2
@@ -0,0 +1,51 @@
+# src/test_scheduler.py
+
+import threading
+import time
+
+import pytest
+
+from scheduler import Cancelled, Stage, run_parallel, run_sequential, stop_point, stopping
+
+
+def _ticker(calls):
+    # A stage that keeps making "model calls" until it is stopped.
+    def run(results):
+        for i in range(200):
+            stop_point()
+            calls.append(i)
+            time.sleep(0.01)
+            yield {"type": "delta", "text": str(i)}
+        return "finished"
+    return run
+
+
+def test_closing_run_parallel_stops_running_stages():
+    head, ahead = [], []
+    gen = run_parallel([Stage("a", _ticker(head)), Stage("b", _ticker(ahead))], max_workers=2)
+    next(gen)
+    gen.close()
+    seen = (len(head), len(ahead))
+    time.sleep(0.1)
+    assert (len(head), len(ahead)) == seen
+    assert seen[1] < 200
+    assert not [t for t in threading.enumerate() if t.name.startswith("debate-stage")]
+
+
+def test_outer_stop_reaches_stage_threads():
+    cancel, calls = threading.Event(), []
+    with stopping(cancel):
+        gen = run_parallel([Stage("a", _ticker(calls))], max_workers=1)
+        next(gen)
+        cancel.set()
+        with pytest.raises(Cancelled):
+            list(gen)
+    assert len(calls) < 200
+
+
+def test_run_sequential_stops_before_the_next_stage():
+    cancel, ran = threading.Event(), []
+    stages = [Stage("a", lambda r: ran.append("a") or cancel.set()), Stage("b", lambda r: ran.append("b"))]
+    with stopping(cancel), pytest.raises(Cancelled):
+        list(run_sequential(stages))
+    assert ran == ["a"]
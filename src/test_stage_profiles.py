@@ -0,0 +1,27 @@
+# src/test_stage_profiles.py
+
+from stage_profiles import PointCutoff, cut_points
+
+HEADINGS = "1. **Alpha**\n\nAlpha text.\n\n2. **Beta**\n\nBeta text.\n\n3. **Gamma**\n\nGamma text.\n\nIn sum."
+
+
+def test_heading_blank_line_body_keeps_the_last_body():
+    assert cut_points(HEADINGS, 3) == HEADINGS
+    assert cut_points(HEADINGS, 2).rstrip() == "1. **Alpha**\n\nAlpha text.\n\n2. **Beta**\n\nBeta text."
+    text = "1. Alpha:\n\n   Alpha matters.\n\n2. Gamma:\n\n   Gamma matters.\n\n3. Delta:\n\n   Delta."
+    assert cut_points(text, 2).rstrip() == "1. Alpha:\n\n   Alpha matters.\n\n2. Gamma:\n\n   Gamma matters."
+
+
+def test_streamed_lines_cut_like_the_whole_text():
+    cutoff = PointCutoff(2)
+    kept = ""
+    for line in HEADINGS.splitlines(keepends=True):
+        kept += cutoff.feed(line)
+        if cutoff.done:
+            break
+    assert cutoff.done and kept.rstrip() == cut_points(HEADINGS, 2).rstrip()
+
+
+def test_indented_sub_list_does_not_end_the_point():
+    text = "1. Alpha\n2. Beta:\n   1. sub one\n   3. sub three\n3. Gamma too"
+    assert cut_points(text, 2) == "1. Alpha\n2. Beta:\n   1. sub one\n   3. sub three"